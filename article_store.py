@@ -0,0 +1,167 @@
+# article_store.py
+# 2025-12-06
+"""
+트렌드 요약용 기사 저장소 (SQLite)
+ - 수집한 Article을 정규화된 URL 키로 저장
+ - 이미 저장된 기사는 HTTP 요청 없이 디스크에서 바로 사용
+ - 보관 기간이 지난 기사는 한 번에 삭제 (prune)
+ - map-reduce 요약용 기사별 요약 캐시 (URL + 본문 해시 + 모델 키)
+"""
+from __future__ import annotations
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from trend_summary import Article
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url_key      TEXT PRIMARY KEY,
+    url          TEXT NOT NULL,
+    title        TEXT,
+    source       TEXT,
+    published_at TEXT,
+    content      TEXT NOT NULL,
+    fetched_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published_at ON articles (published_at);
+
+CREATE TABLE IF NOT EXISTS article_summaries (
+    url_key      TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    model        TEXT NOT NULL,
+    summary      TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    PRIMARY KEY (url_key, content_hash, model)
+);
+"""
+
+# 같은 기사로 취급하기 위해 제거하는 추적용 쿼리 파라미터
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+# SQLite 바인딩 변수 개수 제한 대비
+_IN_CHUNK = 500
+
+
+def normalize_url(url: str) -> str:
+    """scheme/host 소문자화, fragment·추적 파라미터 제거, 쿼리 정렬, 끝 '/' 제거."""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def _source_str(source: Any) -> str:
+    # feedparser의 source는 {"href", "title"} 형태의 dict일 수 있음
+    if isinstance(source, dict):
+        return source.get("title") or source.get("href") or "Google News"
+    return str(source) if source else "Google News"
+
+
+class ArticleStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Article]:
+        """원본 URL → 저장된 Article (없는 URL은 결과에 포함되지 않음)."""
+        by_key: Dict[str, List[str]] = {}
+        for u in urls:
+            by_key.setdefault(normalize_url(u), []).append(u)
+        if not by_key:
+            return {}
+
+        keys = list(by_key)
+        out: Dict[str, Article] = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), _IN_CHUNK):
+                chunk = keys[i : i + _IN_CHUNK]
+                rows = conn.execute(
+                    f"SELECT * FROM articles WHERE url_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    art = Article(
+                        url=row["url"],
+                        title=row["title"] or "",
+                        source=row["source"] or "Google News",
+                        published_at=row["published_at"],
+                        content=row["content"],
+                    )
+                    for u in by_key[row["url_key"]]:
+                        out[u] = art
+        return out
+
+    def save_many(self, articles: Iterable[Article]) -> int:
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (
+                normalize_url(a.url),
+                a.url,
+                a.title,
+                _source_str(a.source),
+                a.published_at,
+                a.content,
+                fetched_at,
+            )
+            for a in articles
+        ]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO articles "
+                "(url_key, url, title, source, published_at, content, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def prune(self, published_before: datetime) -> int:
+        """published_at이 기준 시각 이전인 기사(와 그 요약)를 한 번에 삭제. 삭제 건수 반환."""
+        cutoff = published_before.astimezone(timezone.utc).isoformat()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "DELETE FROM articles WHERE published_at IS NULL OR published_at < ?",
+                (cutoff,),
+            )
+            conn.execute(
+                "DELETE FROM article_summaries "
+                "WHERE url_key NOT IN (SELECT url_key FROM articles)"
+            )
+            return cur.rowcount
+
+    # 기사별 요약 캐시 (trend_summary map 단계)
+    def get_summary(self, url: str, content_hash: str, model: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT summary FROM article_summaries "
+                "WHERE url_key = ? AND content_hash = ? AND model = ?",
+                (normalize_url(url), content_hash, model),
+            ).fetchone()
+        return row["summary"] if row else None
+
+    def save_summary(self, url: str, content_hash: str, model: str, summary: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO article_summaries "
+                "(url_key, content_hash, model, summary, created_at) VALUES (?, ?, ?, ?, ?)",
+                (normalize_url(url), content_hash, model, summary, datetime.now(timezone.utc).isoformat()),
+            )
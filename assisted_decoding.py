@@ -0,0 +1,219 @@
+# assisted_decoding.py
+# 2025-12-06
+"""
+작은 draft 모델로 토큰을 미리 제안하고 본 모델이 한 번에 검증하는 assisted(speculative) decoding
+ - transformers generate(assistant_model=...) 사용, draft는 본 모델과 같은 tokenizer 계열이어야 함
+   (예: Qwen2.5-1.5B-Instruct ← Qwen2.5-0.5B-Instruct). vocab이 다르면 해당 draft는 비활성
+ - draft도 model_registry에 올림 (본 모델과 같은 device/dtype, CPU면 cpu_backend 모드)
+ - 수락률: generate 동안 본 모델/draft forward 호출 수를 hook으로 셈
+   - 본 모델 forward 1번 = 검증 1 step → (수락된 draft 토큰 + 1) 토큰 생성
+   - draft forward 1번 = 제안 토큰 1개
+   → accepted = 생성 토큰 - 본 모델 step, acceptance_rate = accepted / 제안 토큰
+ - batch 1 전용 (동적 배칭 경로는 사용 안 함). prefix KV 캐시와 같이 쓰면 출력이 달라져서 draft 사용 시 prefix 캐시는 건너뜀
+ - 모드별 속도 비교는 benchmarks/assisted/bench.py
+"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from model_registry import registry
+
+# draft 모델 (본 모델과 같은 tokenizer 계열). 비어 있으면 assisted decoding 사용 안 함
+QWEN_DRAFT_MODEL = os.getenv("QWEN_DRAFT_MODEL", "")          # 예: Qwen/Qwen2.5-0.5B-Instruct
+KANANA_DRAFT_MODEL = os.getenv("KANANA_DRAFT_MODEL", "")
+# draft가 한 번에 제안하는 토큰 수 (heuristic 이면 수락 여부에 따라 +2 / -1 조정되는 시작값)
+ASSISTED_NUM_TOKENS = int(os.getenv("ASSISTED_NUM_TOKENS", "5"))
+ASSISTED_SCHEDULE = os.getenv("ASSISTED_SCHEDULE", "heuristic")  # heuristic | constant
+# draft의 다음 토큰 확률이 이 값보다 낮으면 그 step 제안을 일찍 멈춤 (0이면 항상 num_tokens 만큼 제안)
+ASSISTED_CONFIDENCE_THRESHOLD = float(os.getenv("ASSISTED_CONFIDENCE_THRESHOLD", "0.4"))
+
+
+@dataclass
+class AssistStats:
+    draft_model: str
+    new_tokens: int
+    main_forwards: int
+    draft_forwards: int
+    elapsed_ms: float
+
+    @property
+    def accepted(self) -> int:
+        return max(0, self.new_tokens - self.main_forwards)
+
+    @property
+    def acceptance_rate(self) -> Optional[float]:
+        return round(min(1.0, self.accepted / self.draft_forwards), 3) if self.draft_forwards else None
+
+    @property
+    def tokens_per_main_step(self) -> Optional[float]:
+        return round(self.new_tokens / self.main_forwards, 2) if self.main_forwards else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "accepted_tokens": self.accepted,
+            "acceptance_rate": self.acceptance_rate,
+            "tokens_per_main_step": self.tokens_per_main_step,
+            "tokens_per_sec": round(self.new_tokens / self.elapsed_ms * 1000, 2) if self.elapsed_ms else None,
+        }
+
+
+class _ForwardCounter:
+    """with 블록 동안 본 모델/draft forward 호출 수 (다른 요청 스레드의 호출은 제외)."""
+
+    def __init__(self, model, draft):
+        self.model = model
+        self.draft = draft
+        self.main = 0
+        self.drafts = 0
+        self._thread = None
+        self._handles = []
+
+    def _hook(self, attr: str):
+        def _count(module, args, output):
+            if threading.get_ident() == self._thread:
+                setattr(self, attr, getattr(self, attr) + 1)
+        return _count
+
+    def __enter__(self):
+        self._thread = threading.get_ident()
+        self._handles = [
+            self.model.register_forward_hook(self._hook("main")),
+            self.draft.register_forward_hook(self._hook("drafts")),
+        ]
+        return self
+
+    def __exit__(self, *exc):
+        for h in self._handles:
+            h.remove()
+        self._handles = []
+
+
+def _vocab_matches(tokenizer, draft_tokenizer) -> bool:
+    if len(tokenizer) != len(draft_tokenizer):
+        return False
+    return tokenizer.get_vocab() == draft_tokenizer.get_vocab()
+
+
+class AssistedDecoder:
+    def __init__(
+        self,
+        num_tokens: int = ASSISTED_NUM_TOKENS,
+        schedule: str = ASSISTED_SCHEDULE,
+        confidence_threshold: float = ASSISTED_CONFIDENCE_THRESHOLD,
+    ):
+        self.num_tokens = num_tokens
+        self.schedule = schedule
+        self.confidence_threshold = confidence_threshold
+        self._lock = threading.Lock()
+        # (draft 이름, 본 모델 id) → 비활성 사유. 요청마다 다시 로드 시도하지 않도록 기록
+        self._disabled: Dict[Tuple[str, int], str] = {}
+        # draft별 누적 통계
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def _load_draft(self, name: str, model):
+        """본 모델과 같은 device/dtype 으로 draft (tokenizer, model) 로드 (registry 공유)."""
+        from transformers import AutoTokenizer
+
+        device = model.device
+        if device.type == "cpu":
+            import cpu_backend
+
+            mode = getattr(model, "cpu_inference_mode", None) or cpu_backend.resolve_mode()
+
+            def _load():
+                return AutoTokenizer.from_pretrained(name), cpu_backend.from_pretrained(name, mode)
+
+            return registry.get(name, _load, dtype=mode, device="cpu")
+
+        from transformers import AutoModelForCausalLM
+
+        def _load():
+            draft = AutoModelForCausalLM.from_pretrained(name, torch_dtype=model.dtype).to(device)
+            draft.eval()
+            return AutoTokenizer.from_pretrained(name), draft
+
+        return registry.get(name, _load, dtype=model.dtype, device=str(device))
+
+    def draft_for(self, name: str, tokenizer, model):
+        """
+        본 모델(model)에 쓸 draft 모델. 로드 실패/tokenizer 불일치면 None (사유는 stats()["disabled"]).
+        """
+        key = (name, id(model))
+        with self._lock:
+            if key in self._disabled:
+                return None
+        if name == getattr(model, "name_or_path", None):
+            reason = "draft is the main model"
+            draft = None
+        else:
+            try:
+                draft_tok, draft = self._load_draft(name, model)
+                reason = None if _vocab_matches(tokenizer, draft_tok) else "tokenizer vocab differs from main model"
+            except Exception as e:
+                draft, reason = None, f"load failed: {e}"
+        if reason is not None:
+            print(f"[assisted] draft {name} disabled: {reason}")
+            with self._lock:
+                self._disabled[key] = reason
+            return None
+
+        # transformers는 제안 토큰 수 설정을 draft의 generation_config 에서 읽음
+        draft.generation_config.num_assistant_tokens = self.num_tokens
+        draft.generation_config.num_assistant_tokens_schedule = self.schedule
+        draft.generation_config.assistant_confidence_threshold = self.confidence_threshold
+        return draft
+
+    def generate(self, model, draft, **kwargs) -> Tuple[Any, AssistStats]:
+        """model.generate(assistant_model=draft, **kwargs) + 수락률/속도 기록. input_ids는 batch 1."""
+        name = getattr(draft, "name_or_path", None) or "draft"
+        prompt_len = kwargs["input_ids"].shape[1]
+        t0 = time.perf_counter()
+        with _ForwardCounter(model, draft) as counter:
+            out = model.generate(assistant_model=draft, **kwargs)
+        stats = AssistStats(
+            draft_model=name,
+            new_tokens=int(out.shape[1] - prompt_len),
+            main_forwards=counter.main,
+            draft_forwards=counter.drafts,
+            elapsed_ms=round((time.perf_counter() - t0) * 1000, 1),
+        )
+        self._record(stats)
+        print(
+            f"[assisted] {name}: {stats.new_tokens} tokens, acceptance {stats.acceptance_rate}, "
+            f"{stats.tokens_per_main_step} tokens/step, {stats.elapsed_ms:.0f}ms"
+        )
+        return out, stats
+
+    def _record(self, stats: AssistStats) -> None:
+        with self._lock:
+            t = self._totals.setdefault(stats.draft_model, dict(
+                requests=0, new_tokens=0, main_forwards=0, draft_forwards=0, elapsed_ms=0.0,
+            ))
+            t["requests"] += 1
+            t["new_tokens"] += stats.new_tokens
+            t["main_forwards"] += stats.main_forwards
+            t["draft_forwards"] += stats.draft_forwards
+            t["elapsed_ms"] += stats.elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            drafts = {}
+            for name, t in self._totals.items():
+                s = AssistStats(name, t["new_tokens"], t["main_forwards"], t["draft_forwards"], t["elapsed_ms"])
+                drafts[name] = {"requests": t["requests"], **s.to_dict()}
+                drafts[name].pop("draft_model")
+            return {
+                "num_assistant_tokens": self.num_tokens,
+                "schedule": self.schedule,
+                "confidence_threshold": self.confidence_threshold,
+                "configured": {"qwen": QWEN_DRAFT_MODEL or None, "kanana": KANANA_DRAFT_MODEL or None},
+                "drafts": drafts,
+                "disabled": {name: reason for (name, _), reason in self._disabled.items()},
+            }
+
+
+# 프로세스 전역 인스턴스
+assisted_decoder = AssistedDecoder()
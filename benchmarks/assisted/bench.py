@@ -0,0 +1,158 @@
+# bench.py
+# 2025-12-06
+"""
+assisted decoding (assisted_decoding.py) 유무에 따른 생성 속도 비교
+ - 같은 리포트 프롬프트를 draft 없이 / draft와 같이 greedy 생성 (번갈아 측정)
+ - 측정: 생성 시간, tokens/sec, speedup, draft 수락률, 본 모델 step당 토큰 수, greedy 출력 일치 여부
+ - CPU면 본 모델/draft 모두 cpu_backend 모드(CPU_INFERENCE_MODE)로 로드
+   python benchmarks/assisted/bench.py --model Qwen/Qwen2.5-1.5B-Instruct --draft Qwen/Qwen2.5-0.5B-Instruct --output assisted_bench.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(HERE))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from assisted_decoding import AssistedDecoder
+from report.prompt_builder import build_report_prompt
+
+# 합성 거래 내역 생성기는 리포트 프롬프트 벤치마크 것을 그대로 사용 (파일명이 같아서 경로로 로드)
+_spec = importlib.util.spec_from_file_location(
+    "report_prompt_bench", os.path.join(root_dir, "benchmarks", "report_prompt", "bench.py")
+)
+report_prompt_bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(report_prompt_bench)
+
+
+def load_main(name: str):
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    if torch.cuda.is_available():
+        model = AutoModelForCausalLM.from_pretrained(name, torch_dtype="auto", device_map="auto")
+    else:
+        import cpu_backend
+
+        model = cpu_backend.from_pretrained(name)
+    model.eval()
+    return tokenizer, model
+
+
+def prompts(tokenizer, n: int, rows: int) -> List[Any]:
+    out = []
+    for i in range(n):
+        full = report_prompt_bench.make_transactions(rows * 3, seed=3000 + i)
+        messages = build_report_prompt(
+            full[-rows:], report_prompt_bench.QUESTION, report_prompt_bench.aggregates_of(full), tokenizer
+        ).messages
+        text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        out.append(tokenizer([text], return_tensors="pt"))
+    return out
+
+
+def run(a) -> Dict[str, Any]:
+    import torch
+
+    tokenizer, model = load_main(a.model)
+    decoder = AssistedDecoder(a.num_assistant_tokens, a.schedule, a.confidence_threshold)
+    t0 = time.perf_counter()
+    draft = decoder.draft_for(a.draft, tokenizer, model)
+    if draft is None:
+        raise SystemExit(f"[bench] draft unusable: {decoder.stats()['disabled']}")
+    draft_load_s = time.perf_counter() - t0
+
+    gen = dict(
+        max_new_tokens=a.new_tokens,
+        do_sample=False,
+        pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+    )
+    if a.fixed_length:
+        # 랜덤 초기화 모델처럼 EOS가 일찍 나오는 경우에도 같은 길이로 비교
+        gen["min_new_tokens"] = a.new_tokens
+
+    cases = []
+    batches = prompts(tokenizer, a.requests, a.rows)
+    # 첫 호출의 커널 초기화는 측정에서 제외
+    with torch.no_grad():
+        model.generate(**batches[0].to(model.device), max_new_tokens=2, do_sample=False)
+    for inputs in batches:
+        inputs = inputs.to(model.device)
+        with torch.no_grad():
+            t = time.perf_counter()
+            base = model.generate(**inputs, **gen)
+            base_s = time.perf_counter() - t
+            assisted, stats = decoder.generate(model, draft, **inputs, **gen)
+        n_base = int(base.shape[1] - inputs["input_ids"].shape[1])
+        cases.append({
+            "prompt_tokens": int(inputs["input_ids"].shape[1]),
+            "baseline_tokens": n_base,
+            "baseline_ms": round(base_s * 1000, 1),
+            "baseline_tokens_per_sec": round(n_base / base_s, 2),
+            "assisted": stats.to_dict(),
+            "speedup": round(base_s * 1000 / stats.elapsed_ms, 3) if stats.elapsed_ms else None,
+            "same_output": bool(torch.equal(base, assisted)),
+        })
+        print(
+            f"[bench] {n_base} tokens: {cases[-1]['baseline_ms']}ms -> {stats.elapsed_ms}ms "
+            f"(x{cases[-1]['speedup']}, acceptance {stats.acceptance_rate})"
+        )
+
+    total = decoder.stats()["drafts"].get(draft.name_or_path, {})
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": a.model,
+            "draft": a.draft,
+            "device": str(model.device),
+            "cpu_mode": getattr(model, "cpu_inference_mode", None),
+            "num_assistant_tokens": a.num_assistant_tokens,
+            "schedule": a.schedule,
+            "confidence_threshold": a.confidence_threshold,
+            "draft_load_seconds": round(draft_load_s, 2),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "summary": {
+            "requests": len(cases),
+            "median_speedup": round(statistics.median(c["speedup"] for c in cases), 3),
+            "acceptance_rate": total.get("acceptance_rate"),
+            "tokens_per_main_step": total.get("tokens_per_main_step"),
+            "baseline_tokens_per_sec": round(statistics.median(c["baseline_tokens_per_sec"] for c in cases), 2),
+            "assisted_tokens_per_sec": round(statistics.median(c["assisted"]["tokens_per_sec"] for c in cases), 2),
+            "all_outputs_identical": all(c["same_output"] for c in cases),
+        },
+        "cases": cases,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="assisted decoding 속도/수락률 비교")
+    ap.add_argument("--model", default=os.getenv("CHATBOT_MODEL", "Qwen/Qwen2.5-1.5B-Instruct"))
+    ap.add_argument("--draft", default=os.getenv("QWEN_DRAFT_MODEL") or "Qwen/Qwen2.5-0.5B-Instruct")
+    ap.add_argument("--requests", type=int, default=5)
+    ap.add_argument("--rows", type=int, default=30, help="리포트 프롬프트 거래 수")
+    ap.add_argument("--new-tokens", type=int, default=200)
+    ap.add_argument("--fixed-length", action="store_true", help="min_new_tokens=new_tokens (EOS 무시)")
+    ap.add_argument("--num-assistant-tokens", type=int, default=5)
+    ap.add_argument("--schedule", default="heuristic", choices=["heuristic", "constant"])
+    ap.add_argument("--confidence-threshold", type=float, default=0.4, help="draft 제안 중단 확률 (0이면 항상 끝까지)")
+    ap.add_argument("--output", help="결과 JSON 저장 경로")
+    a = ap.parse_args()
+
+    result = run(a)
+    if a.output:
+        with open(a.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[bench] saved -> {a.output}")
+    print(json.dumps(result["summary"], ensure_ascii=False, indent=2))
@@ -0,0 +1,151 @@
+# bench.py
+# 2025-12-06
+"""
+CPU 추론 모드별 (cpu_backend.py: fp32 / bf16 / int8) 속도·메모리 비교
+ - 모드마다 별도 프로세스에서 로드 → 프로세스 RSS가 다른 모드 영향을 받지 않음
+ - 측정: 로드 시간, 로드 후 RSS, 최대 RSS, 모델 크기(registry 추정), prefill(첫 토큰) ms, decode tokens/sec
+ - 프롬프트는 실제 리포트 프롬프트 (report/prompt_builder.py + 합성 거래 내역)
+   python benchmarks/cpu_backend/bench.py --model Qwen/Qwen2.5-1.5B-Instruct --threads 8 --output cpu_bench.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(HERE))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+
+def _report_messages(tokenizer, rows: int):
+    # 합성 거래 내역 생성기는 리포트 프롬프트 벤치마크 것을 그대로 사용 (파일명이 같아서 경로로 로드)
+    from report.prompt_builder import build_report_prompt
+
+    spec = importlib.util.spec_from_file_location(
+        "report_prompt_bench", os.path.join(root_dir, "benchmarks", "report_prompt", "bench.py")
+    )
+    rp = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rp)
+    full = rp.make_transactions(rows * 3, seed=2025)
+    return build_report_prompt(full[-rows:], rp.QUESTION, rp.aggregates_of(full), tokenizer).messages
+
+
+def run_mode(model_name: str, mode: str, rows: int, new_tokens: int, repeat: int) -> Dict[str, Any]:
+    """현재 프로세스에서 한 모드만 측정 (--child)."""
+    import torch
+    from transformers import AutoTokenizer
+
+    import cpu_backend
+    from model_registry import estimate_model_bytes
+
+    rss_before = cpu_backend.rss_mb()
+    t0 = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = cpu_backend.from_pretrained(model_name, mode)
+    load_s = time.perf_counter() - t0
+    rss_loaded = cpu_backend.rss_mb()
+
+    text = tokenizer.apply_chat_template(_report_messages(tokenizer, rows), tokenize=False, add_generation_prompt=True)
+    inputs = tokenizer([text], return_tensors="pt")
+    gen = dict(do_sample=False, pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id)
+
+    def _timed(n: int) -> float:
+        t = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs, max_new_tokens=n, min_new_tokens=n, **gen)
+        return time.perf_counter() - t
+
+    # 첫 호출의 커널/메모리 초기화는 측정에서 제외
+    _timed(2)
+    prefill = statistics.median(_timed(1) for _ in range(repeat))
+    total = statistics.median(_timed(new_tokens) for _ in range(repeat))
+    decode = max(total - prefill, 1e-9)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": getattr(model, "cpu_inference_mode", mode),
+        "requested_mode": mode,
+        "threads": cpu_backend.configure_threads(),
+        "load_seconds": round(load_s, 2),
+        "model_mb": round(estimate_model_bytes(model) / 1024 / 1024, 1),
+        "rss_mb_before_load": rss_before,
+        "rss_mb_loaded": rss_loaded,
+        "rss_mb_peak": round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1),
+        "prompt_tokens": int(inputs["input_ids"].shape[1]),
+        "prefill_ms": round(prefill * 1000, 1),
+        "new_tokens": new_tokens,
+        "decode_tokens_per_sec": round((new_tokens - 1) / decode, 2),
+        "end_to_end_tokens_per_sec": round(new_tokens / total, 2),
+    }
+
+
+def run_child(a, mode: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    if a.threads:
+        env["TORCH_NUM_THREADS"] = str(a.threads)
+    if a.interop_threads:
+        env["TORCH_INTEROP_THREADS"] = str(a.interop_threads)
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--child", mode,
+        "--model", a.model, "--rows", str(a.rows), "--new-tokens", str(a.new_tokens), "--repeat", str(a.repeat),
+    ]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        return {"requested_mode": mode, "error": f"exit {proc.returncode}"}
+    # 자식 프로세스는 마지막 줄에 결과 JSON 출력
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="CPU 추론 모드별 tokens/sec, RSS 비교")
+    ap.add_argument("--model", default=os.getenv("CHATBOT_MODEL", "Qwen/Qwen2.5-1.5B-Instruct"))
+    ap.add_argument("--modes", default="fp32,bf16,int8", help="비교할 모드 (쉼표 구분, auto 포함 가능)")
+    ap.add_argument("--threads", type=int, default=0, help="TORCH_NUM_THREADS (0이면 torch 기본값)")
+    ap.add_argument("--interop-threads", type=int, default=0, help="TORCH_INTEROP_THREADS")
+    ap.add_argument("--rows", type=int, default=30, help="리포트 프롬프트 거래 수")
+    ap.add_argument("--new-tokens", type=int, default=64, help="decode 측정 생성 토큰 수")
+    ap.add_argument("--repeat", type=int, default=3, help="측정 반복 (중앙값)")
+    ap.add_argument("--output", help="결과 JSON 저장 경로")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    a = ap.parse_args()
+
+    if a.child:
+        print(json.dumps(run_mode(a.model, a.child, a.rows, a.new_tokens, a.repeat)))
+        sys.exit(0)
+
+    results = []
+    for mode in [m.strip() for m in a.modes.split(",") if m.strip()]:
+        r = run_child(a, mode)
+        results.append(r)
+        if "error" not in r:
+            print(
+                f"[bench] {mode}: {r['decode_tokens_per_sec']} tok/s, prefill {r['prefill_ms']}ms, "
+                f"RSS {r['rss_mb_loaded']}MB (peak {r['rss_mb_peak']}MB)"
+            )
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": a.model,
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "modes": results,
+    }
+    if a.output:
+        with open(a.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[bench] saved -> {a.output}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,130 @@
+# bench.py
+# 2025-12-06
+"""
+시스템 프롬프트 KV 캐시(prefix_cache.py) 유무에 따른 TTFT 비교
+ - report: Qwen 리포트 프롬프트 (report/prompt_builder.py), 요청마다 다른 거래 샘플
+ - map: Kanana 기사 요약(map) 프롬프트 (trend_summary._map_messages), 기사마다 다른 본문
+ - TTFT = 프롬프트 → 첫 토큰 1개 생성까지. 캐시 사용 시 prefix 복사 비용 포함, 최초 prefix prefill은 제외
+   python benchmarks/prefix_cache/bench.py --model Qwen/Qwen2.5-1.5B-Instruct --output prefix_bench.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(HERE))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from prefix_cache import PrefixKVCache
+from report.prompt_builder import build_report_prompt
+
+# 합성 거래 내역 생성기는 리포트 프롬프트 벤치마크 것을 그대로 사용 (파일명이 같아서 경로로 로드)
+_spec = importlib.util.spec_from_file_location(
+    "report_prompt_bench", os.path.join(root_dir, "benchmarks", "report_prompt", "bench.py")
+)
+report_prompt_bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(report_prompt_bench)
+QUESTION = report_prompt_bench.QUESTION
+aggregates_of = report_prompt_bench.aggregates_of
+make_transactions = report_prompt_bench.make_transactions
+
+
+def report_prompts(tokenizer, n: int, rows: int) -> List[List[Dict[str, str]]]:
+    out = []
+    for i in range(n):
+        full = make_transactions(rows * 3, seed=1000 + i)
+        out.append(build_report_prompt(full[-rows:], QUESTION, aggregates_of(full), tokenizer).messages)
+    return out
+
+
+def map_prompts(n: int, body_chars: int) -> List[List[Dict[str, str]]]:
+    import trend_summary
+
+    out = []
+    for i in range(n):
+        art = trend_summary.Article(url=f"https://example.com/{i}", title=f"소비 트렌드 기사 {i}",
+                                    source="bench", published_at=None, content="")
+        body = (f"{i}번째 기사 본문. 편의점 커피 매출이 전년 대비 {i % 30}% 증가했다. " * 50)[:body_chars]
+        out.append(trend_summary._map_messages(art, body))
+    return out
+
+
+def ttft_ms(tokenizer, model, messages, cache: PrefixKVCache, add_special_tokens: bool) -> Dict[str, Any]:
+    import torch
+
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    ids = tokenizer(text, add_special_tokens=add_special_tokens, return_tensors="pt")["input_ids"].to(model.device)
+    t0 = time.perf_counter()
+    past, cached = cache.past_key_values(tokenizer, model, messages, text, ids, add_special_tokens)
+    with torch.no_grad():
+        model.generate(ids, past_key_values=past, max_new_tokens=1, do_sample=False)
+    if model.device.type == "cuda":
+        torch.cuda.synchronize()
+    return {"ms": (time.perf_counter() - t0) * 1000, "prompt_tokens": ids.shape[1], "cached": cached}
+
+
+def measure(tokenizer, model, prompts, add_special_tokens: bool) -> Dict[str, Any]:
+    off = PrefixKVCache(enabled=False)
+    on = PrefixKVCache(enabled=True)
+    # prefix prefill(최초 1회)과 커널 초기화는 측정에서 제외
+    ttft_ms(tokenizer, model, prompts[0], on, add_special_tokens)
+    ttft_ms(tokenizer, model, prompts[0], off, add_special_tokens)
+
+    base, cached = [], []
+    for messages in prompts:
+        # 순서 영향이 없도록 번갈아 측정
+        base.append(ttft_ms(tokenizer, model, messages, off, add_special_tokens))
+        cached.append(ttft_ms(tokenizer, model, messages, on, add_special_tokens))
+    b = statistics.median(r["ms"] for r in base)
+    c = statistics.median(r["ms"] for r in cached)
+    return {
+        "requests": len(prompts),
+        "avg_prompt_tokens": round(statistics.mean(r["prompt_tokens"] for r in base), 1),
+        "prefix_tokens": cached[0]["cached"],
+        "ttft_ms_without_cache": round(b, 2),
+        "ttft_ms_with_cache": round(c, 2),
+        "ttft_ratio": round(c / b, 3) if b else None,
+        "cache": on.stats(),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="prefix KV 캐시 TTFT 비교")
+    ap.add_argument("--model", default=os.getenv("CHATBOT_MODEL", "Qwen/Qwen2.5-1.5B-Instruct"))
+    ap.add_argument("--requests", type=int, default=10)
+    ap.add_argument("--rows", type=int, default=30, help="report 프롬프트 거래 수")
+    ap.add_argument("--body-chars", type=int, default=1200, help="map 프롬프트 기사 본문 길이")
+    ap.add_argument("--output", help="결과 JSON 저장 경로")
+    a = ap.parse_args()
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(a.model)
+    model = AutoModelForCausalLM.from_pretrained(a.model, torch_dtype="auto")
+    model.eval()
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": a.model,
+            "device": str(model.device),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        # qwen_model 은 add_special_tokens 기본값, trend_summary 는 False 로 토큰화
+        "report": measure(tokenizer, model, report_prompts(tokenizer, a.requests, a.rows), True),
+        "map": measure(tokenizer, model, map_prompts(a.requests, a.body_chars), False),
+    }
+    if a.output:
+        with open(a.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[bench] saved -> {a.output}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,162 @@
+# bench.py
+# 2025-12-06
+"""
+영수증 파싱 벤치마크 (속도 + 필드 정확도)
+ - 코퍼스: corpus.json (make_corpus.py 로 생성한 합성 영수증 + 정답)
+ - 속도: parse_receipt 전체 receipts/sec, 함수별(normalize, extract_*, suggest_category) 영수증당 평균 µs
+ - 정확도: 필드별 정답 일치율 (merchant / amount / date / items / suggested_category) + 틀린 영수증 id
+ - 결과 JSON 저장 후 이전 결과와 비교:
+   python benchmarks/receipt_parsing/bench.py --output bench_before.json
+   python benchmarks/receipt_parsing/bench.py --compare bench_before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(HERE))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+# 캐시/정규화는 파싱과 무관하지만 import 시 설정을 읽으므로 벤치에서는 끔
+os.environ.setdefault("OCR_CACHE_ENABLED", "0")
+
+from ocr import main as ocr
+
+FIELDS = ["merchant", "amount", "date", "items", "suggested_category"]
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["receipts"]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root_dir, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _time_per_receipt(fn: Callable[[Any], Any], args: List[Any], repeat: int) -> float:
+    """args 전체를 repeat번 돌린 뒤 호출 1회당 평균 µs."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for a in args:
+            fn(a)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(args) * 1e6
+
+
+def measure_speed(receipts: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    texts = [r["text"] for r in receipts]
+    lines = [ocr.normalize(t) for t in texts]
+    merchants = [ocr.extract_merchant(ln) for ln in lines]
+    items = [ocr.extract_items(ln) for ln in lines]
+
+    per_function = {
+        "normalize": _time_per_receipt(ocr.normalize, texts, repeat),
+        "extract_merchant": _time_per_receipt(ocr.extract_merchant, lines, repeat),
+        "extract_amount": _time_per_receipt(ocr.extract_amount, texts, repeat),
+        "extract_date": _time_per_receipt(ocr.extract_date, texts, repeat),
+        "extract_items": _time_per_receipt(ocr.extract_items, lines, repeat),
+        "suggest_category": _time_per_receipt(
+            lambda mi: ocr.suggest_category(mi[0], mi[1]), list(zip(merchants, items)), repeat
+        ),
+    }
+    parse_us = _time_per_receipt(ocr.parse_receipt, texts, repeat)
+    return {
+        "receipts_per_sec": round(1e6 / parse_us, 1),
+        "parse_receipt_us": round(parse_us, 2),
+        "per_function_us": {k: round(v, 2) for k, v in per_function.items()},
+        "sum_of_functions_us": round(sum(per_function.values()), 2),
+    }
+
+
+def measure_accuracy(receipts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    correct = {f: 0 for f in FIELDS}
+    failures: Dict[str, List[str]] = {f: [] for f in FIELDS}
+    all_correct = 0
+    for r in receipts:
+        got = ocr.parse_receipt(r["text"]).model_dump()
+        ok_all = True
+        for f in FIELDS:
+            if got[f] == r["expected"][f]:
+                correct[f] += 1
+            else:
+                failures[f].append(r["id"])
+                ok_all = False
+        all_correct += ok_all
+    n = len(receipts)
+    return {
+        "field_accuracy": {f: round(correct[f] / n, 4) for f in FIELDS},
+        "all_fields_accuracy": round(all_correct / n, 4),
+        "failures": failures,
+    }
+
+
+def run(corpus_path: str, repeat: int) -> Dict[str, Any]:
+    receipts = load_corpus(corpus_path)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": os.path.relpath(corpus_path, root_dir),
+            "receipts": len(receipts),
+            "repeat": repeat,
+        },
+        "speed": measure_speed(receipts, repeat),
+        "accuracy": measure_accuracy(receipts),
+    }
+
+
+def compare(cur: Dict[str, Any], prev: Dict[str, Any]) -> Dict[str, Any]:
+    """이전 결과 대비 변화 (속도는 비율, 정확도는 차이)."""
+    def ratio(a, b):
+        return round(a / b, 3) if b else None
+
+    cs, ps = cur["speed"], prev["speed"]
+    ca, pa = cur["accuracy"], prev["accuracy"]
+    return {
+        "previous_commit": prev["meta"].get("git_commit"),
+        "receipts_per_sec_ratio": ratio(cs["receipts_per_sec"], ps["receipts_per_sec"]),
+        "per_function_time_ratio": {
+            k: ratio(v, ps["per_function_us"].get(k)) for k, v in cs["per_function_us"].items()
+        },
+        "field_accuracy_delta": {
+            f: round(ca["field_accuracy"][f] - pa["field_accuracy"].get(f, 0), 4) for f in FIELDS
+        },
+        "newly_failing": {
+            f: sorted(set(ca["failures"][f]) - set(pa["failures"].get(f, []))) for f in FIELDS
+        },
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="영수증 파싱 벤치마크")
+    ap.add_argument("--corpus", default=os.path.join(HERE, "corpus.json"))
+    ap.add_argument("--repeat", type=int, default=20, help="속도 측정 반복 (최솟값 사용)")
+    ap.add_argument("--output", help="결과 JSON 저장 경로")
+    ap.add_argument("--compare", help="비교할 이전 결과 JSON")
+    a = ap.parse_args()
+
+    result = run(a.corpus, a.repeat)
+    if a.compare:
+        with open(a.compare, "r", encoding="utf-8") as f:
+            result["compare"] = compare(result, json.load(f))
+    if a.output:
+        with open(a.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[bench] saved -> {a.output}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,152 @@
+# make_corpus.py
+# 2025-12-06
+"""
+영수증 OCR 텍스트 합성 코퍼스 생성기 (정답 필드 포함)
+ - 실제 영수증 구조(상호/사업자 정보/일시/품목/합계/결제 정보)를 흉내낸 가짜 데이터. 개인정보 없음
+ - 정답은 생성 과정에서 알고 있는 값 (현재 파서 출력이 아님) → 파서 정확도 측정용
+ - 같은 seed면 같은 코퍼스: python benchmarks/receipt_parsing/make_corpus.py --n 120 --seed 2025
+"""
+import argparse
+import json
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT = os.path.join(HERE, "corpus.json")
+
+# (상호, 정답 카테고리, 품목 후보)
+STORES: List[Tuple[str, str, List[Tuple[str, int]]]] = [
+    ("스타벅스 강남역점", "카페", [("아메리카노", 4500), ("카페라떼", 5000), ("자몽허니블랙티", 5700), ("치즈케이크", 5900)]),
+    ("STARBUCKS 서면점", "카페", [("ICED AMERICANO", 4500), ("VANILLA LATTE", 5900)]),
+    ("투썸플레이스 홍대점", "카페", [("아메리카노", 4700), ("스트로베리 초콜릿 생크림", 6800)]),
+    ("메가커피 신림점", "카페", [("메가리카노", 3000), ("꿀아메리카노", 2700), ("딸기라떼", 3700)]),
+    ("빽다방 역삼점", "카페", [("앗메리카노", 2000), ("원조커피", 3000)]),
+    ("동네빵집 베이커리", "카페", [("소금빵", 3200), ("크루아상", 3800), ("식빵", 4500)]),
+    ("김밥천국 신촌점", "식비", [("참치김밥", 4500), ("라면", 4000), ("돈까스", 8500), ("떡볶이", 4500)]),
+    ("교촌치킨 관악점", "식비", [("허니콤보", 23000), ("레드윙", 21000), ("콜라 1.25L", 2500)]),
+    ("한솥도시락 사당점", "식비", [("치킨마요", 3900), ("돈까스도련님", 5500)]),
+    ("맥도날드 종로점", "식비", [("빅맥 세트", 7200), ("맥너겟 4조각", 2700)]),
+    ("버거킹 건대점", "식비", [("와퍼 세트", 9100), ("치즈스틱", 2500)]),
+    ("원조국밥 본점", "식비", [("돼지국밥", 9000), ("순대국밥", 9500), ("공기밥", 1000)]),
+    ("다이소 잠실점", "생활", [("수납박스", 3000), ("세제", 2000), ("주방장갑", 1000)]),
+    ("올리브영 명동점", "생활", [("선크림", 18900), ("립밤", 5900)]),
+    ("CU 편의점 합정점", "생활", [("삼각김밥", 1500), ("생수 500ml", 900), ("컵라면", 1800)]),
+    ("유니클로 강남점", "의류", [("히트텍 티셔츠", 19900), ("양말 3팩", 12900)]),
+    ("무신사 스탠다드 성수", "의류", [("후드티", 39900), ("와이드 슬랙스", 35900)]),
+    ("CGV 용산아이파크몰", "문화", [("일반 2D", 15000), ("팝콘 L", 7000)]),
+    ("교보문고 광화문점", "문화", [("파이썬 입문서", 28000), ("소설", 15800)]),
+    ("온누리약국", "의료/건강", [("감기약", 4500), ("밴드", 2000)]),
+    ("바른치과의원", "의료/건강", [("진료비", 12300)]),
+    ("카카오T 택시", "교통", []),
+    ("코레일 KTX", "교통", []),
+    ("GS25 역삼점", "생활", [("도시락", 4900), ("커피우유", 1600)]),
+]
+
+MOBILE_STATUS = ["3:29 1", "9:41", "12:07 LTE", "오후 3:12"]
+HEADER_NOISE = ["[고객용]", "전자영수증", "[재발행]"]
+TOTAL_FORMATS = ["합계 {t}", "합계: {t}원", "총 합계 {t}원", "결제금액 {t}원", "TOTAL {t}", "합계\n{t}원", "총액 {t}"]
+PAY_FORMATS = ["신용카드 {t}원", "카드결제 {t}", "현금 {t}원"]
+
+
+def money(v: int) -> str:
+    return f"{v:,}"
+
+
+def make_receipt(rnd: random.Random, rid: int) -> Dict[str, Any]:
+    store, category, menu = rnd.choice(STORES)
+    y, m, d = 2025, rnd.randint(1, 12), rnd.randint(1, 28)
+    hh, mm = rnd.randint(7, 23), rnd.randint(0, 59)
+
+    lines: List[str] = []
+    if rnd.random() < 0.3:
+        lines.append(rnd.choice(MOBILE_STATUS))
+    if rnd.random() < 0.5:
+        lines.append(rnd.choice(HEADER_NOISE))
+    lines.append(store)
+    lines.append(f"사업자번호 {rnd.randint(100, 999)}-{rnd.randint(10, 99)}-{rnd.randint(10000, 99999)}")
+    if rnd.random() < 0.6:
+        lines.append(f"대표 김*{rnd.choice('민서지현우')}  TEL 02-{rnd.randint(100, 9999)}-{rnd.randint(1000, 9999)}")
+
+    fmt = rnd.randrange(5)
+    if fmt == 0:
+        lines.append(f"{y}.{m:02d}.{d:02d} {hh:02d}:{mm:02d}")
+        date = f"{y:04d}-{m:02d}-{d:02d}"
+    elif fmt == 1:
+        lines.append(f"거래일시 {y}-{m:02d}-{d:02d} {hh:02d}:{mm:02d}:{rnd.randint(0, 59):02d}")
+        date = f"{y:04d}-{m:02d}-{d:02d}"
+    elif fmt == 2:
+        lines.append(f"{y}년 {m}월 {d}일 {hh}시 {mm}분")
+        date = f"{y:04d}-{m:02d}-{d:02d}"
+    elif fmt == 3:
+        lines.append(f"{y % 100:02d}/{m:02d}/{d:02d} {hh:02d}:{mm:02d}")
+        date = f"{y:04d}-{m:02d}-{d:02d}"
+    else:
+        lines.append(f"{m}월 {d}일 이용")
+        date = f"{m:02d}-{d:02d}"
+
+    items: List[Dict[str, Any]] = []
+    total = 0
+    if menu:
+        lines.append("품명 수량 금액")
+        for name, price in rnd.sample(menu, k=rnd.randint(1, len(menu))):
+            qty = rnd.randint(1, 3)
+            amount = price * qty
+            total += amount
+            style = rnd.randrange(3)
+            if style == 0:
+                lines.append(f"{name} {qty} {money(amount)}")
+            elif style == 1:
+                lines.append(f"{name} {qty}개 {money(amount)}원")
+            else:
+                lines.append(f"{name} {qty} EA {money(amount)}")
+            items.append({"name": name, "qty": qty, "price": amount})
+    else:
+        total = rnd.randrange(3000, 60000, 100)
+        lines.append(f"운행요금 {money(total)}원" if "택시" in store else f"승차권 1매 {money(total)}원")
+
+    if total >= 1000 and rnd.random() < 0.5:
+        vat = total // 11
+        lines.append(f"과세물품가액 {money(total - vat)}")
+        lines.append(f"부가세 {money(vat)}")
+    lines.append(rnd.choice(TOTAL_FORMATS).format(t=money(total)))
+    if rnd.random() < 0.7:
+        lines.append(rnd.choice(PAY_FORMATS).format(t=money(total)))
+        lines.append(f"승인번호 {rnd.randint(10000000, 99999999)}")
+    if rnd.random() < 0.3:
+        lines.append("감사합니다")
+
+    text = "\n".join(lines)
+    # OCR 노이즈: 가끔 공백 두 칸 / 줄 끝 공백
+    if rnd.random() < 0.3:
+        text = text.replace(" ", "  ", 1) + " "
+
+    return {
+        "id": f"r{rid:03d}",
+        "text": text,
+        "expected": {
+            "merchant": store,
+            "amount": total,
+            "date": date,
+            "items": items,
+            "suggested_category": category,
+        },
+    }
+
+
+def make_corpus(n: int, seed: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [make_receipt(rnd, i) for i in range(n)]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=120)
+    ap.add_argument("--seed", type=int, default=2025)
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    a = ap.parse_args()
+
+    corpus = make_corpus(a.n, a.seed)
+    with open(a.out, "w", encoding="utf-8") as f:
+        json.dump({"seed": a.seed, "receipts": corpus}, f, ensure_ascii=False, indent=1)
+    print(f"[make_corpus] {len(corpus)} receipts -> {a.out}")
@@ -0,0 +1,162 @@
+# bench.py
+# 2025-12-06
+"""
+소비 리포트 프롬프트 before/after 비교 (report/prompt_builder.py)
+ - before: 거래 내역 JSON(indent=2), 집계 없음 (REPORT_PROMPT_FORMAT=json)
+ - after: 표 형식 거래 내역 + 기간 집계, 토큰 예산(--budget) 초과 시 샘플 축소
+ - 거래 수별 prefill 토큰 수(chat 템플릿 포함, 실제 tokenizer), --latency 면 prefill 시간(첫 토큰까지)도 측정
+   python benchmarks/report_prompt/bench.py --model Qwen/Qwen2.5-1.5B-Instruct --latency --output prompt_bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(os.path.dirname(HERE))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from report.prompt_builder import REPORT_PROMPT_MAX_TOKENS, build_report_prompt
+
+# (가맹점, 카테고리, 금액 범위)
+STORES = [
+    ("스타벅스 강남역점", "카페", (4500, 12000)),
+    ("메가커피 신림점", "카페", (2000, 6000)),
+    ("김밥천국 신촌점", "식비", (4000, 15000)),
+    ("교촌치킨 관악점", "식비", (18000, 32000)),
+    ("맘스터치 신촌점", "식비", (6000, 12000)),
+    ("카카오T", "교통", (4800, 30000)),
+    ("코레일 KTX", "교통", (8400, 59800)),
+    ("올리브영 홍대입구역점", "생활", (5000, 40000)),
+    ("다이소 잠실점", "생활", (1000, 15000)),
+    ("유니클로 강남점", "의류", (19900, 89000)),
+    ("CGV 용산아이파크몰", "문화", (7000, 30000)),
+    ("온누리약국", "의료/건강", (2000, 20000)),
+]
+
+QUESTION = "이번 달 소비를 요약하고 절약할 수 있는 부분을 알려줘."
+
+
+def make_transactions(n: int, seed: int) -> List[Dict[str, Any]]:
+    """날짜 오름차순 합성 거래 내역 (main._load_report_data 의 샘플과 같은 키)."""
+    rnd = random.Random(seed)
+    start = date(2025, 11, 1)
+    rows = []
+    for _ in range(n):
+        merchant, category, (lo, hi) = rnd.choice(STORES)
+        rows.append({
+            "date": str(start + timedelta(days=rnd.randrange(30))),
+            "merchant": merchant,
+            "amount": rnd.randrange(lo, hi, 100),
+            "category": category,
+        })
+    rows.sort(key=lambda r: r["date"])
+    return rows
+
+
+def aggregates_of(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    breakdown: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+    for r in rows:
+        breakdown[r["category"]] = breakdown.get(r["category"], 0) + r["amount"]
+        counts[r["category"]] = counts.get(r["category"], 0) + 1
+    return {
+        "total_spent": sum(breakdown.values()),
+        "transaction_count": len(rows),
+        "category_breakdown": breakdown,
+        "category_counts": counts,
+    }
+
+
+def prefill_ms(tokenizer, model, messages, repeat: int) -> float:
+    """프롬프트 → 첫 토큰 1개 생성까지 (= prefill) 최솟값 ms."""
+    import torch
+
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    inputs = tokenizer([text], return_tensors="pt").to(model.device)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            model.generate(**inputs, max_new_tokens=1, do_sample=False)
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 1)
+
+
+def run(model_name: str, rows_list: List[int], budget: int, seed: int, latency: bool, repeat: int) -> Dict[str, Any]:
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = None
+    if latency:
+        from transformers import AutoModelForCausalLM
+        model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype="auto")
+        model.eval()
+        # 첫 호출의 커널 초기화는 측정에서 제외
+        prefill_ms(tokenizer, model, [{"role": "user", "content": "안녕하세요"}], 1)
+
+    cases = []
+    for n in rows_list:
+        # 실제 API처럼 DB 집계는 전체 기간, 프롬프트에는 최근 n건 샘플
+        full = make_transactions(max(n, 1) * 3, seed)
+        sample = full[-n:] if n else []
+        aggregates = aggregates_of(full)
+
+        before = build_report_prompt(sample, QUESTION, tokenizer=tokenizer, fmt="json")
+        after = build_report_prompt(sample, QUESTION, aggregates, tokenizer, max_tokens=budget, fmt="compact")
+        unbounded = build_report_prompt(sample, QUESTION, aggregates, tokenizer, max_tokens=0, fmt="compact")
+        case = {
+            "rows": n,
+            "before_tokens": before.prompt_tokens,
+            "after_tokens_unbounded": unbounded.prompt_tokens,
+            "after_tokens": after.prompt_tokens,
+            "after_rows_used": after.rows_used,
+            "token_ratio": round(after.prompt_tokens / before.prompt_tokens, 3),
+            "before_chars": sum(len(m["content"]) for m in before.messages),
+            "after_chars": sum(len(m["content"]) for m in after.messages),
+        }
+        if latency:
+            case["before_prefill_ms"] = prefill_ms(tokenizer, model, before.messages, repeat)
+            case["after_prefill_ms"] = prefill_ms(tokenizer, model, after.messages, repeat)
+            case["prefill_ratio"] = round(case["after_prefill_ms"] / case["before_prefill_ms"], 3)
+        cases.append(case)
+        print(f"[bench] rows={n} tokens {case['before_tokens']} -> {case['after_tokens']} (rows used {after.rows_used})")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": model_name,
+            "tokenizer_vocab": len(tokenizer),
+            "budget_tokens": budget,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "cases": cases,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="리포트 프롬프트 토큰/prefill 비교")
+    ap.add_argument("--model", default=os.getenv("CHATBOT_MODEL", "Qwen/Qwen2.5-1.5B-Instruct"))
+    ap.add_argument("--rows", default="10,30,100", help="샘플 거래 수 (쉼표 구분)")
+    ap.add_argument("--budget", type=int, default=REPORT_PROMPT_MAX_TOKENS, help="프롬프트 토큰 예산")
+    ap.add_argument("--seed", type=int, default=2025)
+    ap.add_argument("--latency", action="store_true", help="모델을 올려서 prefill 시간도 측정")
+    ap.add_argument("--repeat", type=int, default=3, help="prefill 측정 반복 (최솟값 사용)")
+    ap.add_argument("--output", help="결과 JSON 저장 경로")
+    a = ap.parse_args()
+
+    rows_list = [int(x) for x in a.rows.split(",") if x.strip()]
+    result = run(a.model, rows_list, a.budget, a.seed, a.latency, a.repeat)
+    if a.output:
+        with open(a.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[bench] saved -> {a.output}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
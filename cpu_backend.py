@@ -0,0 +1,189 @@
+# cpu_backend.py
+# 2025-12-06
+"""
+GPU 없는 pod용 CPU 추론 백엔드 (Qwen 리포트, Kanana 요약 공용)
+ - CPU_INFERENCE_MODE
+   - fp32: 기존 동작 (float32 그대로)
+   - bf16: bfloat16으로 로드 → 가중치 메모리 1/2. AVX512-BF16/AMX 가 있는 CPU에서만 빨라짐
+   - int8: float32로 로드 후 nn.Linear 를 int8 dynamic quantization → Linear 가중치 1/4, 활성값은 실행 시 양자화
+   - auto: bf16 네이티브 지원 CPU면 bf16, 아니면 int8 (양자화 엔진이 없으면 fp32)
+ - torch intra-op / inter-op 스레드 수 (TORCH_NUM_THREADS, TORCH_INTEROP_THREADS, 0이면 torch 기본값)
+ - 모드별 tokens/sec, RSS 비교는 benchmarks/cpu_backend/bench.py
+ - torch는 함수 안에서 import (main.py 시작 시간에 영향 없도록)
+"""
+import os
+import threading
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+CPU_INFERENCE_MODE = os.getenv("CPU_INFERENCE_MODE", "fp32").lower()
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+MODES = ("fp32", "bf16", "int8")
+
+_threads_lock = threading.Lock()
+_threads_configured = False
+
+
+def configure_threads(num_threads: int = TORCH_NUM_THREADS, interop_threads: int = TORCH_INTEROP_THREADS) -> Dict[str, int]:
+    """
+    torch 스레드 수 설정 (프로세스당 한 번). 현재 값 반환.
+    - inter-op 스레드는 병렬 작업이 한 번이라도 돌고 나면 바꿀 수 없음 → 실패하면 로그만 남김
+    """
+    global _threads_configured
+    import torch
+
+    with _threads_lock:
+        if not _threads_configured:
+            _threads_configured = True
+            if num_threads > 0:
+                torch.set_num_threads(num_threads)
+            if interop_threads > 0:
+                try:
+                    torch.set_num_interop_threads(interop_threads)
+                except RuntimeError as e:
+                    print(f"[cpu_backend] interop threads not changed: {e}")
+            print(
+                f"[cpu_backend] torch threads intra={torch.get_num_threads()} "
+                f"interop={torch.get_num_interop_threads()}"
+            )
+    return {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def _cpu_flags() -> set:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+@lru_cache(maxsize=1)
+def bf16_native() -> bool:
+    """CPU가 bfloat16 연산을 직접 지원하는지 (AVX512-BF16 / AMX). 아니면 bf16은 fp32보다 느림."""
+    flags = _cpu_flags()
+    if flags & {"avx512_bf16", "amx_bf16"}:
+        return True
+    try:
+        import torch
+
+        return "AMX" in torch.backends.cpu.get_cpu_capability()
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=1)
+def int8_engine() -> Optional[str]:
+    """dynamic quantization 엔진 (x86/fbgemm: x86 AVX2+, qnnpack: ARM). 없으면 None."""
+    try:
+        import torch
+
+        engines = torch.backends.quantized.supported_engines
+    except Exception:
+        return None
+    for name in ("x86", "fbgemm", "qnnpack"):
+        if name in engines:
+            return name
+    return None
+
+
+@lru_cache(maxsize=None)
+def resolve_mode(mode: str = CPU_INFERENCE_MODE) -> str:
+    """요청한 모드를 이 CPU에서 실제로 쓸 모드로 변환 (fp32/bf16/int8)."""
+    mode = (mode or "fp32").lower()
+    if mode == "auto":
+        resolved = "bf16" if bf16_native() else ("int8" if int8_engine() else "fp32")
+        print(f"[cpu_backend] auto -> {resolved}")
+        return resolved
+    if mode not in MODES:
+        raise ValueError(f"unknown CPU_INFERENCE_MODE: {mode}")
+    if mode == "int8" and int8_engine() is None:
+        print("[cpu_backend] no quantized engine on this CPU, using fp32")
+        return "fp32"
+    if mode == "bf16" and not bf16_native():
+        print("[cpu_backend] bf16 requested but CPU has no native bf16 (memory saved, may be slower)")
+    return mode
+
+
+def load_dtype(mode: str):
+    """from_pretrained 에 넘길 torch_dtype (int8은 fp32로 올린 뒤 양자화)."""
+    import torch
+
+    return torch.bfloat16 if mode == "bf16" else torch.float32
+
+
+def quantize_int8(model):
+    """nn.Linear → int8 dynamic quantized Linear (임베딩/LayerNorm은 그대로)."""
+    import torch
+
+    engine = int8_engine()
+    if engine is None:
+        raise RuntimeError("no quantized engine available")
+    torch.backends.quantized.engine = engine
+    with warnings.catch_warnings():
+        # torch.ao.quantization deprecation 경고는 로드마다 반복되므로 숨김
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def from_pretrained(name: str, mode: Optional[str] = None, **kwargs):
+    """
+    CPU용 모델 로드: 스레드 설정 → 모드에 맞는 dtype으로 로드 → int8이면 양자화.
+    - kwargs는 AutoModelForCausalLM.from_pretrained 에 그대로 전달 (trust_remote_code 등)
+    - 양자화 실패 시 fp32 모델 그대로 사용
+    """
+    from transformers import AutoModelForCausalLM
+
+    mode = resolve_mode(mode or CPU_INFERENCE_MODE)
+    configure_threads()
+    model = AutoModelForCausalLM.from_pretrained(name, torch_dtype=load_dtype(mode), **kwargs)
+    model.eval()
+    if mode == "int8":
+        try:
+            model = quantize_int8(model)
+        except Exception as e:
+            print(f"[cpu_backend] int8 quantization failed, using fp32: {e}")
+            mode = "fp32"
+    model.cpu_inference_mode = mode
+    print(f"[cpu_backend] loaded {name} on cpu ({mode})")
+    return model
+
+
+def rss_mb() -> Optional[float]:
+    """현재 프로세스 resident memory (MB). /proc 없으면 최대 RSS."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS는 bytes, Linux는 KB
+        return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except Exception:
+        return None
+
+
+def info() -> Dict[str, Any]:
+    """현재 설정/CPU 지원 여부/RSS (GET /models/cpu-backend)."""
+    import torch
+
+    return {
+        "cuda": torch.cuda.is_available(),
+        "requested_mode": CPU_INFERENCE_MODE,
+        "mode": resolve_mode(CPU_INFERENCE_MODE),
+        "bf16_native": bf16_native(),
+        "int8_engine": int8_engine(),
+        "threads": {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()},
+        "rss_mb": rss_mb(),
+    }
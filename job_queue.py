@@ -0,0 +1,319 @@
+# job_queue.py
+# 2025-12-06
+"""
+비동기 작업 큐 (POST /jobs/* → job id, GET /jobs/{id} 로 상태/결과 조회)
+ - 상태: queued → running → succeeded / failed
+ - SQLiteJobQueue(기본): 파일 하나로 API 프로세스와 워커 프로세스가 공유 (외부 서비스 불필요)
+   claim은 BEGIN IMMEDIATE 트랜잭션 안에서 → 같은 작업을 두 워커가 가져가지 않음
+ - MemoryJobQueue: 프로세스 내부 (워커는 같은 프로세스의 스레드로만 가능), 개발/테스트용
+ - JOB_QUEUE_BACKEND=sqlite | memory | "패키지.모듈:클래스" (JobQueue 구현을 직접 지정)
+ - 워커가 죽어서 running 으로 남은 작업은 JOB_LEASE_SEC 뒤 다시 queued (최대 JOB_MAX_ATTEMPTS번)
+"""
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "./openwallet_jobs.db")
+# running 상태로 이 시간(초)이 지나면 워커가 죽은 것으로 보고 다시 queued
+JOB_LEASE_SEC = float(os.getenv("JOB_LEASE_SEC", "1800"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# 끝난 작업 보관 시간(초)
+JOB_RETENTION_SEC = float(os.getenv("JOB_RETENTION_SEC", "86400"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str = QUEUED
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    worker: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _new_job(kind: str, payload: Dict[str, Any], result: Any = None) -> Job:
+    now = time.time()
+    job = Job(id=uuid.uuid4().hex, kind=kind, payload=payload, created_at=now)
+    if result is not None:
+        # 이미 결과가 있는 작업 (캐시 적중 등) → 바로 완료 상태로 저장
+        job.status, job.result, job.finished_at = SUCCEEDED, result, now
+    return job
+
+
+class JobQueue:
+    """큐 백엔드 인터페이스. 다른 백엔드(Redis 등)는 이 메서드들을 구현해서 JOB_QUEUE_BACKEND로 지정."""
+
+    # 워커 프로세스에서 같은 큐를 열 수 있는지 (False면 워커는 API 프로세스 안의 스레드로 실행)
+    shared_across_processes = False
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], result: Any = None) -> Job:
+        raise NotImplementedError
+
+    def claim(self, kinds: List[str], worker: str) -> Optional[Job]:
+        """kinds 중 가장 오래된 queued 작업 하나를 running 으로 바꿔서 반환 (없으면 None)."""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, result: Any) -> None:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class MemoryJobQueue(JobQueue):
+    def __init__(self, retention_sec: float = JOB_RETENTION_SEC):
+        self.retention_sec = retention_sec
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], result: Any = None) -> Job:
+        job = _new_job(kind, payload, result)
+        with self._lock:
+            self._prune(job.created_at)
+            self._jobs[job.id] = job
+        return Job(**job.to_dict())
+
+    def _prune(self, now: float) -> None:
+        expired = [
+            k for k, j in self._jobs.items()
+            if j.status in FINISHED and now - (j.finished_at or now) > self.retention_sec
+        ]
+        for k in expired:
+            del self._jobs[k]
+
+    def claim(self, kinds: List[str], worker: str) -> Optional[Job]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == QUEUED and job.kind in kinds:
+                    job.status, job.worker, job.started_at = RUNNING, worker, time.time()
+                    job.attempts += 1
+                    return Job(**job.to_dict())
+        return None
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.status, job.result, job.error, job.finished_at = status, result, error, time.time()
+
+    def complete(self, job_id: str, result: Any) -> None:
+        self._finish(job_id, SUCCEEDED, result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, FAILED, error=error)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job.to_dict()) if job else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.status] = counts.get(j.status, 0) + 1
+        return {"backend": "memory", "jobs": counts}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class SQLiteJobQueue(JobQueue):
+    shared_across_processes = True
+
+    def __init__(
+        self,
+        db_path: str = JOB_QUEUE_PATH,
+        lease_sec: float = JOB_LEASE_SEC,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retention_sec: float = JOB_RETENTION_SEC,
+    ):
+        self.db_path = db_path
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.retention_sec = retention_sec
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # isolation_level=None: 트랜잭션을 직접 BEGIN IMMEDIATE 로 시작
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job(
+            id=row["id"],
+            kind=row["kind"],
+            payload=json.loads(row["payload"]),
+            status=row["status"],
+            result=json.loads(row["result"]) if row["result"] is not None else None,
+            error=row["error"],
+            attempts=row["attempts"],
+            worker=row["worker"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], result: Any = None) -> Job:
+        job = _new_job(kind, payload, result)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, result, created_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, kind, json.dumps(payload, ensure_ascii=False, default=str), job.status,
+                 json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 job.created_at, job.finished_at),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, job.created_at - self.retention_sec),
+            )
+        return job
+
+    def claim(self, kinds: List[str], worker: str) -> Optional[Job]:
+        now = time.time()
+        marks = ",".join("?" * len(kinds))
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 임대 시간이 지난 running 작업: 재시도 횟수가 남았으면 다시 queued, 아니면 failed
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND started_at < ? AND attempts < ?",
+                    (QUEUED, RUNNING, now - self.lease_sec, self.max_attempts),
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND started_at < ?",
+                    (FAILED, "worker lease expired", now, RUNNING, now - self.lease_sec),
+                )
+                row = conn.execute(
+                    f"SELECT * FROM jobs WHERE status = ? AND kind IN ({marks}) ORDER BY created_at LIMIT 1",
+                    (QUEUED, *kinds),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1 "
+                        "WHERE id = ?",
+                        (RUNNING, worker, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        job.status, job.worker, job.started_at, job.attempts = RUNNING, worker, now, job.attempts + 1
+        return job
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                (SUCCEEDED, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = {
+                r["status"]: r["n"]
+                for r in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+            }
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.db_path,
+            "jobs": counts,
+            "oldest_queued_age_sec": round(time.time() - oldest, 1) if oldest else None,
+        }
+
+
+def make_job_queue(backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    if backend == "sqlite":
+        return SQLiteJobQueue()
+    if backend == "memory":
+        return MemoryJobQueue()
+    # "패키지.모듈:클래스" → 인자 없이 생성
+    module_name, _, cls_name = backend.partition(":")
+    if not cls_name:
+        raise ValueError(f"unknown JOB_QUEUE_BACKEND: {backend}")
+    return getattr(importlib.import_module(module_name), cls_name)()
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """프로세스 공용 큐 (첫 사용 시 생성)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = make_job_queue()
+        return _queue
@@ -0,0 +1,200 @@
+# job_worker.py
+# 2025-12-06
+"""
+추론 워커 (job_queue의 작업을 가져와서 실행)
+ - report: Qwen 리포트 생성 (DB 조회는 API에서 끝내고 거래 샘플만 payload로 받음 → 워커는 DB 접속 불필요)
+ - trends: 기사 수집 + Kanana 요약 (워커 프로세스 안의 trend_cache 재사용)
+ - /jobs/* 작업은 워커 프로세스의 모델로 실행 (동기 /report, /trends/summary 는 계속 API 프로세스 모델 사용)
+ - 단독 실행: python job_worker.py --workers 2 --kinds report,trends
+ - API 프로세스가 직접 띄우기: JOB_WORKERS=N (main.py startup, 기본 0 = 띄우지 않음).
+   SQLite 큐가 아니면 같은 프로세스의 스레드로 실행
+"""
+import argparse
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from job_queue import Job, JobQueue, get_job_queue
+
+JOB_KINDS = ["report", "trends"]
+JOB_POLL_SEC = float(os.getenv("JOB_POLL_SEC", "0.5"))
+# 워커 시작 시 미리 올릴 모델 (main.py 의 WARMUP_MODELS 와 같은 형식, 기본은 WARMUP_MODELS 그대로)
+WORKER_WARMUP_MODELS = [
+    m.strip().lower() for m in os.getenv("JOB_WORKER_WARMUP_MODELS", os.getenv("WARMUP_MODELS", "qwen")).split(",")
+    if m.strip() and m.strip().lower() != "none"
+]
+
+
+def run_report_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from report.qwen_model import generate_spending_report
+
+    report_text = generate_spending_report(
+        transactions=payload["transactions"],
+        user_question=payload["question"],
+        aggregates=payload.get("aggregates"),
+    )
+    # schemas.ReportResponse 와 같은 모양
+    return {
+        "report": report_text,
+        "start_date": payload["start_date"],
+        "end_date": payload["end_date"],
+        "transaction_count": payload["transaction_count"],
+    }
+
+
+def run_trends_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    import trend_summary
+    from trend_cache import trend_cache
+
+    cache_key = trend_cache.make_key(payload["keywords"], payload["days"], payload["max_articles"], payload["model"])
+    summary = trend_cache.get_or_compute(
+        cache_key,
+        lambda: trend_summary.run(
+            db=trend_summary.ARTICLE_DB_PATH,
+            keywords=payload["keywords"],
+            days=payload["days"],
+            max_articles=payload["max_articles"],
+            model=payload["model"],
+        ),
+    )
+    result = asdict(summary)
+    result.pop("raw_response", None)
+    return result
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "report": run_report_job,
+    "trends": run_trends_job,
+}
+
+
+def _warmup(kinds: List[str]) -> None:
+    try:
+        if "report" in kinds and "qwen" in WORKER_WARMUP_MODELS:
+            from report import qwen_model
+            qwen_model.warmup()
+        if "trends" in kinds and "kanana" in WORKER_WARMUP_MODELS:
+            import trend_summary
+            trend_summary.warmup()
+    except Exception as e:
+        # 워밍업 실패해도 작업은 받음 (첫 작업에서 다시 로드 시도)
+        print(f"[job_worker] warmup failed: {e}")
+
+
+def run_worker(
+    queue: JobQueue,
+    kinds: List[str],
+    worker_id: str,
+    stop: Optional[Any] = None,
+    poll_interval: float = JOB_POLL_SEC,
+) -> None:
+    """stop(Event)이 set 될 때까지 작업을 하나씩 가져와서 실행."""
+    stop = stop or threading.Event()
+    print(f"[job_worker] {worker_id} started (kinds={kinds})")
+    while not stop.is_set():
+        try:
+            job: Optional[Job] = queue.claim(kinds, worker_id)
+        except Exception as e:
+            print(f"[job_worker] {worker_id} claim failed: {e}")
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+
+        t0 = time.perf_counter()
+        try:
+            result = HANDLERS[job.kind](job.payload)
+        except Exception as e:
+            traceback.print_exc()
+            queue.fail(job.id, f"{type(e).__name__}: {e}")
+            print(f"[job_worker] {worker_id} {job.kind} {job.id} failed ({time.perf_counter() - t0:.1f}s)")
+            continue
+        queue.complete(job.id, result)
+        print(f"[job_worker] {worker_id} {job.kind} {job.id} done ({time.perf_counter() - t0:.1f}s)")
+    print(f"[job_worker] {worker_id} stopped")
+
+
+def worker_process_main(worker_id: str, kinds: List[str], stop) -> None:
+    """워커 프로세스 진입점 (spawn). 큐는 프로세스마다 새로 연결."""
+    _warmup(kinds)
+    run_worker(get_job_queue(), kinds, worker_id, stop)
+
+
+class WorkerPool:
+    """
+    워커 N개 시작/정지.
+    큐가 프로세스 간 공유 가능(SQLite 등)하면 별도 프로세스, 아니면 같은 프로세스의 스레드.
+    """
+
+    def __init__(self, queue: JobQueue, n_workers: int, kinds: List[str] = JOB_KINDS):
+        self.queue = queue
+        self.n_workers = n_workers
+        self.kinds = kinds
+        self.use_processes = queue.shared_across_processes
+        self._workers: List[Any] = []
+        # CUDA/torch 상태를 부모에서 물려받지 않도록 spawn
+        self._ctx = mp.get_context("spawn")
+        self._stop = self._ctx.Event() if self.use_processes else threading.Event()
+
+    def start(self) -> None:
+        for i in range(self.n_workers):
+            worker_id = f"{'proc' if self.use_processes else 'thread'}-{os.getpid()}-{i}"
+            if self.use_processes:
+                w = self._ctx.Process(
+                    target=worker_process_main, args=(worker_id, self.kinds, self._stop),
+                    name=f"job-worker-{i}", daemon=True,
+                )
+            else:
+                w = threading.Thread(
+                    target=run_worker, args=(self.queue, self.kinds, worker_id, self._stop),
+                    name=f"job-worker-{i}", daemon=True,
+                )
+            w.start()
+            self._workers.append(w)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        for w in self._workers:
+            w.join(timeout)
+            if self.use_processes and w.is_alive():
+                # 생성 중이라 안 끝나면 강제 종료 (작업은 임대 만료 뒤 다시 queued)
+                w.terminate()
+        self._workers.clear()
+
+    def alive(self) -> int:
+        return sum(1 for w in self._workers if w.is_alive())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "process" if self.use_processes else "thread",
+            "workers": self.n_workers,
+            "alive": self.alive(),
+            "kinds": self.kinds,
+        }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OpenWallet 추론 워커")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--kinds", default=",".join(JOB_KINDS), help="처리할 작업 종류 (쉼표 구분)")
+    a = ap.parse_args()
+
+    kinds = [k.strip() for k in a.kinds.split(",") if k.strip() in HANDLERS]
+    queue = get_job_queue()
+    if not queue.shared_across_processes:
+        raise SystemExit("[job_worker] 별도 프로세스 워커는 프로세스 간 공유 가능한 큐(JOB_QUEUE_BACKEND=sqlite 등)가 필요합니다.")
+
+    pool = WorkerPool(queue, a.workers, kinds)
+    pool.start()
+    try:
+        while pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
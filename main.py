@@ -7,56 +7,225 @@ OpenWallet Unified FastAPI Server
  - 외부 트렌드 요약 (Kanana)
  - Qwen 기반 개인 소비 리포트
 """
-from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
 import time
-from sqlalchemy.exc import OperationalError
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any
+
+# 시작 시간 리포트: 서브시스템별 import 시간 / 첫 사용(지연 로딩) 시간 (GET /startup)
+_IMPORT_T0 = time.perf_counter()
+STARTUP_REPORT: Dict[str, Any] = {"import_ms": {}, "first_use_ms": {}}
+
+
+@contextmanager
+def _timed_import(name: str):
+    t0 = time.perf_counter()
+    yield
+    STARTUP_REPORT["import_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+with _timed_import("fastapi"):
+    from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from pydantic import BaseModel
+    import os
+    import json
+    import asyncio
+    import threading
+    from types import SimpleNamespace
 
 # 1) 기존 모듈 import
-# OCR: ocr/main.py 에 있는 로직 재사용
-from ocr.main import (
-    OCRResult,
-    run_vision_ocr,
-    normalize,
-    extract_merchant,
-    extract_amount,
-    extract_date,
-    extract_items,
-    suggest_category,
-)
-# 트렌드 요약: trend_summary.py
-from trend_summary import run as run_trend_summary, TrendSummary
-
-# Qwen 리포트: report/ 폴더
-try:
-    from report.qwen_model import generate_spending_report
-    QWEN_AVAILABLE = True
-except Exception:
-    QWEN_AVAILABLE = False
-    def generate_spending_report(*args, **kwargs):
-        return "(로컬 개발 환경에서는 Qwen 모델을 사용할 수 없습니다.)"
-    
-from report import models
-from report import schemas
-from report.database import engine, get_db
-
-
-MAX_RETRIES = 5
-for i in range(MAX_RETRIES):
+# 무거운 의존성(torch/transformers, feedparser/bs4, Google Vision)은 각 엔드포인트 첫 사용 때 로드
+with _timed_import("ocr"):
+    # OCR: ocr/main.py 에 있는 로직 재사용 (Vision 라이브러리/클라이언트는 첫 OCR 요청 때 생성)
+    from ocr.main import (
+        OCRResult,
+        OCRBatchResponse,
+        OCR_BATCH_MAX_FILES,
+        MAX_IMAGE_BYTES,
+        ocr_executor,
+        ocr_receipt_async,
+        ocr_receipts_batch_async,
+        get_vision_client,
+    )
+    from ocr.ocr_cache import get_ocr_cache
+    from ocr.image_prep import prep_stats, read_upload
+
+with _timed_import("trends"):
+    # 트렌드 요약 캐시만 (trend_summary 본체는 첫 /trends/summary 때)
+    from trend_cache import trend_cache
+    # Kanana/Qwen 공용 모델 레지스트리
+    from model_registry import registry as model_registry
+    from prefix_cache import prefix_cache
+    import cpu_backend
+    from assisted_decoding import assisted_decoder
+
+with _timed_import("report_db"):
+    from sqlalchemy import func
+    from sqlalchemy.orm import Session
+    from report import models
+    from report import rollups
+    from report.report_cache import report_cache, data_fingerprint
+    from report import schemas
+    from sqlalchemy.exc import OperationalError
+    from report.database import (
+        DatabaseNotConfigured, database_ready, ensure_database, get_db, get_engine, pool_status,
+        settings as db_settings,
+    )
+    import readiness as readiness_mod
+    from readiness import readiness
+
+with _timed_import("jobs"):
+    import job_queue
+    from job_queue import get_job_queue
+    from job_worker import WorkerPool
+
+STARTUP_REPORT["total_import_ms"] = round((time.perf_counter() - _IMPORT_T0) * 1000, 1)
+
+
+class LazySubsystem:
+    """첫 get() 때 loader() 를 한 번만 실행 (동시 호출은 lock으로 대기). 걸린 시간은 STARTUP_REPORT에 기록."""
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loaded = False
+
+    def get(self):
+        if self.loaded:
+            return self._value
+        with self._lock:
+            if not self.loaded:
+                t0 = time.perf_counter()
+                self._value = self._loader()
+                STARTUP_REPORT["first_use_ms"][self.name] = round((time.perf_counter() - t0) * 1000, 1)
+                self.loaded = True
+        return self._value
+
+
+def _load_trend_summary():
+    import trend_summary
+    return trend_summary
+
+
+# Qwen 리포트: report/ 폴더. import 실패(로컬 개발 환경 등)면 안내 문구를 돌려주는 fallback
+# QWEN_AVAILABLE: None = 아직 로드 전
+QWEN_AVAILABLE: Optional[bool] = None
+
+
+def _qwen_fallback_generate(*args, **kwargs):
+    return "(로컬 개발 환경에서는 Qwen 모델을 사용할 수 없습니다.)"
+
+
+def _qwen_fallback_stream(*args, **kwargs):
+    yield {"event": "token", "text": _qwen_fallback_generate()}
+    yield {"event": "done", "ttft_ms": None, "tokens": 0, "tokens_per_sec": None, "cancelled": False}
+
+
+def _load_qwen():
+    global QWEN_AVAILABLE
+    try:
+        from report import qwen_model
+        QWEN_AVAILABLE = True
+        return qwen_model
+    except Exception as e:
+        print(f"[startup] Qwen unavailable, using fallback: {e}")
+        QWEN_AVAILABLE = False
+        return SimpleNamespace(
+            generate_spending_report=_qwen_fallback_generate,
+            stream_spending_report=_qwen_fallback_stream,
+        )
+
+
+trend_subsystem = LazySubsystem("trends", _load_trend_summary)
+qwen_subsystem = LazySubsystem("qwen", _load_qwen)
+
+
+def generate_spending_report(*args, **kwargs):
+    return qwen_subsystem.get().generate_spending_report(*args, **kwargs)
+
+
+def stream_spending_report(*args, **kwargs):
+    return qwen_subsystem.get().stream_spending_report(*args, **kwargs)
+
+
+# DB: 시작을 막지 않도록 백그라운드에서 준비 확인 + 테이블 생성, 요청은 준비될 때까지 대기
+# DB_INIT_MODE: background(기본) | eager(시작 시 블로킹, 예전 동작) | lazy(첫 DB 요청 때)
+DB_INIT_MODE = os.getenv("DB_INIT_MODE", "background")
+# background 모드: 한 라운드(ensure_database 의 재시도 전부)가 실패하면 대기 후 다시 시도 (대기는 2배씩, 최대값)
+DB_INIT_RETRY_SEC = float(os.getenv("DB_INIT_RETRY_SEC", "5"))
+DB_INIT_RETRY_MAX_SEC = float(os.getenv("DB_INIT_RETRY_MAX_SEC", "60"))
+
+
+def _init_database():
+    t0 = time.perf_counter()
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    # 지출 집계 rollup 테이블 증분 갱신 (REPORT_USE_ROLLUPS=1 일 때만)
+    if rollups.USE_ROLLUPS:
+        rollups.install(engine)
+    STARTUP_REPORT["first_use_ms"]["database"] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _init_database_until_ready():
+    """background 모드 초기화 스레드: 성공할 때까지 재시도 (실패한 동안 GET /ready 는 failed + 에러 표시)."""
+    delay = DB_INIT_RETRY_SEC
+    while not readiness.run_step("database", lambda: ensure_database(_init_database)):
+        if not db_settings.configured:
+            # 접속 설정이 없으면 재시도해도 소용없음 (DB 외 API는 계속 서비스, DB API는 503)
+            print("[startup] database not configured, DB endpoints will return 503")
+            return
+        print(f"[startup] database init failed, retry in {delay:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, DB_INIT_RETRY_MAX_SEC)
+
+
+# 워밍업: 시작 직후 백그라운드에서 선택한 모델 로드 + 짧은 더미 생성 → GET /ready 가 준비되면 200
+# WARMUP_MODELS: 쉼표 구분 (qwen, kanana). "none" 이면 워밍업 없이 첫 요청 때 로드
+# 동기 /report, /trends/summary 는 API 프로세스에서 모델을 쓰므로 워커 사용 여부와 관계없이 여기서 워밍업
+WARMUP_MODELS = [
+    m.strip().lower() for m in os.getenv("WARMUP_MODELS", "qwen").split(",")
+    if m.strip() and m.strip().lower() != "none"
+]
+WARMUP_NEW_TOKENS = int(os.getenv("WARMUP_NEW_TOKENS", "4"))
+
+
+def _warmup_ocr():
+    # Vision 라이브러리 import + 클라이언트 생성 (자격 증명이 없으면 unavailable)
+    return None if get_vision_client() is not None else readiness_mod.UNAVAILABLE
+
+
+def _warmup_qwen():
+    backend = qwen_subsystem.get()
+    if not QWEN_AVAILABLE:
+        return readiness_mod.UNAVAILABLE
+    backend.warmup(WARMUP_NEW_TOKENS)
+
+
+def _warmup_kanana():
+    trend_subsystem.get().warmup(TrendSummaryRequest.model_fields["model"].default, WARMUP_NEW_TOKENS)
+
+
+# 비동기 작업 API (/jobs/*): API 프로세스가 띄우는 추론 워커 수
+# 기본 0: 띄우지 않음 (별도로 python job_worker.py 실행). SQLite 큐에서 N>0 이면 워커 프로세스가
+# 모델을 따로 올리므로(JOB_WORKER_WARMUP_MODELS) 메모리에 같은 모델이 API + 워커 수만큼 올라감
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "0"))
+# GET /jobs/{id}?wait= 롱폴링 최대 대기(초)와 확인 주기
+JOB_MAX_WAIT_SEC = float(os.getenv("JOB_MAX_WAIT_SEC", "30"))
+JOB_POLL_SEC = float(os.getenv("JOB_POLL_SEC", "0.5"))
+job_workers: Optional[WorkerPool] = None
+
+
+def get_app_db():
+    # 아직 준비 전이면 여기서 준비 확인 (백그라운드 초기화 중이면 끝날 때까지 대기)
     try:
-        print(f"Database connection attempt {i+1}...")
-        models.Base.metadata.create_all(bind=engine)
-        print("Database connection successful!")
-        break
-    except OperationalError as e:
-        print(f"Database not ready yet, retrying in 2 seconds... Error: {e}")
-        time.sleep(2)
-        if i == MAX_RETRIES - 1:
-            print("Failed to connect to Database after multiple attempts.")
-            raise e
+        ensure_database(_init_database, max_attempts=2)
+    except (DatabaseNotConfigured, OperationalError) as e:
+        raise HTTPException(503, f"데이터베이스를 사용할 수 없습니다: {e}")
+    yield from get_db()
+
 
 # 2) FastAPI 앱 공통 설정
 app = FastAPI(
@@ -65,6 +234,43 @@ app = FastAPI(
     description="OpenWallet OCR + Stats + Trend Summary + AI Report Backend",
 )
 
+@app.on_event("startup")
+def _startup():
+    if DB_INIT_MODE == "eager":
+        readiness.register("database")
+        if not readiness.run_step("database", lambda: ensure_database(_init_database)):
+            raise RuntimeError("database init failed")
+    elif DB_INIT_MODE == "background":
+        # 실패하면 백오프하며 계속 재시도 (첫 DB 요청이 먼저 성공시켜도 다음 라운드에서 ready 로 바뀜)
+        readiness.register("database")
+        threading.Thread(
+            target=_init_database_until_ready,
+            name="db-init",
+            daemon=True,
+        ).start()
+    else:
+        readiness.register("database", readiness_mod.LAZY, required=False)
+
+    # DB와 별도 스레드: DB 재시도가 모델 로드를 막지 않도록
+    readiness.add_step("ocr", _warmup_ocr)
+    for name, fn in (("qwen", _warmup_qwen), ("kanana", _warmup_kanana)):
+        if name in WARMUP_MODELS:
+            readiness.add_step(name, fn)
+        else:
+            readiness.register(name, readiness_mod.LAZY, required=False)
+    readiness.run_warmup()
+
+    global job_workers
+    if JOB_WORKERS > 0:
+        job_workers = WorkerPool(get_job_queue(), JOB_WORKERS)
+        job_workers.start()
+    print(f"[startup] imports {STARTUP_REPORT['import_ms']} total={STARTUP_REPORT['total_import_ms']}ms")
+
+@app.on_event("shutdown")
+def _shutdown():
+    if job_workers is not None:
+        job_workers.stop()
+
 # 프론트랑 바로 붙일 수 있게 CORS 기본 열어둠
 app.add_middleware(
     CORSMiddleware,
@@ -87,36 +293,52 @@ async def api_ocr_receipt(
     기존 ocr/main.py 로직을 그대로 사용.
     """
     try:
-        content = await file.read()
+        # 청크 단위로 읽다가 제한을 넘으면 바로 중단 (전체를 메모리에 올리지 않음)
+        content = await read_upload(file, MAX_IMAGE_BYTES)
 
+        if content is None:
+            raise HTTPException(413, "이미지 크기가 너무 큽니다(>8MB).")
         if len(content) == 0:
             raise HTTPException(400, "빈 파일입니다.")
-        if len(content) > 8 * 1024 * 1024:
-            raise HTTPException(413, "이미지 크기가 너무 큽니다(>8MB).")
 
-        text = run_vision_ocr(content)
-        lines = normalize(text)
-
-        merchant = extract_merchant(lines)
-        amount = extract_amount(text)
-        date = extract_date(text)
-        items = extract_items(lines)
-        cat = suggest_category(merchant, items, memo)
-
-        return OCRResult(
-            merchant=merchant,
-            amount=amount,
-            date=date,
-            items=items,
-            suggested_category=cat,
-            raw_text=text,
-        )
+        # Vision 왕복은 OCR 전용 스레드 풀에서 (이벤트 루프 / 다른 요청을 막지 않음)
+        return await ocr_receipt_async(content, memo)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"OCR 처리 중 오류: {e}")
 
+@app.post("/ocr-receipts", response_model=OCRBatchResponse)
+async def api_ocr_receipts(
+    files: List[UploadFile] = File(...),
+    memo: Optional[str] = Form(default=None),
+):
+    """
+    여러 영수증 이미지를 한 번에 업로드 (한 달치 가져오기 등).
+    Vision batch_annotate_images 로 묶어서 OCR, 파일별 OCRResult 또는 error 를 같은 순서로 반환.
+    """
+    if len(files) > OCR_BATCH_MAX_FILES:
+        raise HTTPException(413, f"한 번에 최대 {OCR_BATCH_MAX_FILES}개까지 업로드할 수 있습니다.")
+    payload = [(f.filename, await read_upload(f, MAX_IMAGE_BYTES)) for f in files]
+    return await ocr_receipts_batch_async(payload, memo)
+
+@app.get("/ocr/cache")
+def api_ocr_cache_stats():
+    """OCR 결과 캐시 상태 (적중률, 근사 중복 적중, Vision에 보내지 않은 바이트)."""
+    cache = get_ocr_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+@app.get("/ocr/image-stats")
+def api_ocr_image_stats():
+    """Vision 전송 전 이미지 정규화 설정과 누적 전/후 바이트."""
+    return prep_stats.snapshot()
+
+@app.get("/ocr/executor")
+def api_ocr_executor_stats():
+    """OCR 스레드 풀 상태 (실행/대기 중, 완료, 503 거절 수)."""
+    return ocr_executor.stats()
+
 # 3. 외부 트렌드 요약 API (Kanana + SQLite)
 
 class TrendSummaryRequest(BaseModel):
@@ -124,7 +346,7 @@ class TrendSummaryRequest(BaseModel):
     days: int = 7
     max_articles: int = 30
     model: str = "kakaocorp/kanana-1.5-2.1b-instruct-2505"
-    db_path: str = "./openwallet_trends.db"
+    # 기사 저장소 경로는 서버 설정(TREND_ARTICLE_DB)만 사용 (클라이언트가 보낸 db_path는 무시됨)
 
 
 class TrendSummaryResponse(BaseModel):
@@ -143,14 +365,19 @@ class TrendSummaryResponse(BaseModel):
 def api_trend_summary(req: TrendSummaryRequest):
     """
     Google News RSS + Kanana로 최근 N일 간의 소비/경제 트렌드 요약.
-    trend_summary.run() 사용.
-    """
-    summary: TrendSummary = run_trend_summary(
-        db=req.db_path,
-        keywords=req.keywords,
-        days=req.days,
-        max_articles=req.max_articles,
-        model=req.model,
+    trend_summary.run() 사용. 같은 요청은 trend_cache 결과를 재사용.
+    """
+    cache_key = trend_cache.make_key(req.keywords, req.days, req.max_articles, req.model)
+    trend_summary = trend_subsystem.get()
+    summary = trend_cache.get_or_compute(
+        cache_key,
+        lambda: trend_summary.run(
+            db=trend_summary.ARTICLE_DB_PATH,
+            keywords=req.keywords,
+            days=req.days,
+            max_articles=req.max_articles,
+            model=req.model,
+        ),
     )
 
     return TrendSummaryResponse(
@@ -164,77 +391,364 @@ def api_trend_summary(req: TrendSummaryRequest):
         sources=summary.sources,
         model=summary.model,
     )
-    
+
+
+@app.get("/trends/cache")
+def api_trend_cache_stats():
+    """트렌드 요약 결과 캐시 hit/miss 통계."""
+    return trend_cache.stats()
+
+
 # 4. Qwen 기반 개인 소비 리포트 API
 # (기존 report/main.py 로직 그대로)
 
-@app.post("/report", response_model=schemas.ReportResponse)
-def create_report(request: schemas.ReportRequest, db: Session = Depends(get_db)):
+# 리포트에 넘기는 상세 거래 내역 샘플 개수
+REPORT_SAMPLE_SIZE = 30
+
+
+def _load_report_data(request: schemas.ReportRequest, db: Session):
+    """
+    리포트 입력 데이터 조회 (/report, /report/stream 공용).
+    합계/카테고리별 집계와 거래 샘플은 DB에서 계산 (ORM 객체 전체 로드 X).
+    반환: (transaction_list, transaction_count, summary_text)
+    """
     # 1. DB 조회: 날짜 범위 필터링
     # 지출 입력 API는 없지만, DB에 이미 저장된 'models.Expense' 데이터를 읽어와야 리포트 작성이 가능합니다.
-    expenses_query = db.query(models.Expense).filter(
+    in_range = (
         models.Expense.date >= request.start_date,
-        models.Expense.date <= request.end_date
+        models.Expense.date <= request.end_date,
     )
-    expenses = expenses_query.all()
 
-    if not expenses:
+    # 2. 카테고리별 합계/건수 (rollup 테이블 또는 원본 GROUP BY)
+    if rollups.USE_ROLLUPS:
+        category_rows = rollups.category_totals(db, request.start_date, request.end_date)
+    else:
+        category_rows = (
+            db.query(
+                models.Expense.category,
+                func.sum(models.Expense.price),
+                func.count(models.Expense.expense_id),
+            )
+            .filter(*in_range)
+            .group_by(models.Expense.category)
+            .all()
+        )
+
+    transaction_count = sum(cnt for _, _, cnt in category_rows)
+    if not transaction_count:
         raise HTTPException(
             status_code=404, 
             detail="해당 기간에 조회된 지출 데이터가 없습니다."
         )
-    total_amount = 0
-    category_summary = {} # 예: {"FOOD": 50000, "TRANSPORT": 30000}
-    # 2. 데이터 변환: ORM 객체 -> 딕셔너리 리스트 (모델 입력용)
-    # 수정사항 카테고리별 합계 계산
-    transaction_list = []
-    for exp in expenses:
-            # 1. 전체 합계 계산
-            total_amount += exp.price
-            
-            # 2. 카테고리별 합계 계산
-            cat_name = exp.category
-            if cat_name not in category_summary:
-                category_summary[cat_name] = 0
-            category_summary[cat_name] += exp.price
-            
-            # 3. 상세 내역은 개수 제한 (리포트 전달 개수 조절 가능 현재는 30)
-            if len(transaction_list) < 30: 
-                transaction_list.append({
-                    "date": str(exp.date),
-                    "merchant": exp.title,
-                    "amount": exp.price,
-                    "category": exp.category
-                })
-
-    # 3. 모델에게 줄 데이터 재구성
-    # 상세 내역 대신 요약 정보를 줍니다.
+
+    # MySQL SUM은 Decimal로 오므로 int로 변환
+    category_summary = {cat: int(total or 0) for cat, total, _ in category_rows} # 예: {"FOOD": 50000, "TRANSPORT": 30000}
+    category_counts = {cat: int(cnt) for cat, _, cnt in category_rows}
+    total_amount = sum(category_summary.values())
+
+    # 3. 상세 내역은 개수 제한 (필요한 컬럼만, 최근 순으로 LIMIT 후 날짜순 정렬)
+    sample_rows = (
+        db.query(
+            models.Expense.date,
+            models.Expense.title,
+            models.Expense.price,
+            models.Expense.category,
+        )
+        .filter(*in_range)
+        .order_by(models.Expense.date.desc(), models.Expense.expense_id.desc())
+        .limit(REPORT_SAMPLE_SIZE)
+        .all()
+    )
+    transaction_list = [
+        {
+            "date": str(row.date),
+            "merchant": row.title,
+            "amount": row.price,
+            "category": row.category,
+        }
+        for row in reversed(sample_rows)
+    ]
+
+    # 4. 모델에게 줄 기간 전체 집계 (샘플과 별도로 프롬프트에 포함, report/prompt_builder.py)
     summary_text = {
         "total_spent": total_amount,
+        "transaction_count": transaction_count,
         "category_breakdown": category_summary,
-        "recent_transactions_sample": transaction_list # 샘플만 전달
+        "category_counts": category_counts,
     }
+    return transaction_list, transaction_count, summary_text
+
+
+def _report_cache_key(request: schemas.ReportRequest, db: Session):
+    """같은 요청 + 같은 데이터 버전 → 같은 키. 캐시를 안 쓰면 None."""
+    if not (report_cache.enabled and request.use_cache):
+        return None
+    fingerprint = data_fingerprint(db, request.start_date, request.end_date)
+    return report_cache.make_key(request.start_date, request.end_date, request.question, fingerprint)
+
+
+@app.post("/report", response_model=schemas.ReportResponse)
+def create_report(request: schemas.ReportRequest, db: Session = Depends(get_app_db)):
+    # 0. 같은 요청 + 같은 데이터 버전이면 캐시된 리포트 반환
+    cache_key = _report_cache_key(request, db)
+    if cache_key is not None:
+        cached = report_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    transaction_list, transaction_count, summary_text = _load_report_data(request, db)
 
     # 3. 모델 추론: 리포트 생성
     try:
         report_text = generate_spending_report(
             transactions=transaction_list,
-            user_question=request.question
+            user_question=request.question,
+            aggregates=summary_text,
         )
     except Exception as e:
         print(f"LLM Generation Error: {e}")
         raise HTTPException(status_code=500, detail=f"리포트 생성 중 오류가 발생했습니다: {str(e)}")
 
     # 4. 결과 반환
-    return schemas.ReportResponse(
+    response = schemas.ReportResponse(
         report=report_text,
         start_date=request.start_date,
         end_date=request.end_date,
-        transaction_count=len(expenses)
+        transaction_count=transaction_count
+    )
+    if cache_key is not None:
+        report_cache.put(cache_key, response)
+    return response
+
+
+@app.post("/report/stream")
+async def create_report_stream(
+    request: schemas.ReportRequest,
+    http_request: Request,
+    format: str = "ndjson",
+    db: Session = Depends(get_app_db),
+):
+    """
+    /report 스트리밍 버전. 토큰이 생성되는 대로 전송.
+    - format=ndjson(기본): 한 줄에 JSON 이벤트 하나 (application/x-ndjson)
+    - format=sse: server-sent events (text/event-stream)
+    - 이벤트: meta → token... → done(prompt_tokens, ttft_ms, tokens, tokens_per_sec) / error
+    - 클라이언트가 연결을 끊으면 생성을 중단해서 모델을 바로 반납
+    """
+    # DB 조회는 스레드풀에서 (이벤트 루프 블로킹 방지)
+    loop = asyncio.get_running_loop()
+    transaction_list, transaction_count, summary_text = await loop.run_in_executor(
+        None, _load_report_data, request, db
     )
 
-# 5. Health Check
+    cancel_event = threading.Event()
+
+    def _encode(payload: Dict[str, Any]) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        if format == "sse":
+            return f"event: {payload['event']}\ndata: {data}\n\n"
+        return data + "\n"
+
+    async def _events():
+        events = stream_spending_report(
+            transactions=transaction_list,
+            user_question=request.question,
+            cancel_event=cancel_event,
+            aggregates=summary_text,
+        )
+        yield _encode({
+            "event": "meta",
+            "start_date": str(request.start_date),
+            "end_date": str(request.end_date),
+            "transaction_count": transaction_count,
+        })
+        try:
+            while True:
+                if await http_request.is_disconnected():
+                    print("[report/stream] client disconnected, cancelling generation")
+                    cancel_event.set()
+                    break
+                # streamer는 blocking queue라서 스레드풀에서 한 이벤트씩 꺼냄
+                ev = await loop.run_in_executor(None, next, events, None)
+                if ev is None:
+                    break
+                yield _encode(ev)
+        except Exception as e:
+            print(f"LLM Generation Error: {e}")
+            yield _encode({"event": "error", "detail": f"리포트 생성 중 오류가 발생했습니다: {str(e)}"})
+        finally:
+            cancel_event.set()
+            try:
+                events.close()
+            except ValueError:
+                # 스레드풀에서 아직 next() 실행 중 → cancel_event로 곧 종료됨
+                pass
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(_events(), media_type=media_type)
+
+# 5. 비동기 작업 API
+# 오래 걸리는 /report, /trends/summary 를 작업으로 등록 → 추론 워커 프로세스가 실행
+# POST 는 바로 202 + job id, 결과는 GET /jobs/{job_id} (wait=초 로 롱폴링)
+
+def _job_view(job: job_queue.Job) -> Dict[str, Any]:
+    # payload(거래 샘플 등)는 응답에서 제외
+    view = job.to_dict()
+    view.pop("payload", None)
+    return view
+
+
+def _job_accepted(job: job_queue.Job) -> JSONResponse:
+    status = 200 if job.status in job_queue.FINISHED else 202
+    return JSONResponse(_job_view(job), status_code=status, headers={"Location": f"/jobs/{job.id}"})
+
+
+@app.post("/jobs/report", status_code=202)
+def enqueue_report_job(request: schemas.ReportRequest, db: Session = Depends(get_app_db)):
+    """
+    /report 작업 버전. DB 조회(집계 + 거래 샘플)는 여기서 끝내고 Qwen 생성만 워커에서.
+    캐시에 있으면 바로 완료된 작업으로 등록 (200).
+    """
+    queue = get_job_queue()
+    cache_key = _report_cache_key(request, db)
+    cached = report_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return _job_accepted(queue.enqueue("report", {}, result=cached.model_dump(mode="json")))
+
+    transaction_list, transaction_count, summary_text = _load_report_data(request, db)
+    payload = {
+        "transactions": transaction_list,
+        "aggregates": summary_text,
+        "transaction_count": transaction_count,
+        "question": request.question,
+        "start_date": request.start_date.isoformat(),
+        "end_date": request.end_date.isoformat(),
+        # 완료 후 리포트 캐시에 넣을 때 키를 다시 만들기 위해
+        "fingerprint": cache_key[-1] if cache_key is not None else None,
+    }
+    return _job_accepted(queue.enqueue("report", payload))
+
+
+@app.post("/jobs/trends", status_code=202)
+def enqueue_trends_job(req: TrendSummaryRequest):
+    """/trends/summary 작업 버전 (기사 수집 + Kanana 요약 모두 워커에서)."""
+    return _job_accepted(get_job_queue().enqueue("trends", req.model_dump()))
+
+
+def _cache_report_result(job: job_queue.Job) -> None:
+    p = job.payload
+    if job.kind != "report" or job.status != job_queue.SUCCEEDED or not p.get("fingerprint"):
+        return
+    # make_key 는 날짜를 str() 로 넣으므로 ISO 문자열 그대로 같은 키
+    key = report_cache.make_key(p["start_date"], p["end_date"], p["question"], p["fingerprint"])
+    report_cache.put(key, schemas.ReportResponse(**job.result))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """
+    작업 상태/결과. wait>0 이면 끝날 때까지 최대 wait초(JOB_MAX_WAIT_SEC 이하) 기다렸다가 응답 (롱폴링).
+    status: queued / running / succeeded(result) / failed(error)
+    """
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), JOB_MAX_WAIT_SEC)
+    while True:
+        job = await asyncio.to_thread(queue.get, job_id)
+        if job is None:
+            raise HTTPException(404, "작업을 찾을 수 없습니다.")
+        if job.status in job_queue.FINISHED or loop.time() >= deadline:
+            break
+        await asyncio.sleep(JOB_POLL_SEC)
+    _cache_report_result(job)
+    return _job_view(job)
+
+
+@app.get("/jobs")
+def job_stats():
+    """큐 상태(상태별 작업 수, 가장 오래 기다린 작업)와 워커 상태."""
+    return {
+        "queue": get_job_queue().stats(),
+        "workers": job_workers.stats() if job_workers is not None else None,
+    }
+
+
+# 6. Health Check / 상태 조회
 
 @app.get("/health")
 def health():
+    """liveness: 프로세스가 살아 있으면 ok (모델/DB 준비 여부는 GET /ready)."""
     return {"status": "ok", "service": "OpenWallet Unified API"}
+
+
+@app.get("/report/cache")
+def report_cache_stats():
+    """리포트 응답 캐시 hit/miss 통계."""
+    return report_cache.stats()
+
+
+@app.get("/db/pool")
+def db_pool_status():
+    """DB 커넥션 풀 상태 (대여 중/overflow/대기 시간)."""
+    try:
+        return pool_status()
+    except DatabaseNotConfigured as e:
+        raise HTTPException(503, str(e))
+
+
+@app.get("/startup")
+def startup_report():
+    """
+    시작 시간 리포트: 서브시스템별 import 시간(ms), 지연 로딩된 서브시스템의 첫 로드 시간,
+    아직 로드되지 않은 서브시스템 목록.
+    """
+    return {
+        **STARTUP_REPORT,
+        "lazy": {
+            "trends": trend_subsystem.loaded,
+            "qwen": qwen_subsystem.loaded,
+        },
+        "qwen_available": QWEN_AVAILABLE,
+        "db_init_mode": DB_INIT_MODE,
+    }
+
+
+@app.get("/ready")
+def ready():
+    """
+    readiness: 서브시스템별 상태 (database / ocr / qwen / kanana).
+    워밍업 대상이 모두 준비되면 200, 아니면 503 → Kubernetes readinessProbe 에 사용.
+    """
+    if database_ready() and readiness.state("database") != readiness_mod.READY:
+        # 백그라운드 초기화가 실패했다가 첫 요청에서 성공한 경우 / lazy 모드
+        readiness.set("database", readiness_mod.READY)
+    snapshot = readiness.snapshot()
+    snapshot["warmup_models"] = WARMUP_MODELS
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/models")
+def loaded_models():
+    """현재 메모리에 올라와 있는 모델 목록과 모델별 메모리 사용량."""
+    return model_registry.stats()
+
+
+@app.get("/models/prefix-cache")
+def prefix_cache_stats():
+    """시스템 프롬프트 KV 캐시 hit/miss, 재사용한 prefill 토큰 수, 캐시된 prefix 목록."""
+    return prefix_cache.stats()
+
+
+@app.get("/models/cpu-backend")
+def cpu_backend_info():
+    """CPU 추론 모드(fp32/bf16/int8), torch 스레드 수, bf16/int8 지원 여부, 프로세스 RSS."""
+    return cpu_backend.info()
+
+
+@app.get("/models/assisted")
+def assisted_decoding_stats():
+    """
+    assisted decoding 상태: 설정된 draft 모델(QWEN_DRAFT_MODEL / KANANA_DRAFT_MODEL),
+    draft별 누적 수락률·본 모델 step당 토큰 수·tokens/sec, 비활성화된 draft와 사유.
+    """
+    return assisted_decoder.stats()
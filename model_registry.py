@@ -0,0 +1,276 @@
+# model_registry.py
+# 2025-12-06
+"""
+프로세스 전역 모델 레지스트리
+ - (tokenizer, model) 쌍을 모델명/dtype/device 키로 보관 (Kanana, Qwen 공용)
+ - 메모리 예산(MODEL_MEMORY_BUDGET_MB)을 넘으면 가장 오래 안 쓴 모델부터 내림 (LRU)
+ - MODEL_IDLE_TIMEOUT_SEC 동안 사용되지 않은 모델은 자동 언로드
+ - stats()로 현재 올라와 있는 모델과 모델별 메모리 사용량 확인
+"""
+from __future__ import annotations
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 0 이하이면 제한 없음
+DEFAULT_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+DEFAULT_IDLE_TIMEOUT_SEC = float(os.getenv("MODEL_IDLE_TIMEOUT_SEC", "0"))
+
+RegistryKey = Tuple[str, str, str]
+Loader = Callable[[], Tuple[Any, Any]]
+
+
+@dataclass
+class _Entry:
+    key: RegistryKey
+    tokenizer: Any
+    model: Any
+    size_bytes: int
+    loaded_at: float
+    last_used: float
+    load_seconds: float
+    hits: int = 0
+
+
+def make_key(name: str, dtype: Any = None, device: Optional[str] = None) -> RegistryKey:
+    """dtype(torch.dtype/문자열/None), device를 문자열로 정규화해서 키 생성."""
+    dtype_str = str(dtype).replace("torch.", "") if dtype is not None else "auto"
+    return (name, dtype_str, device or "auto")
+
+
+def _packed_params_bytes(model: Any) -> int:
+    """int8 dynamic quantization Linear (cpu_backend int8 모드) 가중치는 parameters()에 안 잡혀서 따로 합산."""
+    total = 0
+    try:
+        modules = list(model.modules())
+    except Exception:
+        return 0
+    for mod in modules:
+        if not hasattr(mod, "_packed_params"):
+            continue
+        try:
+            weight, bias = mod.weight(), mod.bias()
+        except Exception:
+            continue
+        total += weight.numel() * weight.element_size()
+        if bias is not None:
+            total += bias.numel() * bias.element_size()
+    return total
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """파라미터 + 버퍼 크기 합계 (양자화/공유 텐서는 중복 없이 계산)."""
+    try:
+        return int(model.get_memory_footprint()) + _packed_params_bytes(model)
+    except Exception:
+        pass
+
+    total = 0
+    seen = set()
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except Exception:
+        return 0
+    for t in tensors:
+        try:
+            ptr = t.data_ptr()
+        except Exception:
+            ptr = id(t)
+        if ptr in seen:
+            continue
+        seen.add(ptr)
+        total += t.numel() * t.element_size()
+    return total + _packed_params_bytes(model)
+
+
+def _release_accelerator_memory() -> None:
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb: int = DEFAULT_BUDGET_MB, idle_timeout_sec: float = DEFAULT_IDLE_TIMEOUT_SEC):
+        self.budget_bytes = max(0, budget_mb) * 1024 * 1024
+        self.idle_timeout_sec = max(0.0, idle_timeout_sec)
+        self._entries: "OrderedDict[RegistryKey, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        # 같은 모델을 동시에 두 번 로드하지 않도록 키별 로드 락
+        self._load_locks: Dict[RegistryKey, threading.Lock] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.evictions = 0
+
+    # 조회 / 로드
+    def get(
+        self,
+        name: str,
+        loader: Loader,
+        dtype: Any = None,
+        device: Optional[str] = None,
+    ) -> Tuple[Any, Any]:
+        """
+        키에 해당하는 (tokenizer, model) 반환. 없으면 loader()로 로드 후 등록.
+        - loader는 (tokenizer, model)을 반환해야 함
+        """
+        key = make_key(name, dtype, device)
+        entry = self._touch(key)
+        if entry is not None:
+            return entry.tokenizer, entry.model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # 기다리는 동안 다른 스레드가 로드했을 수 있음
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.tokenizer, entry.model
+
+            print(f"[ModelRegistry] loading {key}")
+            t0 = time.perf_counter()
+            tokenizer, model = loader()
+            load_seconds = time.perf_counter() - t0
+            size = estimate_model_bytes(model)
+            now = time.time()
+
+            with self._lock:
+                self._entries[key] = _Entry(
+                    key=key,
+                    tokenizer=tokenizer,
+                    model=model,
+                    size_bytes=size,
+                    loaded_at=now,
+                    last_used=now,
+                    load_seconds=load_seconds,
+                )
+                print(
+                    f"[ModelRegistry] loaded {key} "
+                    f"({size / 1024 / 1024:.1f}MB, {load_seconds:.1f}s)"
+                )
+                self._evict_over_budget(keep=key)
+            self._ensure_reaper()
+            return tokenizer, model
+
+    def _touch(self, key: RegistryKey) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.last_used = time.time()
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    # 언로드 / 축출
+    def unload(self, name: str, dtype: Any = None, device: Optional[str] = None) -> bool:
+        key = make_key(name, dtype, device)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        print(f"[ModelRegistry] unloaded {key}")
+        del entry
+        _release_accelerator_memory()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        _release_accelerator_memory()
+
+    def _evict_over_budget(self, keep: Optional[RegistryKey] = None) -> None:
+        # self._lock 보유 상태에서 호출
+        if not self.budget_bytes:
+            return
+        evicted = False
+        while self._resident_bytes() > self.budget_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                # 방금 올린 모델 하나만으로 예산 초과 → 그대로 둠
+                print(f"[ModelRegistry] {keep} alone exceeds budget, keeping it")
+                break
+            entry = self._entries.pop(victim)
+            self.evictions += 1
+            evicted = True
+            print(f"[ModelRegistry] evicted (LRU) {victim} ({entry.size_bytes / 1024 / 1024:.1f}MB)")
+            del entry
+        if evicted:
+            _release_accelerator_memory()
+
+    def evict_idle(self) -> List[RegistryKey]:
+        if not self.idle_timeout_sec:
+            return []
+        now = time.time()
+        with self._lock:
+            expired = [
+                k for k, e in self._entries.items()
+                if now - e.last_used >= self.idle_timeout_sec
+            ]
+            for k in expired:
+                self._entries.pop(k, None)
+                print(f"[ModelRegistry] idle timeout, unloaded {k}")
+        if expired:
+            _release_accelerator_memory()
+        return expired
+
+    def _ensure_reaper(self) -> None:
+        if not self.idle_timeout_sec:
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(
+                target=self._reap_loop, name="model-registry-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_loop(self) -> None:
+        interval = max(1.0, min(60.0, self.idle_timeout_sec / 4))
+        while not self._stop.wait(interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._entries:
+                    self._reaper = None
+                    return
+
+    # 상태 보고
+    def _resident_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            models = [
+                {
+                    "name": e.key[0],
+                    "dtype": e.key[1],
+                    "device": e.key[2],
+                    "size_mb": round(e.size_bytes / 1024 / 1024, 1),
+                    "load_seconds": round(e.load_seconds, 2),
+                    "idle_seconds": round(now - e.last_used, 1),
+                    "hits": e.hits,
+                }
+                # 최근 사용 순
+                for e in reversed(self._entries.values())
+            ]
+            return {
+                "resident_mb": round(self._resident_bytes() / 1024 / 1024, 1),
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 1) if self.budget_bytes else None,
+                "idle_timeout_sec": self.idle_timeout_sec or None,
+                "evictions": self.evictions,
+                "models": models,
+            }
+
+
+# 프로세스 전역 인스턴스
+registry = ModelRegistry()
@@ -0,0 +1,159 @@
+# image_prep.py
+# 2025-12-06
+"""
+Vision에 보내기 전 업로드 처리
+ - read_upload: 업로드를 청크 단위로 읽고, 제한을 넘는 순간 더 읽지 않음
+ - prepare_image: EXIF 회전 반영 → 투명 배경은 흰색으로 합성 → 긴 변 OCR_IMAGE_MAX_DIMENSION 이하로 축소
+   → (선택) 흑백 → JPEG 재압축
+   OCR에 충분한 해상도만 남겨서 업로드 바이트 / Vision 지연을 줄임
+ - 결과가 원본보다 크고 회전/축소/투명 합성도 없었으면 원본 그대로 사용
+ - Pillow가 없거나 디코딩에 실패하면 원본 그대로
+"""
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    USE_PIL = True
+except Exception:
+    Image = ImageOps = None
+    USE_PIL = False
+
+OCR_IMAGE_NORMALIZE = os.getenv("OCR_IMAGE_NORMALIZE", "1") == "1"
+OCR_IMAGE_MAX_DIMENSION = int(os.getenv("OCR_IMAGE_MAX_DIMENSION", "2048"))
+OCR_IMAGE_GRAYSCALE = os.getenv("OCR_IMAGE_GRAYSCALE", "1") == "1"
+OCR_IMAGE_JPEG_QUALITY = int(os.getenv("OCR_IMAGE_JPEG_QUALITY", "85"))
+# 이미지마다 전/후 크기 로그 출력
+OCR_IMAGE_REPORT = os.getenv("OCR_IMAGE_REPORT", "0") == "1"
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(file, limit: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Optional[bytes]:
+    """
+    UploadFile을 chunk_size씩 읽음. limit을 넘는 순간 읽기를 멈추고 None 반환 (호출 측에서 413 처리).
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > limit:
+        # multipart 파싱 때 크기를 이미 알면 읽지 않고 바로 초과 처리
+        return None
+    buf = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        if len(buf) > limit:
+            return None
+    return bytes(buf)
+
+
+@dataclass
+class PreparedImage:
+    content: bytes
+    original_bytes: int
+    original_size: Optional[Tuple[int, int]] = None
+    size: Optional[Tuple[int, int]] = None
+    normalized: bool = False
+    elapsed_ms: float = 0.0
+
+
+class ImagePrepStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.normalized = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+
+    def record(self, p: PreparedImage) -> None:
+        with self._lock:
+            self.images += 1
+            self.normalized += int(p.normalized)
+            self.bytes_in += p.original_bytes
+            self.bytes_out += len(p.content)
+            self.total_ms += p.elapsed_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": OCR_IMAGE_NORMALIZE and USE_PIL,
+                "max_dimension": OCR_IMAGE_MAX_DIMENSION,
+                "grayscale": OCR_IMAGE_GRAYSCALE,
+                "jpeg_quality": OCR_IMAGE_JPEG_QUALITY,
+                "images": self.images,
+                "normalized": self.normalized,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "size_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "avg_prep_ms": round(self.total_ms / self.images, 2) if self.images else None,
+            }
+
+
+prep_stats = ImagePrepStats()
+
+
+def _flatten_alpha(img) -> Tuple[Any, bool]:
+    """
+    투명 픽셀이 있는 이미지(RGBA/LA/투명 색이 지정된 P·L·RGB)를 흰 배경에 합성.
+    바로 RGB/L 로 바꾸면 투명 부분이 밑바탕 색(대개 검정)이 돼서 투명 배경 캡처의 검은 글씨가 사라짐.
+    """
+    if "A" not in img.getbands() and "transparency" not in img.info:
+        return img, False
+    rgba = img.convert("RGBA")
+    background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+    return Image.alpha_composite(background, rgba), True
+
+
+def prepare_image(
+    content: bytes,
+    max_dimension: int = OCR_IMAGE_MAX_DIMENSION,
+    grayscale: bool = OCR_IMAGE_GRAYSCALE,
+    quality: int = OCR_IMAGE_JPEG_QUALITY,
+    enabled: bool = OCR_IMAGE_NORMALIZE,
+) -> PreparedImage:
+    t0 = time.perf_counter()
+    out = PreparedImage(content=content, original_bytes=len(content))
+    if enabled and USE_PIL:
+        try:
+            with Image.open(io.BytesIO(content)) as img:
+                out.original_size = img.size
+                w, h = img.size
+                if max(w, h) > max_dimension:
+                    # JPEG는 디코딩 단계에서 1/2, 1/4, 1/8 로 줄여 읽음 (결과는 목표 크기 이상)
+                    k = max_dimension / max(w, h)
+                    img.draft("L" if grayscale else "RGB", (int(w * k) + 1, int(h * k) + 1))
+                # EXIF Orientation(0x0112)이 1이 아니면 실제 픽셀 회전이 필요
+                rotated = img.getexif().get(0x0112, 1) != 1
+                fixed = ImageOps.exif_transpose(img)
+                fixed, flattened = _flatten_alpha(fixed)
+                if max(fixed.size) > max_dimension:
+                    fixed.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+                fixed = fixed.convert("L" if grayscale else "RGB")
+                buf = io.BytesIO()
+                fixed.save(buf, "JPEG", quality=quality, optimize=True)
+                new = buf.getvalue()
+                # 투명 이미지는 원본을 보내면 Vision 쪽에서도 배경이 검게 처리될 수 있어서 합성본 사용
+                must_replace = rotated or flattened or fixed.size != out.original_size
+                if must_replace or len(new) < len(content):
+                    out.content = new
+                    out.size = fixed.size
+                    out.normalized = True
+                else:
+                    out.size = out.original_size
+        except Exception as e:
+            print(f"[image_prep] normalize skipped: {e}")
+
+    out.elapsed_ms = (time.perf_counter() - t0) * 1000
+    prep_stats.record(out)
+    if OCR_IMAGE_REPORT:
+        print(
+            f"[image_prep] {out.original_bytes}B {out.original_size} -> {len(out.content)}B {out.size} "
+            f"({out.elapsed_ms:.1f}ms)"
+        )
+    return out
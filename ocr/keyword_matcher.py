@@ -0,0 +1,203 @@
+# keyword_matcher.py
+# 2025-12-06
+"""
+카테고리 키워드 / 브랜드 힌트 다중 패턴 매칭 (Aho-Corasick)
+ - 두 사전을 한 오토마톤으로 한 번만 빌드 → 텍스트를 한 번 훑어서 카테고리 점수와 브랜드를 같이 찾음
+ - 대소문자 무시 (패턴/텍스트 모두 lower())
+ - 사전 파일(JSON, OCR_KEYWORDS_PATH)이 있으면 기본 사전 대신 사용, 파일 mtime이 바뀌면 재시작 없이 다시 빌드
+   {"categories": {"식비": ["식당", ...], ...}, "brands": ["스타벅스", ...]}
+ - 결과는 기존 suggest_category / extract_merchant 브랜드 검사와 동일
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+KEYWORDS_PATH = os.getenv("OCR_KEYWORDS_PATH")
+# 파일 변경 확인 주기(초). 요청마다 stat 하지 않도록
+KEYWORDS_CHECK_SEC = float(os.getenv("OCR_KEYWORDS_CHECK_SEC", "2"))
+
+
+class KeywordMatcher:
+    """
+    categories: {카테고리: [키워드, ...]} (dict 순서 = 동점일 때 우선순위)
+    brands: [브랜드 힌트, ...]
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], brands: Iterable[str]):
+        self.categories = {cat: list(kws) for cat, kws in categories.items()}
+        self.brands = list(brands)
+
+        # 패턴(lower) → id, id별로 점수를 더할 카테고리 / 브랜드 여부
+        self._pattern_ids: Dict[str, int] = {}
+        self._pattern_cats: List[List[str]] = []
+        self._pattern_is_brand: List[bool] = []
+        for cat, kws in self.categories.items():
+            for kw in kws:
+                if kw:
+                    # 같은 키워드가 여러 번 있으면 기존처럼 그 횟수만큼 점수
+                    self._pattern_cats[self._add_pattern(kw)].append(cat)
+        for h in self.brands:
+            if h:
+                self._pattern_is_brand[self._add_pattern(h)] = True
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    def _add_pattern(self, pattern: str) -> int:
+        key = pattern.lower()
+        pid = self._pattern_ids.get(key)
+        if pid is None:
+            pid = len(self._pattern_ids)
+            self._pattern_ids[key] = pid
+            self._pattern_cats.append([])
+            self._pattern_is_brand.append(False)
+        return pid
+
+    def _build(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        outs: List[List[int]] = [[]]
+        for pattern, pid in self._pattern_ids.items():
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    outs.append([])
+                state = nxt
+            outs[state].append(pid)
+
+        # BFS로 실패 링크 + 출력 병합
+        q = deque(goto[0].values())
+        while q:
+            state = q.popleft()
+            for ch, nxt in goto[state].items():
+                q.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outs[nxt].extend(outs[fail[nxt]])
+        out[:] = [tuple(o) for o in outs]
+
+    def _iter_matches(self, text: str):
+        """(끝 위치, 패턴 id) 를 텍스트 앞에서부터. text는 이미 lower() 된 상태."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pid in out[state]:
+                    yield i, pid
+
+    def scan(self, text: str) -> Set[int]:
+        """텍스트에 나타난 서로 다른 패턴 id 집합."""
+        return {pid for _, pid in self._iter_matches(text.lower())}
+
+    def category_scores(self, text: str) -> Dict[str, int]:
+        """카테고리별로 텍스트에 포함된 (서로 다른) 키워드 수."""
+        score = {cat: 0 for cat in self.categories}
+        for pid in self.scan(text):
+            for cat in self._pattern_cats[pid]:
+                score[cat] += 1
+        return score
+
+    def suggest_category(self, text: str) -> Optional[str]:
+        """최고 점수 카테고리 (동점이면 사전 순서상 앞쪽), 매칭이 없으면 None."""
+        best_cat, best = None, 0
+        for cat, s in self.category_scores(text).items():
+            if s > best:
+                best_cat, best = cat, s
+        return best_cat
+
+    def first_brand_line(self, lines: List[str]) -> Optional[int]:
+        """브랜드 힌트가 들어 있는 첫 줄의 인덱스. 줄들을 이어 붙여 한 번만 훑음."""
+        if not lines:
+            return None
+        joined = "\n".join(lines).lower()
+        for end, pid in self._iter_matches(joined):
+            if self._pattern_is_brand[pid]:
+                # 패턴에 줄바꿈이 없으므로 매칭은 한 줄 안에서 끝남
+                return joined.count("\n", 0, end)
+        return None
+
+
+class KeywordDictionary:
+    """
+    기본 사전 + (선택) JSON 사전 파일.
+    matcher() 호출 시 KEYWORDS_CHECK_SEC 마다 파일 mtime을 확인해서 바뀌었으면 다시 빌드.
+    파일이 깨져 있으면 이전 matcher를 계속 사용.
+    """
+
+    def __init__(
+        self,
+        categories: Dict[str, List[str]],
+        brands: List[str],
+        path: Optional[str] = KEYWORDS_PATH,
+        check_interval: float = KEYWORDS_CHECK_SEC,
+    ):
+        self.default_categories = categories
+        self.default_brands = brands
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._matcher = KeywordMatcher(categories, brands)
+        self.reloads = 0
+        if self.path:
+            self.reload()
+
+    def reload(self) -> bool:
+        """사전 파일을 다시 읽음. 성공하면 True."""
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                matcher = KeywordMatcher(
+                    data.get("categories", self.default_categories),
+                    data.get("brands", self.default_brands),
+                )
+            except Exception as e:
+                print(f"[keyword_matcher] failed to load {self.path}: {e}")
+                return False
+            self._matcher = matcher
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            self.reloads += 1
+        print(
+            f"[keyword_matcher] loaded {self.path} "
+            f"(categories={len(matcher.categories)}, brands={len(matcher.brands)})"
+        )
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            # 실패해도 같은 파일을 매번 다시 읽지 않도록 mtime은 먼저 기록
+            self._mtime = mtime
+            self.reload()
+
+    def matcher(self) -> KeywordMatcher:
+        if self.path:
+            self._maybe_reload()
+        return self._matcher
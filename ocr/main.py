@@ -2,25 +2,41 @@
 # 코드 작성일: 2025년 11월 28일
 # 2025-12-06
 
+import asyncio
 import io
 import os
 import re
-from typing import List, Optional, Dict, Any
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict, Any, Tuple
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+# ocr/ 폴더에서 직접 실행해도 ocr 패키지를 찾을 수 있도록
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
 
-# Google Vision
-USE_VISION = True
-try:
-    from google.cloud import vision
-    vision_client = vision.ImageAnnotatorClient()
-except Exception:
-    USE_VISION = False
-    vision_client = None
+from ocr.keyword_matcher import KeywordDictionary
+from ocr.ocr_cache import get_ocr_cache
+from ocr.image_prep import prep_stats, prepare_image, read_upload
+
+# Google Vision: 라이브러리 import 와 클라이언트 생성 모두 첫 OCR 요청 때 (get_vision_client)
+# USE_VISION: None = 아직 import 시도 전
+USE_VISION: Optional[bool] = None
+vision = None
+
+_vision_client = None
+_vision_client_lock = threading.Lock()
+
+# Vision 왕복 + 이미지 정규화 + 파싱은 이 스레드 풀에서 실행 (이벤트 루프를 막지 않음)
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "8"))
+# 실행 중 + 대기 중 OCR 요청 상한. 넘으면 503
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "64"))
 
 # env 변수 로드
 load_dotenv()
@@ -47,6 +63,14 @@ CATEGORY_KEYWORDS = {
 
 CURRENCY_SYMBOLS = ["₩", "원", "KRW"]
 
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+
+# 배치 OCR: Vision batch_annotate_images 는 요청당 최대 16장
+VISION_BATCH_SIZE = min(16, int(os.getenv("OCR_VISION_BATCH_SIZE", "16")))
+# 동시에 보낼 batch_annotate_images 요청 수
+VISION_BATCH_CONCURRENCY = int(os.getenv("OCR_VISION_BATCH_CONCURRENCY", "4"))
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "64"))
+
 # Pydantic
 class OCRResult(BaseModel):
     merchant: Optional[str] = None
@@ -56,6 +80,16 @@ class OCRResult(BaseModel):
     suggested_category: Optional[str] = None
     raw_text: Optional[str] = None
 
+class OCRBatchItem(BaseModel):
+    filename: Optional[str] = None
+    result: Optional[OCRResult] = None
+    error: Optional[str] = None
+
+class OCRBatchResponse(BaseModel):
+    results: List[OCRBatchItem]
+    succeeded: int
+    failed: int
+
 # 한글 영수증 전처리/파싱
 DATE_PATTERNS = [
     r"(\d{4})[.\-/년\s](\d{1,2})[.\-/월\s](\d{1,2})",      # 2025.11.11 / 2025-11-11 / 2025년 11월 11
@@ -68,6 +102,13 @@ MONEY_PATTERNS = [
     r"([\d,]+\s*(?:원|₩))",
 ]
 
+# 미리 컴파일 (우선순위 순서 유지)
+DATE_RES = [re.compile(p) for p in DATE_PATTERNS]
+MONEY_RES = [re.compile(p, re.IGNORECASE) for p in MONEY_PATTERNS]
+
+NUMERIC_LINE_RE = re.compile(r"[0-9\s.:,\-\(\)]+")
+NON_CORE_RE = re.compile(r"[^가-힣A-Za-z0-9]")
+
 ITEM_LINE_PATTERN = re.compile(
     r"^(.+?)\s+(\d+) ?(개|EA|pcs|PCS)?\s+([\d,]+)[원₩]?$", re.IGNORECASE
 )
@@ -90,41 +131,57 @@ BRAND_HINTS = [
     "메가커피", "MEGA COFFEE",
 ]
 
+# 위 두 사전을 한 번에 매칭하는 Aho-Corasick 오토마톤 (OCR_KEYWORDS_PATH 파일이 있으면 그 사전 사용, 변경 시 자동 재빌드)
+keyword_dictionary = KeywordDictionary(CATEGORY_KEYWORDS, BRAND_HINTS)
+
 def normalize(text: str) -> List[str]:
-    lines = [re.sub(r"\s+", " ", ln).strip() for ln in text.splitlines()]
+    # split()/join 은 re.sub(r"\s+", " ", ln).strip() 과 같은 결과 (공백 판정 기준 동일)
+    lines = [" ".join(ln.split()) for ln in text.splitlines()]
     return [ln for ln in lines if ln]
 
+def _date_from_match(m: "re.Match") -> Optional[str]:
+    try:
+        if len(m.groups()) == 3:
+            y, mth, d = m.groups()
+            # 2자리 연도 보정
+            if len(y) == 2:
+                y = f"20{y}"
+            return f"{int(y):04d}-{int(mth):02d}-{int(d):02d}"
+        elif len(m.groups()) == 2:  # 11월 11일 패턴은 연도 미포함
+            mth, d = m.groups()
+            return f"{mth.zfill(2)}-{d.zfill(2)}"  # 연도 미상
+    except Exception:
+        pass
+    return None
+
 def extract_date(text: str) -> Optional[str]:
-    for pat in DATE_PATTERNS:
-        m = re.search(pat, text)
+    for rx in DATE_RES:
+        m = rx.search(text)
         if not m:
             continue
-        try:
-            if len(m.groups()) == 3:
-                y, mth, d = m.groups()
-                # 2자리 연도 보정
-                if len(y) == 2:
-                    y = f"20{y}"
-                return f"{int(y):04d}-{int(mth):02d}-{int(d):02d}"
-            elif len(m.groups()) == 2:  # 11월 11일 패턴은 연도 미포함
-                mth, d = m.groups()
-                return f"{mth.zfill(2)}-{d.zfill(2)}"  # 연도 미상
-        except Exception:
-            pass
+        date = _date_from_match(m)
+        if date:
+            return date
     return None
 
 def to_int_money(s: str) -> Optional[int]:
     s = s.replace(",", "").replace(" ", "").replace("원", "").replace("₩", "")
     return int(s) if s.isdigit() else None
 
+def _first_amount(rx: "re.Pattern", text: str) -> Optional[int]:
+    for m in rx.finditer(text):
+        money_str = m.group(2) if m.lastindex and m.lastindex >= 2 else m.group(1)
+        val = to_int_money(money_str)
+        if val and val > 0:
+            return val
+    return None
+
 def extract_amount(text: str) -> Optional[int]:
     # 우선 합계/총액 키워드 우선
-    for pat in MONEY_PATTERNS:
-        for m in re.finditer(pat, text, flags=re.IGNORECASE):
-            money_str = m.group(2) if m.lastindex and m.lastindex >= 2 else m.group(1)
-            val = to_int_money(money_str)
-            if val and val > 0:
-                return val
+    for rx in MONEY_RES:
+        val = _first_amount(rx, text)
+        if val:
+            return val
     return None
 
 def is_probably_merchant(line: str) -> bool:
@@ -141,11 +198,11 @@ def is_probably_merchant(line: str) -> bool:
         return False
 
     # 숫자/기호만 있으면 제외 (:,.-() 등 포함)
-    if re.fullmatch(r"[0-9\s.:,\-\(\)]+", line):
+    if NUMERIC_LINE_RE.fullmatch(line):
         return False
 
     # 너무 짧은 건 제외 (한글/영문/숫자만 보고 길이 체크)
-    core = re.sub(r"[^가-힣A-Za-z0-9]", "", line)
+    core = NON_CORE_RE.sub("", line)
     return len(core) >= 2
 
 def extract_merchant(lines: List[str]) -> Optional[str]:
@@ -153,9 +210,9 @@ def extract_merchant(lines: List[str]) -> Optional[str]:
     top = lines[:10] if len(lines) >= 10 else lines
 
     # 1) 브랜드 힌트가 있는 줄을 최우선 상호로 사용
-    for ln in top:
-        if any(h.lower() in ln.lower() for h in BRAND_HINTS):
-            return ln
+    idx = keyword_dictionary.matcher().first_brand_line(top)
+    if idx is not None:
+        return top[idx]
 
     # 2) 일반적인 상호 후보 검색
     for ln in top:
@@ -169,17 +226,27 @@ def extract_merchant(lines: List[str]) -> Optional[str]:
             return ln
     return None
 
+def _item_from_line(ln: str) -> Optional[Dict[str, Any]]:
+    # 품목 줄은 "... 숫자 금액[원]" 으로 끝남 → 정규식 전에 끝 글자로 빠르게 거름
+    last = ln[-1:]
+    if not (last.isdecimal() or last in ",원₩") or " " not in ln:
+        return None
+    m = ITEM_LINE_PATTERN.match(ln)
+    if not m:
+        return None
+    name, qty, _, price = m.groups()
+    return {
+        "name": name.strip(),
+        "qty": int(qty),
+        "price": to_int_money(price)
+    }
+
 def extract_items(lines: List[str]) -> List[Dict[str, Any]]:
     items = []
     for ln in lines:
-        m = ITEM_LINE_PATTERN.match(ln)
-        if m:
-            name, qty, _, price = m.groups()
-            items.append({
-                "name": name.strip(),
-                "qty": int(qty),
-                "price": to_int_money(price)
-            })
+        item = _item_from_line(ln)
+        if item:
+            items.append(item)
     return items
 
 def suggest_category(merchant: Optional[str], items: List[Dict[str, Any]],
@@ -189,23 +256,70 @@ def suggest_category(merchant: Optional[str], items: List[Dict[str, Any]],
         " ".join(i["name"] for i in items if i.get("name")),
         memo or ""
     ]))
-    score = {cat: 0 for cat in CATEGORY_KEYWORDS.keys()}
-    for cat, kws in CATEGORY_KEYWORDS.items():
-        for kw in kws:
-            if kw and kw.lower() in text.lower():
-                score[cat] += 1
-    # 최고 점수 카테고리
-    best = sorted(score.items(), key=lambda x: x[1], reverse=True)
-    if best and best[0][1] > 0:
-        return best[0][0]
-    return None
+    # 최고 점수 카테고리 (동점이면 CATEGORY_KEYWORDS 순서상 앞쪽)
+    return keyword_dictionary.matcher().suggest_category(text)
+
+def parse_receipt(text: str, memo: Optional[str] = None) -> OCRResult:
+    """
+    OCR 텍스트 → OCRResult (normalize + extract_* + suggest_category 와 같은 결과)
+    - 줄을 한 번만 돌면서 정규화 줄과 품목을 같이 만듦
+    - 날짜/금액 패턴은 공백 문자 패턴이 줄바꿈까지 매칭할 수 있어서 원문에 미리 컴파일한 패턴으로 한 번씩만 적용
+    """
+    lines: List[str] = []
+    items: List[Dict[str, Any]] = []
+    for raw in text.splitlines():
+        ln = " ".join(raw.split())
+        if not ln:
+            continue
+        lines.append(ln)
+        item = _item_from_line(ln)
+        if item:
+            items.append(item)
+
+    merchant = extract_merchant(lines)
+    return OCRResult(
+        merchant=merchant,
+        amount=extract_amount(text),
+        date=extract_date(text),
+        items=items,
+        suggested_category=suggest_category(merchant, items, memo),
+        raw_text=text
+    )
 
 # OCR
-def run_vision_ocr(content_bytes: bytes) -> str:
-    if not USE_VISION or not vision_client:
-        raise RuntimeError("Google Vision 클라이언트가 준비되지 않았습니다.")
-    image = vision.Image(content=content_bytes)
-    resp = vision_client.document_text_detection(image=image)
+def _import_vision():
+    global vision, USE_VISION
+    if USE_VISION is None:
+        try:
+            from google.cloud import vision as _vision
+            vision = _vision
+            USE_VISION = True
+        except Exception:
+            USE_VISION = False
+    return vision
+
+def get_vision_client():
+    """공유 Vision 클라이언트 (처음 호출할 때 생성, 실패하면 None → 다음 호출에서 다시 시도)."""
+    global _vision_client
+    if _vision_client is not None:
+        return _vision_client
+    if _import_vision() is None:
+        return None
+    with _vision_client_lock:
+        if _vision_client is None:
+            try:
+                _vision_client = vision.ImageAnnotatorClient()
+            except Exception as e:
+                print(f"[ocr] Vision client init failed: {e}")
+        return _vision_client
+
+def set_vision_client(client) -> None:
+    """테스트/로컬 stub 주입용 (document_text_detection, batch_annotate_images 구현)."""
+    global _vision_client
+    with _vision_client_lock:
+        _vision_client = client
+
+def _response_text(resp) -> str:
     if resp.error and resp.error.message:
         raise RuntimeError(resp.error.message)
     return (
@@ -213,6 +327,208 @@ def run_vision_ocr(content_bytes: bytes) -> str:
         or (resp.text_annotations[0].description if resp.text_annotations else "")
     )
 
+def run_vision_ocr(content_bytes: bytes) -> str:
+    client = get_vision_client()
+    if client is None:
+        raise RuntimeError("Google Vision 클라이언트가 준비되지 않았습니다.")
+    image = vision.Image(content=content_bytes) if USE_VISION else {"content": content_bytes}
+    resp = client.document_text_detection(image=image)
+    return _response_text(resp)
+
+def _cache_lookup(content_bytes: bytes) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    # 캐시 오류로 OCR 자체가 실패하지 않도록 (miss 로 처리)
+    cache = get_ocr_cache()
+    if cache is None:
+        return None, None
+    try:
+        return cache.lookup(content_bytes)
+    except Exception as e:
+        print(f"[ocr_cache] lookup failed: {e}")
+        return None, None
+
+def _cache_put(info: Optional[Dict[str, Any]], text: str) -> None:
+    cache = get_ocr_cache()
+    if cache is None or info is None:
+        return
+    try:
+        cache.put(info, text)
+    except Exception as e:
+        print(f"[ocr_cache] put failed: {e}")
+
+def ocr_text(content_bytes: bytes) -> str:
+    """
+    OCR 캐시(같은 이미지 / 근사 중복) 먼저 확인, 없으면 정규화(회전/축소/흑백/재압축)한 이미지로
+    Vision 호출 후 저장. 캐시 키는 원본 바이트 기준.
+    """
+    text, info = _cache_lookup(content_bytes)
+    if text is not None:
+        return text
+    text = run_vision_ocr(prepare_image(content_bytes).content)
+    _cache_put(info, text)
+    return text
+
+def _batch_requests(contents: List[bytes]) -> List[Dict[str, Any]]:
+    # dict 요청도 Vision 클라이언트가 그대로 받음 (로컬 stub 에서도 쓰기 쉬움)
+    feature = vision.Feature.Type.DOCUMENT_TEXT_DETECTION if USE_VISION else "DOCUMENT_TEXT_DETECTION"
+    return [{"image": {"content": c}, "features": [{"type_": feature}]} for c in contents]
+
+def run_vision_ocr_batch(contents: List[bytes], client=None) -> List[Any]:
+    """
+    여러 이미지를 batch_annotate_images (VISION_BATCH_SIZE장씩) 로 OCR.
+    반환: 입력 순서대로 텍스트(str) 또는 해당 이미지의 예외
+    client: batch_annotate_images(requests=...) 를 가진 객체 (기본: get_vision_client(), 테스트에서는 stub)
+    """
+    client = client or get_vision_client()
+    if client is None:
+        raise RuntimeError("Google Vision 클라이언트가 준비되지 않았습니다.")
+
+    out: List[Any] = [None] * len(contents)
+    for start in range(0, len(contents), VISION_BATCH_SIZE):
+        group = contents[start:start + VISION_BATCH_SIZE]
+        try:
+            resp = client.batch_annotate_images(requests=_batch_requests(group))
+            for i, r in enumerate(resp.responses):
+                try:
+                    out[start + i] = _response_text(r)
+                except Exception as e:
+                    out[start + i] = e
+        except Exception as e:
+            # 배치 요청 자체가 실패하면 그 그룹 전체를 실패 처리
+            for i in range(len(group)):
+                out[start + i] = e
+    return out
+
+def ocr_receipts_batch(
+    files: List[Tuple[Optional[str], Optional[bytes]]],
+    memo: Optional[str] = None,
+    client=None,
+) -> OCRBatchResponse:
+    """
+    (filename, bytes) 목록 → 파일별 OCRResult 또는 에러. bytes가 None이면 크기 초과(read_upload).
+    VISION_BATCH_SIZE장씩 묶은 Vision 요청을 최대 VISION_BATCH_CONCURRENCY개 동시에 보내고,
+    먼저 돌아온 그룹부터 파싱 (다른 그룹의 Vision 왕복과 파싱이 겹침).
+    """
+    results = [OCRBatchItem(filename=name) for name, _ in files]
+
+    def parse_into(idx: int, text: str) -> None:
+        try:
+            results[idx].result = parse_receipt(text, memo)
+        except Exception as e:
+            results[idx].error = f"OCR 처리 중 오류: {e}"
+
+    # 업로드 검증 (빈 파일 / 크기 초과는 Vision에 보내지 않음) + OCR 캐시 확인
+    pending: List[int] = []
+    cache_info: Dict[int, Optional[Dict[str, Any]]] = {}
+    for idx, (_, content) in enumerate(files):
+        if content is None or len(content) > MAX_IMAGE_BYTES:
+            results[idx].error = "이미지 크기가 너무 큽니다(>8MB)."
+        elif len(content) == 0:
+            results[idx].error = "빈 파일입니다."
+        else:
+            text, cache_info[idx] = _cache_lookup(content)
+            if text is not None:
+                parse_into(idx, text)
+            else:
+                pending.append(idx)
+
+    def ocr_group(g: List[int]) -> List[Any]:
+        return run_vision_ocr_batch([prepare_image(files[idx][1]).content for idx in g], client)
+
+    groups = [pending[i:i + VISION_BATCH_SIZE] for i in range(0, len(pending), VISION_BATCH_SIZE)]
+    if groups:
+        workers = max(1, min(VISION_BATCH_CONCURRENCY, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(ocr_group, g): g
+                for g in groups
+            }
+            for fut in as_completed(futures):
+                g = futures[fut]
+                try:
+                    texts = fut.result()
+                except Exception as e:
+                    texts = [e] * len(g)
+                for idx, text in zip(g, texts):
+                    if isinstance(text, Exception):
+                        results[idx].error = f"OCR 처리 중 오류: {text}"
+                        continue
+                    _cache_put(cache_info.get(idx), text)
+                    parse_into(idx, text)
+
+    failed = sum(1 for r in results if r.error)
+    return OCRBatchResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+# 비동기 엔드포인트용 OCR 실행기
+class OCRBusyError(RuntimeError):
+    pass
+
+class OCRExecutor:
+    """
+    동기 OCR 작업(Vision 호출 등)을 전용 스레드 풀에서 실행하고 await 로 결과를 받음.
+    - 동시에 실행되는 작업은 max_workers개, 대기 포함 max_pending개를 넘으면 OCRBusyError
+    """
+
+    def __init__(self, max_workers: int = OCR_MAX_WORKERS, max_pending: int = OCR_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+            return self._pool
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise OCRBusyError("OCR 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+ocr_executor = OCRExecutor()
+
+def ocr_receipt_bytes(content: bytes, memo: Optional[str] = None) -> OCRResult:
+    """이미지 바이트 → OCRResult (캐시 → 정규화 → Vision → 파싱). 블로킹."""
+    return parse_receipt(ocr_text(content), memo)
+
+async def ocr_receipt_async(content: bytes, memo: Optional[str] = None) -> OCRResult:
+    """ocr_receipt_bytes 를 OCR 전용 스레드 풀에서 실행 (꽉 차면 503)."""
+    try:
+        return await ocr_executor.run(ocr_receipt_bytes, content, memo)
+    except OCRBusyError as e:
+        raise HTTPException(503, str(e))
+
+async def ocr_receipts_batch_async(
+    files: List[Tuple[Optional[str], Optional[bytes]]],
+    memo: Optional[str] = None,
+) -> "OCRBatchResponse":
+    try:
+        return await ocr_executor.run(ocr_receipts_batch, files, memo)
+    except OCRBusyError as e:
+        raise HTTPException(503, str(e))
+
 # API 엔드포인트 !!!
 @app.post("/api/ocr-receipt", response_model=OCRResult)
 async def ocr_receipt(
@@ -220,34 +536,44 @@ async def ocr_receipt(
     memo: Optional[str] = Form(default=None)
 ):
     try:
-        content = await file.read()
+        # 청크 단위로 읽다가 제한을 넘으면 바로 중단
+        content = await read_upload(file, MAX_IMAGE_BYTES)
+        if content is None:
+            raise HTTPException(413, "이미지 크기가 너무 큽니다(>8MB).")
         if len(content) == 0:
             raise HTTPException(400, "빈 파일입니다.")
-        if len(content) > 8 * 1024 * 1024:
-            raise HTTPException(413, "이미지 크기가 너무 큽니다(>8MB).")
 
-        text = run_vision_ocr(content)
-        lines = normalize(text)
-
-        merchant = extract_merchant(lines)
-        amount = extract_amount(text)
-        date = extract_date(text)
-        items = extract_items(lines)
-        cat = suggest_category(merchant, items, memo)
-
-        return OCRResult(
-            merchant=merchant,
-            amount=amount,
-            date=date,
-            items=items,
-            suggested_category=cat,
-            raw_text=text
-        )
+        # Vision 왕복 동안 이벤트 루프를 막지 않음
+        return await ocr_receipt_async(content, memo)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(500, f"OCR 처리 중 오류: {e}")
 
+@app.post("/api/ocr-receipts", response_model=OCRBatchResponse)
+async def ocr_receipts(
+    files: List[UploadFile] = File(...),
+    memo: Optional[str] = Form(default=None)
+):
+    """여러 영수증 한 번에 업로드 → 파일별 결과/에러"""
+    if len(files) > OCR_BATCH_MAX_FILES:
+        raise HTTPException(413, f"한 번에 최대 {OCR_BATCH_MAX_FILES}개까지 업로드할 수 있습니다.")
+    payload = [(f.filename, await read_upload(f, MAX_IMAGE_BYTES)) for f in files]
+    return await ocr_receipts_batch_async(payload, memo)
+
+@app.get("/api/ocr-cache")
+def ocr_cache_stats():
+    cache = get_ocr_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+@app.get("/api/ocr-image-stats")
+def ocr_image_stats():
+    return prep_stats.snapshot()
+
+@app.get("/api/ocr-executor")
+def ocr_executor_stats():
+    return ocr_executor.stats()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -0,0 +1,272 @@
+# ocr_cache.py
+# 2025-12-06
+"""
+OCR 결과(원문 텍스트) 디스크 캐시 (SQLite)
+ - 키: 이미지 바이트 SHA-256 → 같은 파일을 다시 올리면 Vision 호출 없이 바로 텍스트 반환
+ - 근사 중복(기본 꺼짐): dHash(difference hash) 해밍 거리 ≤ OCR_CACHE_DHASH_DISTANCE 이고 가로세로 비율이 비슷하면
+   같은 영수증으로 봄 (재캡처/재압축 스크린샷). 같은 가게 양식으로 찍힌 다른 영수증(다른 날짜/금액, 다른 사용자)도
+   이 거리 안에 들어올 수 있고 캐시는 프로세스 전체가 공유하므로, 켜면 남의 영수증 텍스트가 반환될 수 있음.
+   Pillow가 없거나 꺼져 있으면 정확히 같은 바이트만 캐시
+ - dHash 인덱스: 해시를 (거리+1)개 구간으로 나눠 구간별 dict → 비둘기집 원리로 후보만 비교
+ - LRU: 최대 OCR_CACHE_MAX_ENTRIES개, 넘으면 마지막 사용이 오래된 것부터 삭제
+ - stats(): 적중률, 절약한 업로드 바이트(= 캐시 적중으로 Vision에 보내지 않은 이미지 크기)
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from PIL import Image
+    USE_PIL = True
+except Exception:
+    Image = None
+    USE_PIL = False
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "1") == "1"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "./openwallet_ocr_cache.db")
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "5000"))
+# dHash 한 변 크기 (해시 비트 수 = DHASH_SIZE²). 영수증은 흰 바탕이 많아서 8x8(64bit)보다 크게
+DHASH_SIZE = int(os.getenv("OCR_CACHE_DHASH_SIZE", "16"))
+# 근사 중복으로 볼 최대 해밍 거리 (-1 = 비활성, 기본: SHA-256 완전 일치만)
+# 재압축/축소한 같은 영수증은 대부분 12 이하 (256bit 기준, 합성 영수증으로 측정).
+# 같은 양식의 다른 영수증도 이 범위에 들어올 수 있으므로 단일 사용자 환경에서만 켤 것
+DHASH_MAX_DISTANCE = int(os.getenv("OCR_CACHE_DHASH_DISTANCE", "-1"))
+# 가로세로 비율 차이 허용치 (다른 크기의 영수증끼리 잘못 매칭되지 않도록)
+ASPECT_TOLERANCE = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    sha256      TEXT PRIMARY KEY,
+    dhash       TEXT,
+    aspect      REAL,
+    image_bytes INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache (last_used);
+"""
+
+
+def sha256_of(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def dhash(content: bytes, size: int = DHASH_SIZE) -> Optional[Tuple[int, float]]:
+    """이미지 바이트 → (dHash 정수, 가로/세로 비율). 디코딩 실패 / Pillow 없음이면 None."""
+    if not USE_PIL:
+        return None
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            aspect = img.width / img.height if img.height else 0.0
+            small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+            px = small.tobytes()
+    except Exception:
+        return None
+    bits = 0
+    for row in range(size):
+        base = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits, aspect
+
+
+class _DHashIndex:
+    """해밍 거리 ≤ max_distance 검색용 다중 구간 인덱스 (메모리)."""
+
+    def __init__(self, n_bits: int, max_distance: int):
+        self.max_distance = max_distance
+        n_bands = max_distance + 1
+        width = -(-n_bits // n_bands)
+        self._bands = [(i * width, min(width, n_bits - i * width)) for i in range(n_bands) if i * width < n_bits]
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._entries: Dict[str, Tuple[int, float]] = {}
+
+    def _keys(self, h: int):
+        for shift, width in self._bands:
+            yield (h >> shift) & ((1 << width) - 1)
+
+    def add(self, key: str, h: int, aspect: float) -> None:
+        self._entries[key] = (h, aspect)
+        for table, band in zip(self._tables, self._keys(h)):
+            table.setdefault(band, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table, band in zip(self._tables, self._keys(entry[0])):
+            keys = table.get(band)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del table[band]
+
+    def nearest(self, h: int, aspect: float) -> Optional[Tuple[str, int]]:
+        # 거리 ≤ d 이면 d+1개 구간 중 적어도 하나는 완전히 같음
+        candidates: Set[str] = set()
+        for table, band in zip(self._tables, self._keys(h)):
+            candidates |= table.get(band, set())
+        best = None
+        for key in candidates:
+            other, other_aspect = self._entries[key]
+            if abs(other_aspect - aspect) > ASPECT_TOLERANCE * max(aspect, other_aspect):
+                continue
+            dist = bin(h ^ other).count("1")
+            if dist <= self.max_distance and (best is None or dist < best[1]):
+                best = (key, dist)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OCRCache:
+    def __init__(
+        self,
+        db_path: str = OCR_CACHE_PATH,
+        max_entries: int = OCR_CACHE_MAX_ENTRIES,
+        dhash_size: int = DHASH_SIZE,
+        max_distance: int = DHASH_MAX_DISTANCE,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.dhash_size = dhash_size
+        self.near_dup = USE_PIL and max_distance >= 0
+        self._lock = threading.Lock()
+        self._index = _DHashIndex(dhash_size * dhash_size, max(0, max_distance))
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if self.near_dup:
+                for row in conn.execute("SELECT sha256, dhash, aspect FROM ocr_cache WHERE dhash IS NOT NULL"):
+                    self._index.add(row["sha256"], int(row["dhash"], 16), row["aspect"])
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, content: bytes) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        이미지 바이트 → (캐시된 OCR 텍스트 또는 None, 키 정보)
+        키 정보는 miss 뒤 put()에 그대로 넘기면 해시를 다시 계산하지 않음.
+        """
+        info: Dict[str, Any] = {"sha256": sha256_of(content), "image_bytes": len(content)}
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM ocr_cache WHERE sha256 = ?", (info["sha256"],)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE ocr_cache SET last_used = ? WHERE sha256 = ?", (now, info["sha256"]))
+                self._record_hit("exact", len(content))
+                return row["text"], info
+
+        if self.near_dup:
+            hashed = dhash(content, self.dhash_size)
+            if hashed is not None:
+                info["dhash"], info["aspect"] = hashed
+                with self._lock:
+                    near = self._index.nearest(*hashed)
+                if near is not None:
+                    with self._connect() as conn:
+                        row = conn.execute("SELECT text FROM ocr_cache WHERE sha256 = ?", (near[0],)).fetchone()
+                        if row is not None:
+                            conn.execute("UPDATE ocr_cache SET last_used = ? WHERE sha256 = ?", (now, near[0]))
+                            self._record_hit("near", len(content))
+                            return row["text"], info
+
+        with self._lock:
+            self.misses += 1
+        return None, info
+
+    def _record_hit(self, kind: str, nbytes: int) -> None:
+        with self._lock:
+            if kind == "exact":
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self.bytes_saved += nbytes
+
+    def put(self, info: Dict[str, Any], text: str) -> None:
+        """lookup()이 돌려준 키 정보 + Vision 결과 저장. 최대 개수를 넘으면 LRU 삭제."""
+        now = time.time()
+        h = info.get("dhash")
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache "
+                "(sha256, dhash, aspect, image_bytes, text, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (info["sha256"], f"{h:x}" if h is not None else None, info.get("aspect"),
+                 info["image_bytes"], text, now, now),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+            evicted: List[str] = []
+            if count > self.max_entries:
+                evicted = [
+                    r["sha256"] for r in conn.execute(
+                        "SELECT sha256 FROM ocr_cache ORDER BY last_used ASC LIMIT ?",
+                        (count - self.max_entries,),
+                    )
+                ]
+                conn.executemany("DELETE FROM ocr_cache WHERE sha256 = ?", [(k,) for k in evicted])
+        with self._lock:
+            if self.near_dup and h is not None:
+                self._index.add(info["sha256"], h, info["aspect"])
+            for k in evicted:
+                self._index.remove(k)
+            self.evictions += len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM ocr_cache"
+            ).fetchone()
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            lookups = hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "stored_text_chars": stored,
+                "near_duplicate_detection": self.near_dup,
+                "dhash_bits": self.dhash_size * self.dhash_size if self.near_dup else None,
+                "max_hamming_distance": self._index.max_distance if self.near_dup else None,
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """프로세스 공용 캐시 (OCR_CACHE_ENABLED=0 이면 None). 첫 사용 시 DB 파일 생성."""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
@@ -0,0 +1,199 @@
+# prefix_cache.py
+# 2025-12-06
+"""
+고정 시스템 프롬프트 KV 캐시 재사용 (Qwen 리포트, Kanana 요약 공용)
+ - chat 템플릿을 적용한 프롬프트에서 사용자 메시지 앞부분(시스템 프롬프트 + 역할 헤더)은 요청마다 같음
+   → 모델별로 한 번만 prefill 해서 past_key_values를 보관, 요청마다 복사해서 generate()에 넘김
+   → prefill은 사용자별 뒷부분만 계산
+ - 경계 토큰이 뒤 텍스트와 합쳐져 다르게 토큰화될 수 있으므로 prefix 마지막 토큰은 캐시하지 않고,
+   실제 input_ids가 캐시한 토큰으로 시작하는지 확인 (다르면 캐시 없이 생성)
+ - 키: (모델 객체, device, prefix 텍스트). 모델이 레지스트리에서 내려가면(GC) 해당 캐시도 삭제
+ - 기본은 비활성. 요청마다 KV 복사 + 명시적 mask 경로 비용이 있어서 측정한 환경에서는 TTFT가 오히려 늘었음
+   → 배포 모델/장비에서 benchmarks/prefix_cache/bench.py 로 이득을 확인한 뒤 PROMPT_PREFIX_CACHE=1
+"""
+import copy
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+PROMPT_PREFIX_CACHE = os.getenv("PROMPT_PREFIX_CACHE", "0") == "1"
+# 보관할 prefix 개수 (모델 × 시스템 프롬프트 종류)
+PREFIX_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_PREFIX_CACHE_MAX_ENTRIES", "8"))
+
+
+def prefix_text_of(tokenizer, messages: List[Dict[str, str]], full_text: str) -> Optional[str]:
+    """
+    chat 템플릿 적용 결과(full_text)에서 마지막 메시지 내용 앞까지 = 요청마다 같은 부분.
+    시스템 메시지가 없으면 None.
+    """
+    if len(messages) < 2 or messages[0].get("role") != "system":
+        return None
+    pos = full_text.rfind(messages[-1]["content"])
+    if pos <= 0:
+        return None
+    return full_text[:pos]
+
+
+class _Entry:
+    __slots__ = ("ids", "kv", "build_ms", "hits", "model_ref")
+
+    def __init__(self, ids, kv, build_ms: float, model_ref=None):
+        self.model_ref = model_ref
+        self.ids = ids
+        self.kv = kv
+        self.build_ms = build_ms
+        self.hits = 0
+
+
+class PrefixKVCache:
+    def __init__(self, max_entries: int = PREFIX_CACHE_MAX_ENTRIES, enabled: bool = PROMPT_PREFIX_CACHE):
+        self.max_entries = max_entries
+        self.enabled = enabled and max_entries > 0
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Tuple, threading.Lock] = {}
+        self._finalizers: Dict[int, Any] = {}
+        # GC(finalize)로 내려간 모델 id. 콜백은 아무 할당 시점에나 돌 수 있어서 락 없이 넣기만 하고
+        # 삭제는 락을 잡은 쪽에서 (_purge_dropped)
+        self._dropped: "deque[int]" = deque()
+
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+        self.reused_tokens = 0
+
+    def _entry(self, tokenizer, model, prefix_text: str, add_special_tokens: bool) -> Optional[_Entry]:
+        import torch
+
+        key = (id(model), str(model.device), prefix_text, add_special_tokens)
+        with self._lock:
+            self._purge_dropped()
+            entry = self._live_entry(key, model)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            try:
+                with self._lock:
+                    entry = self._live_entry(key, model)
+                if entry is not None:
+                    return entry
+
+                ids = tokenizer(prefix_text, add_special_tokens=add_special_tokens, return_tensors="pt")["input_ids"]
+                # 마지막 토큰은 뒤 텍스트와 합쳐질 수 있어서 제외
+                ids = ids[:, :-1].to(model.device)
+                if ids.shape[1] == 0:
+                    return None
+                t0 = time.perf_counter()
+                with torch.no_grad():
+                    kv = model(input_ids=ids, use_cache=True).past_key_values
+                entry = _Entry(ids, kv, (time.perf_counter() - t0) * 1000, weakref.ref(model))
+                print(f"[prefix_cache] cached {ids.shape[1]} prefix tokens ({entry.build_ms:.1f}ms)")
+
+                with self._lock:
+                    self._entries[key] = entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                    if id(model) not in self._finalizers:
+                        # 모델이 언로드되면 KV 텐서(GPU 메모리)도 같이 해제
+                        self._finalizers[id(model)] = weakref.finalize(model, self._drop_model, id(model))
+                return entry
+            finally:
+                # 성공/실패/빈 prefix 모두 정리 (prefill 이 계속 실패하는 키로 dict 가 커지지 않도록)
+                with self._lock:
+                    self._build_locks.pop(key, None)
+
+    def _live_entry(self, key: Tuple, model) -> Optional[_Entry]:
+        # self._lock 보유 상태에서 호출. 정리가 밀린 사이 같은 id 를 받은 다른 모델이면 버림
+        entry = self._entries.get(key)
+        if entry is not None and entry.model_ref() is not model:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _drop_model(self, model_id: int) -> None:
+        # weakref.finalize 콜백: 같은 스레드가 self._lock 을 잡은 채 GC가 돌 수 있으므로 기다리지 않음
+        self._dropped.append(model_id)
+        if self._lock.acquire(blocking=False):
+            try:
+                self._purge_dropped()
+            finally:
+                self._lock.release()
+
+    def _purge_dropped(self) -> None:
+        # self._lock 보유 상태에서 호출
+        while self._dropped:
+            model_id = self._dropped.popleft()
+            for key in [k for k in self._entries if k[0] == model_id]:
+                del self._entries[key]
+            self._finalizers.pop(model_id, None)
+
+    def past_key_values(
+        self,
+        tokenizer,
+        model,
+        messages: List[Dict[str, str]],
+        full_text: str,
+        input_ids,
+        add_special_tokens: bool = True,
+    ) -> Tuple[Optional[Any], int]:
+        """
+        input_ids(1 x N)에 쓸 수 있는 prefix KV 복사본과 재사용 토큰 수. 못 쓰면 (None, 0).
+        반환된 캐시는 generate(input_ids=..., past_key_values=...) 에 그대로 넘기면 됨 (generate가 수정하므로 매번 복사).
+        """
+        if not self.enabled or input_ids.shape[0] != 1:
+            return None, 0
+        prefix_text = prefix_text_of(tokenizer, messages, full_text)
+        if prefix_text is None:
+            return None, 0
+        try:
+            entry = self._entry(tokenizer, model, prefix_text, add_special_tokens)
+        except Exception as e:
+            print(f"[prefix_cache] build failed, generating without cache: {e}")
+            entry = None
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None, 0
+
+        n = entry.ids.shape[1]
+        if input_ids.shape[1] <= n or not bool((input_ids[0, :n] == entry.ids[0].to(input_ids.device)).all()):
+            with self._lock:
+                self.mismatches += 1
+            return None, 0
+        with self._lock:
+            self.hits += 1
+            entry.hits += 1
+            self.reused_tokens += n
+        return copy.deepcopy(entry.kv), n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._purge_dropped()
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge_dropped()
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "mismatches": self.mismatches,
+                "reused_prefill_tokens": self.reused_tokens,
+                "prefixes": [
+                    {"tokens": e.ids.shape[1], "build_ms": round(e.build_ms, 1), "hits": e.hits}
+                    for e in self._entries.values()
+                ],
+            }
+
+
+# 프로세스 전역 인스턴스
+prefix_cache = PrefixKVCache()
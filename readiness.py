@@ -0,0 +1,95 @@
+# readiness.py
+# 2025-12-06
+"""
+서브시스템별 준비 상태 (GET /ready)
+ - 상태: pending(대기) → loading(로드 중) → ready / failed / unavailable(의존성 없음, fallback 동작)
+ - lazy: 워밍업 대상이 아님 (첫 요청 때 로드) → 준비 판정에서 제외
+ - required 서브시스템이 모두 ready 또는 unavailable 이면 ready → Kubernetes readinessProbe 용
+ - run_warmup(): 등록된 단계를 순서대로 백그라운드 스레드에서 실행, 단계별 소요 시간/에러 기록
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+UNAVAILABLE = "unavailable"
+LAZY = "lazy"
+
+# 요청을 받아도 되는 상태
+_SERVABLE = (READY, UNAVAILABLE, LAZY)
+
+
+class ReadinessTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._subsystems: Dict[str, Dict[str, Any]] = {}
+        self._steps: List[Tuple[str, Callable[[], Optional[str]]]] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, state: str = PENDING, required: bool = True) -> None:
+        with self._lock:
+            self._subsystems[name] = {"state": state, "required": required, "elapsed_ms": None, "error": None}
+
+    def set(self, name: str, state: str, elapsed_ms: Optional[float] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self._subsystems.setdefault(name, {"required": True})
+            entry.update(state=state, elapsed_ms=elapsed_ms, error=error)
+
+    def state(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._subsystems.get(name)
+            return entry["state"] if entry else None
+
+    def add_step(self, name: str, fn: Callable[[], Optional[str]], required: bool = True) -> None:
+        """
+        워밍업 단계 등록. fn() 이 끝나면 ready (UNAVAILABLE 을 반환하면 unavailable), 예외면 failed.
+        """
+        self.register(name, PENDING, required)
+        self._steps.append((name, fn))
+
+    def run_step(self, name: str, fn: Callable[[], Optional[str]]) -> bool:
+        self.set(name, LOADING)
+        t0 = time.perf_counter()
+        try:
+            state = fn() or READY
+        except Exception as e:
+            elapsed = round((time.perf_counter() - t0) * 1000, 1)
+            self.set(name, FAILED, elapsed, f"{type(e).__name__}: {e}")
+            print(f"[readiness] {name} failed after {elapsed}ms: {e}")
+            return False
+        elapsed = round((time.perf_counter() - t0) * 1000, 1)
+        self.set(name, state, elapsed)
+        print(f"[readiness] {name} {state} ({elapsed}ms)")
+        return True
+
+    def run_warmup(self, background: bool = True) -> None:
+        """등록된 단계를 순서대로 실행 (background=True 면 데몬 스레드에서)."""
+        def _run():
+            for name, fn in self._steps:
+                self.run_step(name, fn)
+
+        if not background:
+            _run()
+            return
+        self._thread = threading.Thread(target=_run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def is_ready(self) -> bool:
+        return self.snapshot()["ready"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            subsystems = {name: dict(s) for name, s in self._subsystems.items()}
+        return {
+            "ready": all(s["state"] in _SERVABLE for s in subsystems.values() if s["required"]),
+            "uptime_sec": round(time.time() - self._started_at, 1),
+            "subsystems": subsystems,
+        }
+
+
+# 프로세스 전역 인스턴스
+readiness = ReadinessTracker()
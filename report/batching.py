@@ -0,0 +1,235 @@
+# batching.py
+# 2025-12-06
+"""
+Qwen 리포트 생성 동적 배칭
+ - 짧은 대기 시간(QWEN_BATCH_WAIT_MS) 안에 들어온 요청을 최대 QWEN_BATCH_MAX_SIZE개까지 모아
+   왼쪽 padding 후 model.generate 한 번으로 같이 생성
+ - 결과는 요청별 Future로 돌려줌 (요청별 max_new_tokens 만큼 잘라서 디코딩)
+ - 처리량 비교: python report/batching.py --requests 16
+"""
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import torch
+
+# report/ 폴더 밖(루트)에서 import 되지 않았을 때도 report 패키지를 찾을 수 있도록
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from report.qwen_model import GEN_KWARGS, MAX_NEW_TOKENS, build_report_messages, get_qwen_model
+
+BATCHING_ENABLED = os.getenv("QWEN_BATCHING", "0") == "1"
+BATCH_MAX_SIZE = int(os.getenv("QWEN_BATCH_MAX_SIZE", "8"))
+BATCH_WAIT_MS = float(os.getenv("QWEN_BATCH_WAIT_MS", "20"))
+
+
+@dataclass
+class _Pending:
+    transactions: List[Dict[str, Any]]
+    user_question: Optional[str]
+    max_new_tokens: int
+    aggregates: Optional[Dict[str, Any]] = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class ReportBatcher:
+    def __init__(
+        self,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_WAIT_MS,
+        max_new_tokens: int = MAX_NEW_TOKENS,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_sec = max(0.0, max_wait_ms) / 1000
+        self.max_new_tokens = max_new_tokens
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._loop, name="qwen-batcher", daemon=True)
+        self._worker.start()
+
+        # 처리량 측정용
+        self.batches = 0
+        self.requests = 0
+        self.generated_tokens = 0
+        self.busy_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.max_observed_batch = 0
+
+    def submit(
+        self,
+        transactions: List[Dict[str, Any]],
+        user_question: Optional[str] = None,
+        max_new_tokens: Optional[int] = None,
+        aggregates: Optional[Dict[str, Any]] = None,
+    ) -> Future:
+        p = _Pending(
+            transactions=transactions,
+            user_question=user_question,
+            max_new_tokens=max_new_tokens or self.max_new_tokens,
+            aggregates=aggregates,
+        )
+        self._queue.put(p)
+        return p.future
+
+    def generate(
+        self,
+        transactions: List[Dict[str, Any]],
+        user_question: Optional[str] = None,
+        max_new_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        aggregates: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        return self.submit(transactions, user_question, max_new_tokens, aggregates).result(timeout=timeout)
+
+    def _collect_batch(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_sec
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"[ReportBatcher] batch of {len(batch)} failed: {e}")
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+
+    def _run_batch(self, batch: List[_Pending]) -> None:
+        tokenizer, model = get_qwen_model()
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        texts = [
+            tokenizer.apply_chat_template(
+                build_report_messages(p.transactions, p.user_question, p.aggregates, tokenizer),
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+            for p in batch
+        ]
+        # decoder-only 배치 생성은 왼쪽 padding이어야 프롬프트 끝이 정렬됨
+        # (레지스트리에서 공유하는 tokenizer의 padding_side는 바꾸지 않고 이 호출에만 적용)
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, padding_side="left").to(model.device)
+        max_new = max(p.max_new_tokens for p in batch)
+
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new,
+                pad_token_id=tokenizer.pad_token_id,
+                **GEN_KWARGS,
+            )
+        elapsed = time.perf_counter() - t0
+
+        prompt_len = inputs["input_ids"].shape[1]
+        tokens = 0
+        for i, p in enumerate(batch):
+            gen_ids = outputs[i, prompt_len : prompt_len + p.max_new_tokens]
+            # 먼저 끝난 시퀀스 뒤쪽은 pad로 채워짐
+            tokens += int((gen_ids != tokenizer.pad_token_id).sum())
+            p.future.set_result(tokenizer.decode(gen_ids, skip_special_tokens=True).strip())
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.generated_tokens += tokens
+            self.busy_seconds += elapsed
+            self.queue_wait_seconds += sum(t0 - p.enqueued_at for p in batch)
+            self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        print(f"[ReportBatcher] batch={len(batch)} tokens={tokens} elapsed={elapsed:.2f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_sec * 1000,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+                "max_observed_batch": self.max_observed_batch,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_sec": round(self.generated_tokens / self.busy_seconds, 2) if self.busy_seconds else None,
+                "avg_queue_wait_ms": round(self.queue_wait_seconds / self.requests * 1000, 1) if self.requests else None,
+            }
+
+
+_batcher: Optional[ReportBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> ReportBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = ReportBatcher()
+        return _batcher
+
+
+if __name__ == "__main__":
+    # 현재 경로(요청마다 generate) vs 배칭 경로 처리량 비교
+    import argparse
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+
+    from report.qwen_model import generate_spending_report
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=16)
+    ap.add_argument("--max-new-tokens", type=int, default=128)
+    ap.add_argument("--batch-size", type=int, default=BATCH_MAX_SIZE)
+    ap.add_argument("--wait-ms", type=float, default=BATCH_WAIT_MS)
+    ap.add_argument("--transactions", default=os.path.join(os.path.dirname(__file__), "sample_transactions.json"))
+    a = ap.parse_args()
+
+    with open(a.transactions, "r", encoding="utf-8") as f:
+        txs = json.load(f)
+    question = "이 소비 내역을 요약해줘."
+    get_qwen_model()  # 로드 시간은 측정에서 제외
+
+    # 1) 현재 경로: 동시 요청이 와도 요청마다 batch size 1 generate
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=a.requests) as pool:
+        list(pool.map(
+            lambda _: generate_spending_report(txs, question, max_new_tokens=a.max_new_tokens, batched=False),
+            range(a.requests),
+        ))
+    baseline = time.perf_counter() - t0
+
+    # 2) 배칭 경로
+    b = ReportBatcher(max_batch_size=a.batch_size, max_wait_ms=a.wait_ms)
+    t0 = time.perf_counter()
+    futures = [b.submit(txs, question, max_new_tokens=a.max_new_tokens) for _ in range(a.requests)]
+    for fut in futures:
+        fut.result()
+    batched = time.perf_counter() - t0
+
+    print(json.dumps({
+        "requests": a.requests,
+        "baseline_sec": round(baseline, 2),
+        "baseline_req_per_sec": round(a.requests / baseline, 3),
+        "batched_sec": round(batched, 2),
+        "batched_req_per_sec": round(a.requests / batched, 3),
+        "speedup": round(baseline / batched, 2),
+        "batcher": b.stats(),
+    }, ensure_ascii=False, indent=2))
@@ -1,37 +1,256 @@
 #작성일 : 25/11/30
 # 2025-12-06
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# 로컬 Proxy 포트번호에 맞춰서.
-USER = "openwallet"
-PASSWORD = "openwallet1234"
-HOST = "127.0.0.1"
-PORT = "3306"   
-DB_NAME = "openwallet-db"
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes", "on")
+
+
+class DatabaseNotConfigured(RuntimeError):
+    """DATABASE_URL / DB_USER+DB_PASSWORD 가 없음 (재시도해도 해결되지 않음)."""
+
+
+@dataclass
+class DatabaseSettings:
+    """
+    DB 접속/커넥션 풀 설정. 모두 환경변수(.env)로 덮어쓸 수 있음.
+    - DATABASE_URL 이 있으면 그대로 사용, 없으면 DB_USER/DB_PASSWORD/DB_HOST/DB_PORT/DB_NAME 조합
+      (계정 정보는 기본값 없음. 둘 다 없으면 첫 DB 사용 시 DatabaseNotConfigured → DB 외 API는 그대로 동작)
+    - DB_ECHO: SQL 로그 레벨 (off | info | debug). 운영에서는 off
+    """
+    # 접속 주소 기본값은 로컬 Cloud SQL Proxy (계정은 환경변수로만)
+    user: Optional[str] = None
+    password: Optional[str] = None
+    host: str = "127.0.0.1"
+    port: str = "3306"
+    name: str = "openwallet-db"
+    url: Optional[str] = None
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800  # Cloud SQL / MySQL wait_timeout 보다 짧게
+    pool_pre_ping: bool = True
+    echo: str = "off"
+
+    # 시작 시 DB 준비 확인 (지수 백오프)
+    ready_max_attempts: int = 8
+    ready_base_delay: float = 0.5
+    ready_max_delay: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        d = cls()
+        return cls(
+            user=os.getenv("DB_USER") or None,
+            password=os.getenv("DB_PASSWORD") or None,
+            host=os.getenv("DB_HOST", d.host),
+            port=os.getenv("DB_PORT", d.port),
+            name=os.getenv("DB_NAME", d.name),
+            url=os.getenv("DATABASE_URL") or None,
+            pool_size=int(os.getenv("DB_POOL_SIZE", d.pool_size)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", d.max_overflow)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", d.pool_timeout)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", d.pool_recycle)),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", d.pool_pre_ping),
+            echo=os.getenv("DB_ECHO", d.echo).lower(),
+            ready_max_attempts=int(os.getenv("DB_READY_MAX_ATTEMPTS", d.ready_max_attempts)),
+            ready_base_delay=float(os.getenv("DB_READY_BASE_DELAY", d.ready_base_delay)),
+            ready_max_delay=float(os.getenv("DB_READY_MAX_DELAY", d.ready_max_delay)),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url or (self.user and self.password))
+
+    @property
+    def database_url(self) -> str:
+        if self.url:
+            return self.url
+        if not self.configured:
+            raise DatabaseNotConfigured(
+                "DB credentials not configured: set DATABASE_URL, or DB_USER and DB_PASSWORD (.env)"
+            )
+        # MySQL 연결 URL (pymysql 드라이버 사용)
+        return f"mysql+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
+
+
+class PoolMetrics:
+    """커넥션 대여 대기 시간 누적 (get_db 에서 기록)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record(self, wait_sec: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait_sec
+            self.max_wait = max(self.max_wait, wait_sec)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else None,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "timeouts": self.timeouts,
+            }
+
 
-# MySQL 연결 URL (pymysql 드라이버 사용)
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DB_NAME}"
+def create_db_engine(settings: DatabaseSettings):
+    echo: Any = False
+    if settings.echo == "info":
+        echo = True
+    elif settings.echo == "debug":
+        echo = "debug"
 
-# 엔진 생성
-try:
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,echo=True
-    )
-    print("db 조회 성공")
-except:
-    print("db 조회 실패")
+    kwargs: Dict[str, Any] = dict(echo=echo, pool_pre_ping=settings.pool_pre_ping)
+    # SQLite(테스트/로컬)는 QueuePool 옵션을 받지 않음
+    if not settings.database_url.startswith("sqlite"):
+        kwargs.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+        )
+    eng = create_engine(settings.database_url, **kwargs)
 
+    # 커넥션이 새로 만들어진 횟수 (recycle/pre-ping 실패 포함)
+    eng.pool_connects = 0
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        eng.pool_connects += 1
+
+    return eng
+
+
+settings = DatabaseSettings.from_env()
+pool_metrics = PoolMetrics()
+
+# 엔진은 첫 DB 사용 때 생성 (get_engine). 설정이 없어도 import 는 성공해야
+# OCR / 트렌드 / /health / /ready 가 DB와 관계없이 뜸
+_engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_engine():
+    """공유 엔진 (처음 호출할 때 생성, 실제 접속은 첫 쿼리 시점). 설정이 없으면 DatabaseNotConfigured."""
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_db_engine(settings)
+            SessionLocal.configure(bind=_engine)
+        return _engine
 
 Base = declarative_base()
 
+
+def pool_status() -> Dict[str, Any]:
+    """현재 커넥션 풀 상태 + 누적 대기 시간."""
+    eng = get_engine()
+    pool = eng.pool
+    status: Dict[str, Any] = {
+        "pool_class": type(pool).__name__,
+        "connects": getattr(eng, "pool_connects", None),
+    }
+    # QueuePool 계열만 아래 메서드가 있음
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            status[name] = fn()
+    status["max_overflow"] = settings.max_overflow
+    status["pool_timeout"] = settings.pool_timeout
+    status.update(pool_metrics.snapshot())
+    return status
+
+
+def wait_for_database(max_attempts: Optional[int] = None) -> None:
+    """
+    DB 준비 확인: SELECT 1 이 성공할 때까지 지수 백오프로 재시도.
+    max_attempts 번 모두 실패하면 마지막 OperationalError를 그대로 raise.
+    접속 설정이 없으면 재시도 없이 DatabaseNotConfigured.
+    """
+    eng = get_engine()
+    attempts = max_attempts or settings.ready_max_attempts
+    delay = settings.ready_base_delay
+    for i in range(attempts):
+        try:
+            with eng.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            print(f"[database] ready (attempt {i + 1})")
+            return
+        except OperationalError as e:
+            if i == attempts - 1:
+                print(f"[database] not ready after {attempts} attempts")
+                raise
+            print(f"[database] not ready (attempt {i + 1}/{attempts}), retry in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, settings.ready_max_delay)
+
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_database(init: Optional[Callable[[], None]] = None, max_attempts: Optional[int] = None) -> None:
+    """
+    처음 한 번만: wait_for_database() 후 init() (테이블 생성 등).
+    실패하면 예외를 그대로 올리고, 다음 호출에서 다시 시도.
+    """
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        wait_for_database(max_attempts)
+        if init is not None:
+            init()
+        _ready = True
+
+
+def database_ready() -> bool:
+    return _ready
+
+
 # DB 세션 의존성 주입 (Dependency)
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
+        # 풀에서 커넥션을 받는 데 걸린 시간 기록
+        t0 = time.perf_counter()
+        try:
+            db.connection()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record(time.perf_counter() - t0)
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
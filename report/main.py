@@ -7,11 +7,11 @@ from sqlalchemy.orm import Session
 # 모듈 임포트
 import models
 import schemas
-from database import engine, get_db
+from database import get_db, get_engine
 from qwen_model import generate_spending_report
 
 # DB 테이블 생성 (앱 시작 시 자동 생성 - 읽기 전용이라도 테이블 정의는 필요)
-models.Base.metadata.create_all(bind=engine)
+models.Base.metadata.create_all(bind=get_engine())
 
 app = FastAPI(title="OpenWallet Report Service", version="0.1.0")
 
@@ -68,6 +68,7 @@ def create_report(request: schemas.ReportRequest, db: Session = Depends(get_db))
     # 상세 내역 대신 요약 정보를 줍니다.
     summary_text = {
         "total_spent": total_amount,
+        "transaction_count": len(expenses),
         "category_breakdown": category_summary,
         "recent_transactions_sample": transaction_list # 샘플만 전달
     }
@@ -76,7 +77,8 @@ def create_report(request: schemas.ReportRequest, db: Session = Depends(get_db))
     try:
         report_text = generate_spending_report(
             transactions=transaction_list,
-            user_question=request.question
+            user_question=request.question,
+            aggregates=summary_text,
         )
     except Exception as e:
         print(f"LLM Generation Error: {e}")
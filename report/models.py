@@ -1,6 +1,6 @@
 # 작성일 : 25/11/30
 # 2025-12-06
-from sqlalchemy import Column, String, Integer, Date, Text
+from sqlalchemy import Column, String, Integer, BigInteger, Date, Text
 import uuid
 import sys
 import os
@@ -51,4 +51,31 @@ class Favorite(Base):
     
     title = Column(String(255), nullable=True)
     price = Column(Integer, nullable=True)
-    category = Column(String(50), nullable=True)
\ No newline at end of file
+    category = Column(String(50), nullable=True)
+
+
+# 집계(rollup) 테이블: expense 원본을 매번 스캔하지 않도록 일/월 × 카테고리 × 감정 단위 합계 보관
+# report/rollups.py 에서 증분 갱신 / 재구축
+class ExpenseDailyRollup(Base):
+    __tablename__ = "expense_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    emotion = Column(String(50), primary_key=True)
+
+    total_price = Column(BigInteger, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    satisfaction_sum = Column(BigInteger, nullable=False, default=0)
+
+
+class ExpenseMonthlyRollup(Base):
+    __tablename__ = "expense_monthly_rollup"
+
+    # 해당 월 1일
+    month = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    emotion = Column(String(50), primary_key=True)
+
+    total_price = Column(BigInteger, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    satisfaction_sum = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,187 @@
+# prompt_builder.py
+# 2025-12-06
+"""
+소비 리포트 프롬프트 생성
+ - 거래 내역: 키를 행마다 반복하는 JSON(indent=2) 대신 헤더 한 줄 + "|" 구분 행 (연도가 같으면 MM-DD만)
+ - 집계: DB에서 미리 계산한 총액/카테고리별 합계·건수·비율을 프롬프트에 포함 → 모델이 샘플로 합계를 추측하지 않음
+ - 토큰 예산: 실제 tokenizer로 chat 템플릿 적용 후 토큰 수를 세고,
+   REPORT_PROMPT_MAX_TOKENS를 넘으면 거래 샘플을 오래된 것부터 줄임 (집계/지시문은 유지)
+ - REPORT_PROMPT_FORMAT=json 이면 예전 형식 (비교용)
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+REPORT_PROMPT_FORMAT = os.getenv("REPORT_PROMPT_FORMAT", "compact")
+# 프롬프트(시스템 + 사용자 + chat 템플릿) 최대 토큰 수. 0 이하면 제한 없음
+REPORT_PROMPT_MAX_TOKENS = int(os.getenv("REPORT_PROMPT_MAX_TOKENS", "1536"))
+
+DEFAULT_QUESTION = (
+    "이 소비 내역을 바탕으로 기간별/카테고리별 요약, "
+    "지출 패턴 분석, 절약을 위한 한두 가지 조언을 포함한 "
+    "리포트를 줄글 형식으로 작성하십시오."
+)
+
+SYSTEM_PROMPT = (
+    "당신은 개인 가계부 서비스 'OpenWallet'의 소비 분석 리포트 생성가입니다. "
+    "입력으로 주어지는 집계와 거래 내역 표를 이해하고, "
+    "특정한 데이터 형식이 읽고 좋은 텍스트(줄글)로 작성하십시오. "
+    "가능하면 항목별 합계, 카테고리별 통계, 소비 패턴 요약, "
+    "절약/개선 팁 등을 포함하고, 중요한 수치는 숫자로 명확하게 보여주세요. "
+    "합계와 카테고리 통계는 주어진 집계 값을 그대로 사용하세요."
+)
+
+# 예전 형식 (REPORT_PROMPT_FORMAT=json)
+LEGACY_SYSTEM_PROMPT = (
+    "당신은 개인 가계부 서비스 'OpenWallet'의 소비 분석 리포트 생성가입니다. "
+    "입력으로 주어지는 JSON 형식의 거래 내역을 이해하고, "
+    "특정한 데이터 형식이 읽고 좋은 텍스트(줄글)로 작성하십시오. "
+    "가능하면 항목별 합계, 카테고리별 통계, 소비 패턴 요약, "
+    "절약/개선 팁 등을 포함하고, 중요한 수치는 숫자로 명확하게 보여주세요."
+)
+
+COLUMNS = [("date", "날짜"), ("merchant", "가맹점"), ("amount", "금액"), ("category", "카테고리")]
+
+
+@dataclass
+class ReportPrompt:
+    messages: List[Dict[str, str]]
+    # tokenizer를 넘겼을 때만 채워짐
+    prompt_tokens: Optional[int] = None
+    rows_total: int = 0
+    rows_used: int = 0
+
+
+def _cell(v: Any) -> str:
+    # 구분자/줄바꿈이 값에 들어가면 표가 깨지므로 공백으로
+    return " ".join(str(v if v is not None else "").replace("|", " ").split())
+
+
+def encode_transactions(transactions: List[Dict[str, Any]]) -> str:
+    """거래 내역 → 헤더 한 줄 + 행마다 "날짜|가맹점|금액|카테고리". 모두 같은 연도면 날짜는 MM-DD."""
+    if not transactions:
+        return "(거래 내역 없음)"
+    dates = [str(t.get("date", "")) for t in transactions]
+    years = {d[:4] for d in dates}
+    same_year = len(years) == 1 and all(len(d) == 10 and d[4] == "-" for d in dates)
+
+    header = "|".join(label for _, label in COLUMNS)
+    lines = [f"{years.pop()}년 거래 ({header})" if same_year else header]
+    for t, d in zip(transactions, dates):
+        row = [d[5:] if same_year else d] + [t.get(key) for key, _ in COLUMNS[1:]]
+        lines.append("|".join(_cell(v) for v in row))
+    return "\n".join(lines)
+
+
+def encode_aggregates(aggregates: Dict[str, Any]) -> str:
+    """
+    DB 집계 → 짧은 문장.
+    aggregates: total_spent, category_breakdown {카테고리: 합계}, (선택) category_counts, transaction_count
+    """
+    total = int(aggregates.get("total_spent") or 0)
+    breakdown: Dict[str, int] = aggregates.get("category_breakdown") or {}
+    counts: Dict[str, int] = aggregates.get("category_counts") or {}
+    count = aggregates.get("transaction_count")
+
+    lines = [f"총 지출 {total:,}원" + (f" ({count}건)" if count is not None else "")]
+    parts = []
+    for cat, amount in sorted(breakdown.items(), key=lambda kv: -kv[1]):
+        share = f" {amount / total * 100:.0f}%" if total else ""
+        n = f" {counts[cat]}건" if cat in counts else ""
+        parts.append(f"{cat} {int(amount):,}원{share}{n}")
+    if parts:
+        lines.append("카테고리별: " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+def _compact_messages(
+    transactions: List[Dict[str, Any]],
+    user_question: str,
+    aggregates: Optional[Dict[str, Any]],
+    rows_total: int,
+) -> List[Dict[str, str]]:
+    parts = [f"요청사항: {user_question}"]
+    if aggregates:
+        parts.append("기간 전체 집계:\n" + encode_aggregates(aggregates))
+    sample_note = f"최근 {len(transactions)}건" + (f" / 샘플 {rows_total}건 중" if len(transactions) < rows_total else "")
+    parts.append(f"거래 내역 ({sample_note}):\n" + encode_transactions(transactions))
+    parts.append(
+        "위 데이터를 바탕으로 분석 보고서를 작성하세요. "
+        "데이터 자체를 다시 보여주지 말고, 해석된 내용만 텍스트로 출력하세요."
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "\n\n".join(parts)},
+    ]
+
+
+def _json_messages(transactions: List[Dict[str, Any]], user_question: str) -> List[Dict[str, str]]:
+    transactions_json = json.dumps(transactions, ensure_ascii=False, indent=2)
+    user_content = (
+        f"요청사항: {user_question}\n\n"
+        "다음은 분석해야 할 거래 내역 데이터입니다:\n"
+        f"{transactions_json}\n\n"
+        "위 데이터를 바탕으로 분석 보고서를 작성하세요. "
+        "데이터 자체를 다시 보여주지 말고, 해석된 내용만 텍스트로 출력하세요."
+    )
+    return [
+        {"role": "system", "content": LEGACY_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def count_prompt_tokens(tokenizer, messages: List[Dict[str, str]]) -> int:
+    """chat 템플릿(generation prompt 포함)까지 적용한 실제 입력 토큰 수."""
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def build_report_prompt(
+    transactions: List[Dict[str, Any]],
+    user_question: Optional[str] = None,
+    aggregates: Optional[Dict[str, Any]] = None,
+    tokenizer=None,
+    max_tokens: int = REPORT_PROMPT_MAX_TOKENS,
+    fmt: str = REPORT_PROMPT_FORMAT,
+) -> ReportPrompt:
+    """
+    - transactions: 날짜 오름차순 거래 샘플 (줄일 때는 앞쪽 = 오래된 것부터 제외)
+    - tokenizer가 있고 max_tokens > 0 이면 예산 안에 들어가는 가장 많은 행 수를 이분 탐색
+    - 행을 0개까지 줄여도 넘으면 (질문이 매우 긴 경우 등) 그대로 반환
+    """
+    question = user_question or DEFAULT_QUESTION
+    n = len(transactions)
+    if fmt == "json":
+        messages = _json_messages(transactions, question)
+        tokens = count_prompt_tokens(tokenizer, messages) if tokenizer is not None else None
+        return ReportPrompt(messages, tokens, n, n)
+
+    def build(k: int) -> List[Dict[str, str]]:
+        return _compact_messages(transactions[n - k:] if k else [], question, aggregates, n)
+
+    messages = build(n)
+    if tokenizer is None:
+        return ReportPrompt(messages, None, n, n)
+    tokens = count_prompt_tokens(tokenizer, messages)
+    if max_tokens <= 0 or tokens <= max_tokens:
+        return ReportPrompt(messages, tokens, n, n)
+
+    # 예산 안에 들어가는 최대 행 수 (행 수에 대해 토큰 수는 단조 증가)
+    lo, hi = 0, n - 1
+    best_k, best_tokens, best_messages = 0, None, build(0)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        m = build(mid)
+        t = count_prompt_tokens(tokenizer, m)
+        if t <= max_tokens:
+            best_k, best_tokens, best_messages = mid, t, m
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    if best_tokens is None:
+        best_tokens = count_prompt_tokens(tokenizer, best_messages)
+        print(f"[prompt_builder] prompt exceeds budget even without transactions ({best_tokens} > {max_tokens})")
+    else:
+        print(f"[prompt_builder] shrunk sample {n} -> {best_k} rows to fit {max_tokens} tokens ({tokens} -> {best_tokens})")
+    return ReportPrompt(best_messages, best_tokens, n, best_k)
@@ -2,83 +2,100 @@
 # qwen_model.py
 # 2025-12-06
 import os
-import json
-from typing import List, Dict, Any, Optional
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional
 from transformers import BitsAndBytesConfig
 
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+)
 from dotenv import load_dotenv
 
+# report/ 폴더에서 단독 실행(demo_report.py)해도 루트 모듈을 찾을 수 있도록 경로 추가
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+import cpu_backend
+from assisted_decoding import QWEN_DRAFT_MODEL, assisted_decoder
+from model_registry import registry
+from prefix_cache import prefix_cache
+from report.prompt_builder import build_report_prompt
+
 load_dotenv()
 
 # .env에 없으면 기본값으로 1.5B instruct 모델 사용
 MODEL_NAME = os.getenv("CHATBOT_MODEL", "Qwen/Qwen2.5-1.5B-Instruct")
+# assisted decoding용 draft 모델 (QWEN_DRAFT_MODEL, 예: Qwen/Qwen2.5-0.5B-Instruct). 비어 있으면 사용 안 함
+DRAFT_MODEL_NAME = QWEN_DRAFT_MODEL
+
+def _load_qwen():
+    print(f"[Qwen] Loading model: {MODEL_NAME}")
+    # change 16bit to 4bit
+    # quantization_config = BitsAndBytesConfig(
+    #     load_in_4bit=True,
+    #     bnb_4bit_compute_dtype=torch.float16,
+    #     bnb_4bit_use_double_quant=True,
+    # )
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    if not torch.cuda.is_available():
+        # GPU 없는 pod: CPU_INFERENCE_MODE(fp32/bf16/int8)에 맞춰 로드 (cpu_backend.py)
+        return tokenizer, cpu_backend.from_pretrained(MODEL_NAME)
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_NAME,
+        torch_dtype="auto",
+        # quantization_config=quantization_config, # 설정 적용
+        device_map="auto",
+    )
+    return tokenizer, model
 
-_tokenizer = None
-_model = None
 
 def get_qwen_model():
-    global _tokenizer, _model
-    if _model is None:
-        print(f"[Qwen] Loading model: {MODEL_NAME}")
-        # change 16bit to 4bit
-        # quantization_config = BitsAndBytesConfig(
-        #     load_in_4bit=True,
-        #     bnb_4bit_compute_dtype=torch.float16,
-        #     bnb_4bit_use_double_quant=True,
-        # )
-
-        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        _model = AutoModelForCausalLM.from_pretrained(
-            MODEL_NAME,
-            torch_dtype="auto",
-            # quantization_config=quantization_config, # 설정 적용
-            device_map="auto",
-        )
-    return _tokenizer, _model
+    # 프로세스 전역 레지스트리에서 공유 (LRU/유휴 언로드는 registry가 관리)
+    if not torch.cuda.is_available():
+        return registry.get(MODEL_NAME, _load_qwen, dtype=cpu_backend.resolve_mode(), device="cpu")
+    return registry.get(MODEL_NAME, _load_qwen, dtype="auto", device="auto")
 
 
-def generate_spending_report(
-    transactions: List[Dict[str, Any]],
-    user_question: Optional[str] = None,
-) -> str:
+def get_draft_model(tokenizer, model, assisted: Optional[bool] = None):
     """
-    Qwen 모델을 사용해서 소비 리포트를 생성하는 함수.
-    - transactions: DB나 JSON에서 가져온 거래 내역 리스트
-    - user_question: 사용자가 원하는 질문/리포트 타입
+    assisted decoding에 쓸 draft 모델 또는 None.
+    - assisted=None: QWEN_DRAFT_MODEL 이 설정돼 있으면 사용, False: 사용 안 함
     """
-    tokenizer, model = get_qwen_model()
+    if assisted is False or not DRAFT_MODEL_NAME:
+        return None
+    return assisted_decoder.draft_for(DRAFT_MODEL_NAME, tokenizer, model)
 
-    if not user_question:
-        user_question = (
-            "이 소비 내역을 바탕으로 기간별/카테고리별 요약, "
-            "지출 패턴 분석, 절약을 위한 한두 가지 조언을 포함한 "
-            "리포트를 줄글 형식으로 작성하십시오."
-        )
 
-    transactions_json = json.dumps(transactions, ensure_ascii=False, indent=2)
+# 리포트 생성 파라미터
+MAX_NEW_TOKENS = 800
+GEN_KWARGS = dict(do_sample=True, temperature=0.7, top_p=0.9)
 
-    system_prompt = (
-        "당신은 개인 가계부 서비스 'OpenWallet'의 소비 분석 리포트 생성가입니다. "
-        "입력으로 주어지는 JSON 형식의 거래 내역을 이해하고, "
-        "특정한 데이터 형식이 읽고 좋은 텍스트(줄글)로 작성하십시오. "
-        "가능하면 항목별 합계, 카테고리별 통계, 소비 패턴 요약, "
-        "절약/개선 팁 등을 포함하고, 중요한 수치는 숫자로 명확하게 보여주세요."
-    )
+def build_report_messages(
+    transactions: List[Dict[str, Any]],
+    user_question: Optional[str] = None,
+    aggregates: Optional[Dict[str, Any]] = None,
+    tokenizer=None,
+) -> List[Dict[str, str]]:
+    """프롬프트 메시지 (형식/토큰 예산은 report/prompt_builder.py). tokenizer가 있으면 예산에 맞춰 샘플 축소."""
+    return build_report_prompt(transactions, user_question, aggregates, tokenizer).messages
 
-    user_content = (
-        f"요청사항: {user_question}\n\n"
-        "다음은 분석해야 할 거래 내역 데이터입니다:\n"
-        f"{transactions_json}\n\n"
-        "위 데이터를 바탕으로 분석 보고서를 작성하세요. "
-        "데이터 자체를 다시 보여주지 말고, 해석된 내용만 텍스트로 출력하세요."
-    )
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_content},
-    ]
+def _build_inputs(tokenizer, model, transactions, user_question, aggregates=None, use_prefix_cache=True):
+    """
+    generate()에 넘길 입력과 prefix KV 캐시로 건너뛴 토큰 수.
+    시스템 프롬프트 부분 KV가 캐시돼 있으면 inputs["past_key_values"]로 같이 넘김 (prefill은 나머지만).
+    assisted decoding(draft 모델)과는 같이 쓰지 않음 (use_prefix_cache=False).
+    """
+    messages = build_report_messages(transactions, user_question, aggregates, tokenizer)
 
     # Qwen의 chat 템플릿 사용 (transformers에서 제공)
     text = tokenizer.apply_chat_template(
@@ -88,18 +105,173 @@ def generate_spending_report(
     )
 
     inputs = tokenizer([text], return_tensors="pt").to(model.device)
+    if not use_prefix_cache:
+        return inputs, 0
+    past, cached = prefix_cache.past_key_values(tokenizer, model, messages, text, inputs["input_ids"])
+    if past is not None:
+        inputs["past_key_values"] = past
+    return inputs, cached
+
+
+def generate_spending_report(
+    transactions: List[Dict[str, Any]],
+    user_question: Optional[str] = None,
+    max_new_tokens: Optional[int] = None,
+    batched: Optional[bool] = None,
+    aggregates: Optional[Dict[str, Any]] = None,
+    assisted: Optional[bool] = None,
+) -> str:
+    """
+    Qwen 모델을 사용해서 소비 리포트를 생성하는 함수.
+    - transactions: DB나 JSON에서 가져온 거래 내역 리스트
+    - user_question: 사용자가 원하는 질문/리포트 타입
+    - aggregates: 기간 전체 집계 (total_spent, category_breakdown, ...) → 프롬프트에 포함
+    - max_new_tokens: 생성 토큰 상한 (기본 MAX_NEW_TOKENS)
+    - batched: 동적 배칭 사용 여부 (기본: QWEN_BATCHING 환경변수)
+    - assisted: draft 모델 assisted decoding 사용 여부 (기본: QWEN_DRAFT_MODEL 설정 시 사용, 배칭 시 미사용)
+    """
+    from report import batching
+
+    if batched is None:
+        batched = batching.BATCHING_ENABLED
+    if batched:
+        return batching.get_batcher().generate(transactions, user_question, max_new_tokens, aggregates=aggregates)
+
+    tokenizer, model = get_qwen_model()
+    draft = get_draft_model(tokenizer, model, assisted)
+    inputs, _ = _build_inputs(tokenizer, model, transactions, user_question, aggregates, use_prefix_cache=draft is None)
+    gen_kwargs = dict(max_new_tokens=max_new_tokens or MAX_NEW_TOKENS, **GEN_KWARGS)
 
     with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=800,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-        )
+        if draft is not None:
+            outputs, _ = assisted_decoder.generate(model, draft, **inputs, **gen_kwargs)
+        else:
+            outputs = model.generate(**inputs, **gen_kwargs)
 
     # 프롬프트 길이만큼 잘라내고 생성된 부분만 디코딩
     gen_ids = outputs[0, inputs["input_ids"].shape[1]:]
     report = tokenizer.decode(gen_ids, skip_special_tokens=True)
 
     return report.strip()
+
+
+def warmup(max_new_tokens: int = 4) -> None:
+    """모델 로드 + 짧은 더미 생성 (첫 리포트 요청이 로드/커널 초기화 비용을 내지 않도록)."""
+    tokenizer, model = get_qwen_model()
+    text = tokenizer.apply_chat_template(
+        [{"role": "user", "content": "안녕하세요"}],
+        tokenize=False,
+        add_generation_prompt=True,
+    )
+    inputs = tokenizer([text], return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+
+
+class _CountingStreamer(TextIteratorStreamer):
+    """생성 토큰 수와 첫 토큰 시각을 같이 기록하는 streamer."""
+
+    def __init__(self, tokenizer, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.token_count = 0
+        self.first_token_at: Optional[float] = None
+
+    def put(self, value):
+        is_prompt = self.skip_prompt and self.next_tokens_are_prompt
+        if not is_prompt:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.token_count += value.numel()
+        super().put(value)
+
+
+class _CancelCriteria(StoppingCriteria):
+    """cancel_event가 set 되면 다음 step에서 generate 중단."""
+
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device
+        )
+
+
+def stream_spending_report(
+    transactions: List[Dict[str, Any]],
+    user_question: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    aggregates: Optional[Dict[str, Any]] = None,
+    assisted: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    generate_spending_report의 스트리밍 버전.
+    - {"event": "token", "text": ...} 를 생성되는 대로 yield
+    - 마지막에 {"event": "done", prompt_tokens, prefix_cached_tokens, ttft_ms, tokens, tokens_per_sec, assisted, cancelled}
+      (assisted: draft 모델 사용 시 수락률 등, 아니면 None)
+    - cancel_event가 set 되면 (클라이언트 연결 끊김 등) 생성 중단 → 모델을 바로 다음 요청에 넘김
+    """
+    cancel_event = cancel_event or threading.Event()
+    tokenizer, model = get_qwen_model()
+    draft = get_draft_model(tokenizer, model, assisted)
+    inputs, cached_tokens = _build_inputs(
+        tokenizer, model, transactions, user_question, aggregates, use_prefix_cache=draft is None
+    )
+
+    streamer = _CountingStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    errors: List[BaseException] = []
+    assist_stats = []
+
+    def _run():
+        gen_kwargs = dict(
+            max_new_tokens=MAX_NEW_TOKENS,
+            streamer=streamer,
+            stopping_criteria=StoppingCriteriaList([_CancelCriteria(cancel_event)]),
+            **GEN_KWARGS,
+        )
+        try:
+            with torch.no_grad():
+                if draft is not None:
+                    assist_stats.append(assisted_decoder.generate(model, draft, **inputs, **gen_kwargs)[1])
+                else:
+                    model.generate(**inputs, **gen_kwargs)
+        except BaseException as e:
+            errors.append(e)
+            # 소비 측이 queue에서 영원히 기다리지 않도록 종료 신호
+            streamer.end()
+
+    t0 = time.perf_counter()
+    worker = threading.Thread(target=_run, name="qwen-stream", daemon=True)
+    worker.start()
+    finished = False
+    try:
+        for text in streamer:
+            if cancel_event.is_set():
+                break
+            if text:
+                yield {"event": "token", "text": text}
+        finished = not cancel_event.is_set()
+    finally:
+        # 소비 측이 중간에 그만두면 (GeneratorExit) generate도 멈추게 함
+        if not finished:
+            cancel_event.set()
+    worker.join()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - t0
+    ttft = (streamer.first_token_at - t0) if streamer.first_token_at else None
+    decode_time = elapsed - ttft if ttft is not None else elapsed
+    yield {
+        "event": "done",
+        "prompt_tokens": int(inputs["input_ids"].shape[1]),
+        # 시스템 프롬프트 KV 캐시로 prefill을 건너뛴 토큰 수
+        "prefix_cached_tokens": cached_tokens,
+        "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+        "tokens": streamer.token_count,
+        "tokens_per_sec": round(streamer.token_count / decode_time, 2) if decode_time > 0 else None,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "assisted": assist_stats[0].to_dict() if assist_stats else None,
+        "cancelled": not finished,
+    }
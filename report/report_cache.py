@@ -0,0 +1,104 @@
+# report_cache.py
+# 2025-12-06
+"""
+/report 응답 캐시
+ - 키: 정규화된 요청(start_date, end_date, question) + 기간 내 expense 데이터 버전(fingerprint)
+ - fingerprint: 건수, 최소/최대 id, 금액·만족도 합, 문자열 길이 합 (+ MySQL은 행별 CRC32 합)
+   → 기간 내 insert/update/delete 시 miss
+ - 최대 REPORT_CACHE_SIZE개까지 LRU (0이면 비활성)
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+
+
+def data_fingerprint(db: Session, start_date, end_date) -> str:
+    """기간 내 expense 데이터 버전. 집계 쿼리 한 번 (행 로드 없음)."""
+    E = models.Expense
+    text_len = (
+        func.length(E.title)
+        + func.length(E.category)
+        + func.length(E.emotion)
+        + func.length(func.coalesce(E.memo, ""))
+    )
+    cols = [
+        func.count(E.expense_id),
+        func.min(E.expense_id),
+        func.max(E.expense_id),
+        func.sum(E.price),
+        func.sum(E.satisfaction),
+        func.sum(text_len),
+    ]
+    if db.get_bind().dialect.name == "mysql":
+        # 행 전체 내용 체크섬 (카테고리 변경처럼 길이가 같은 수정도 감지)
+        cols.append(func.sum(func.crc32(func.concat_ws(
+            "|", E.expense_id, E.date, E.title, E.price, E.category, E.emotion, E.memo, E.satisfaction
+        ))))
+    row = db.query(*cols).filter(E.date >= start_date, E.date <= end_date).one()
+    raw = "|".join("" if v is None else str(v) for v in row)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ReportCache:
+    def __init__(self, max_entries: int = REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(start_date, end_date, question: Optional[str], fingerprint: str) -> Tuple:
+        q = " ".join((question or "").split())
+        return (str(start_date), str(end_date), q, fingerprint)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            val = self._data.get(key)
+            if val is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return val
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+# 프로세스 전역 인스턴스
+report_cache = ReportCache()
@@ -0,0 +1,341 @@
+# rollups.py
+# 2025-12-06
+"""
+지출 집계(rollup) 테이블 관리
+ - expense_daily_rollup / expense_monthly_rollup: (일|월) × 카테고리 × 감정 별 합계, 건수, 만족도 합
+ - 증분 갱신
+   · MySQL: expense 테이블 트리거 (Spring 백엔드 등 다른 클라이언트의 쓰기도 반영)
+   · 그 외 / 트리거 권한 없음: SQLAlchemy ORM 이벤트 (이 서비스 세션으로 쓴 지출만 반영)
+ - 재구축(드리프트 복구): python -m report.rollups rebuild [--start YYYY-MM-DD --end YYYY-MM-DD]
+ - 기간 조회: 꽉 찬 월은 월 테이블, 나머지 앞뒤 일자는 일 테이블에서 읽음
+   (expense.date가 Date 단위라 일 테이블만으로 경계가 정확히 맞음 → 원본 행은 읽지 않음)
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+# 루트에서 report 패키지를 찾을 수 있도록
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from report import models
+
+# /report 집계를 rollup 테이블에서 읽을지 여부
+USE_ROLLUPS = os.getenv("REPORT_USE_ROLLUPS", "0") == "1"
+
+Daily = models.ExpenseDailyRollup
+Monthly = models.ExpenseMonthlyRollup
+Expense = models.Expense
+
+_ROLLUP_COLUMNS = ("date", "category", "emotion", "price", "satisfaction")
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+# 증분 갱신 (ORM 이벤트)
+def _upsert_delta(conn, table, key: Dict, price: int, count: int, satisfaction: int) -> None:
+    cond = [getattr(table.c, k) == v for k, v in key.items()]
+    res = conn.execute(
+        update(table)
+        .where(*cond)
+        .values(
+            total_price=table.c.total_price + price,
+            expense_count=table.c.expense_count + count,
+            satisfaction_sum=table.c.satisfaction_sum + satisfaction,
+        )
+    )
+    if res.rowcount:
+        return
+    try:
+        # flush 중이므로 savepoint 안에서 실행 (실패해도 바깥 트랜잭션은 유지)
+        with conn.begin_nested():
+            conn.execute(
+                insert(table).values(
+                    **key, total_price=price, expense_count=count, satisfaction_sum=satisfaction
+                )
+            )
+    except IntegrityError:
+        # 동시에 다른 세션이 같은 키를 먼저 만든 경우 → 다시 update
+        conn.execute(
+            update(table)
+            .where(*cond)
+            .values(
+                total_price=table.c.total_price + price,
+                expense_count=table.c.expense_count + count,
+                satisfaction_sum=table.c.satisfaction_sum + satisfaction,
+            )
+        )
+
+
+def apply_delta(conn, day: date, category: str, emotion: str, price: int, count: int, satisfaction: int) -> None:
+    _upsert_delta(
+        conn, Daily.__table__, {"day": day, "category": category, "emotion": emotion},
+        price, count, satisfaction,
+    )
+    _upsert_delta(
+        conn, Monthly.__table__, {"month": month_start(day), "category": category, "emotion": emotion},
+        price, count, satisfaction,
+    )
+
+
+def _after_insert(mapper, conn, target):
+    apply_delta(conn, target.date, target.category, target.emotion, target.price, 1, target.satisfaction or 0)
+
+
+def _after_delete(mapper, conn, target):
+    apply_delta(conn, target.date, target.category, target.emotion, -target.price, -1, -(target.satisfaction or 0))
+
+
+def _after_update(mapper, conn, target):
+    old = {}
+    changed = False
+    for col in _ROLLUP_COLUMNS:
+        hist = get_history(target, col)
+        if hist.deleted:
+            old[col] = hist.deleted[0]
+            changed = True
+        else:
+            old[col] = getattr(target, col)
+    if not changed:
+        return
+    apply_delta(conn, old["date"], old["category"], old["emotion"], -old["price"], -1, -(old["satisfaction"] or 0))
+    _after_insert(mapper, conn, target)
+
+
+# MySQL 트리거: 다른 클라이언트가 쓴 지출까지 반영
+def _mysql_trigger_upserts(row: str, sign: str) -> str:
+    stmts = []
+    for table, key_expr in (
+        ("expense_daily_rollup (day", f"{row}.date"),
+        # 월 1일 (DATE_FORMAT의 % 는 드라이버 포맷팅과 충돌해서 사용하지 않음)
+        ("expense_monthly_rollup (month", f"DATE_SUB({row}.date, INTERVAL DAYOFMONTH({row}.date) - 1 DAY)"),
+    ):
+        stmts.append(
+            f"INSERT INTO {table}, category, emotion, total_price, expense_count, satisfaction_sum) "
+            f"VALUES ({key_expr}, {row}.category, {row}.emotion, "
+            f"{sign}{row}.price, {sign}1, {sign}COALESCE({row}.satisfaction, 0)) "
+            "ON DUPLICATE KEY UPDATE "
+            "total_price = total_price + VALUES(total_price), "
+            "expense_count = expense_count + VALUES(expense_count), "
+            "satisfaction_sum = satisfaction_sum + VALUES(satisfaction_sum);"
+        )
+    return " ".join(stmts)
+
+
+_MYSQL_TRIGGERS = {
+    "expense_rollup_ai": ("AFTER INSERT", _mysql_trigger_upserts("NEW", "")),
+    "expense_rollup_ad": ("AFTER DELETE", _mysql_trigger_upserts("OLD", "-")),
+    "expense_rollup_au": (
+        "AFTER UPDATE",
+        _mysql_trigger_upserts("OLD", "-") + " " + _mysql_trigger_upserts("NEW", ""),
+    ),
+}
+
+
+def _normalize_sql(sql: str) -> str:
+    return " ".join((sql or "").split())
+
+
+def _installed_mysql_triggers(conn) -> Dict[str, Tuple[str, str]]:
+    """현재 DB의 expense 트리거: 이름 → ("AFTER INSERT", "BEGIN ... END")."""
+    rows = conn.exec_driver_sql(
+        "SELECT TRIGGER_NAME, ACTION_TIMING, EVENT_MANIPULATION, ACTION_STATEMENT "
+        "FROM information_schema.TRIGGERS "
+        "WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'expense'"
+    ).all()
+    return {name: (f"{timing} {event_}", _normalize_sql(stmt)) for name, timing, event_, stmt in rows}
+
+
+def _install_mysql_triggers(engine) -> bool:
+    """
+    없거나 정의가 바뀐 트리거만 다시 만듦.
+    - 매 시작마다 DROP/CREATE 하면 그 사이(DDL은 자동 커밋)에 들어온 지출이 rollup에 빠지고,
+      매번 TRIGGER 권한이 필요해서 이미 최신이면 DDL을 실행하지 않음
+    """
+    try:
+        with engine.begin() as conn:
+            installed = _installed_mysql_triggers(conn)
+            changed = []
+            for name, (timing, body) in _MYSQL_TRIGGERS.items():
+                statement = f"BEGIN {body} END"
+                if installed.get(name) == (timing, _normalize_sql(statement)):
+                    continue
+                if name in installed:
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+                conn.exec_driver_sql(f"CREATE TRIGGER {name} {timing} ON expense FOR EACH ROW {statement}")
+                changed.append(name)
+        if changed:
+            print(f"[rollups] MySQL triggers (re)created: {changed}")
+            if any(name in installed for name in changed):
+                # 교체하는 동안 들어온 지출은 반영되지 않았을 수 있음
+                print("[rollups] trigger definition changed; run `python -m report.rollups rebuild` to resync")
+        return True
+    except Exception as e:
+        print(f"[rollups] MySQL trigger install failed, falling back to ORM events: {e}")
+        return False
+
+
+def install(engine) -> str:
+    """
+    증분 갱신 설치. 반환: "trigger" | "orm"
+    rollup 테이블이 비어 있으면 한 번 전체 재구축.
+    """
+    mode = "orm"
+    if engine.dialect.name == "mysql" and _install_mysql_triggers(engine):
+        mode = "trigger"
+    elif not event.contains(Expense, "after_insert", _after_insert):
+        event.listen(Expense, "after_insert", _after_insert)
+        event.listen(Expense, "after_update", _after_update)
+        event.listen(Expense, "after_delete", _after_delete)
+
+    with Session(engine) as db:
+        if db.query(Daily).first() is None and db.query(Expense.expense_id).first() is not None:
+            print("[rollups] rollup tables empty, rebuilding")
+            rebuild(db)
+    print(f"[rollups] incremental maintenance: {mode}")
+    return mode
+
+
+# 재구축
+def rebuild(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Tuple[int, int]:
+    """
+    원본 expense에서 rollup 재계산 (드리프트 복구).
+    기간을 주면 그 기간이 걸친 월 전체를 다시 계산. 반환: (일 row 수, 월 row 수)
+    """
+    lo = month_start(start) if start else None
+    hi = (next_month(end) - timedelta(days=1)) if end else None
+
+    def _range(col):
+        cond = []
+        if lo is not None:
+            cond.append(col >= lo)
+        if hi is not None:
+            cond.append(col <= hi)
+        return cond
+
+    db.execute(delete(Daily).where(*_range(Daily.day)))
+    db.execute(delete(Monthly).where(*_range(Monthly.month)))
+
+    grouped = (
+        select(
+            Expense.date,
+            Expense.category,
+            Expense.emotion,
+            func.sum(Expense.price),
+            func.count(Expense.expense_id),
+            func.coalesce(func.sum(Expense.satisfaction), 0),
+        )
+        .where(*_range(Expense.date))
+        .group_by(Expense.date, Expense.category, Expense.emotion)
+    )
+    db.execute(
+        insert(Daily).from_select(
+            ["day", "category", "emotion", "total_price", "expense_count", "satisfaction_sum"],
+            grouped,
+        )
+    )
+
+    # 월 집계는 방금 만든 일 집계를 다시 묶어서 계산 (DB별 날짜 함수 차이 회피)
+    monthly: Dict[Tuple[date, str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+    daily_rows = db.execute(
+        select(Daily.day, Daily.category, Daily.emotion, Daily.total_price, Daily.expense_count, Daily.satisfaction_sum)
+        .where(*_range(Daily.day))
+    ).all()
+    for day, cat, emo, total, cnt, sat in daily_rows:
+        acc = monthly[(month_start(day), cat, emo)]
+        acc[0] += int(total or 0)
+        acc[1] += int(cnt or 0)
+        acc[2] += int(sat or 0)
+    if monthly:
+        db.execute(
+            insert(Monthly),
+            [
+                {
+                    "month": m, "category": cat, "emotion": emo,
+                    "total_price": v[0], "expense_count": v[1], "satisfaction_sum": v[2],
+                }
+                for (m, cat, emo), v in monthly.items()
+            ],
+        )
+    db.commit()
+    print(f"[rollups] rebuilt daily={len(daily_rows)} monthly={len(monthly)} range={lo}~{hi}")
+    return len(daily_rows), len(monthly)
+
+
+# 기간 조회
+def split_range(start: date, end: date) -> Tuple[List[Tuple[date, date]], List[date]]:
+    """[start, end]를 (일 테이블로 읽을 구간들, 월 테이블로 읽을 월 시작일들)로 분할."""
+    day_ranges: List[Tuple[date, date]] = []
+    months: List[date] = []
+    if start > end:
+        return day_ranges, months
+
+    first_full = start if start.day == 1 else next_month(start)
+    m = first_full
+    while next_month(m) - timedelta(days=1) <= end:
+        months.append(m)
+        m = next_month(m)
+
+    if not months:
+        return [(start, end)], []
+    if start < months[0]:
+        day_ranges.append((start, months[0] - timedelta(days=1)))
+    after = next_month(months[-1])
+    if after <= end:
+        day_ranges.append((after, end))
+    return day_ranges, months
+
+
+def category_totals(db: Session, start: date, end: date) -> List[Tuple[str, int, int]]:
+    """기간 내 카테고리별 (category, sum(price), count) — /report GROUP BY 결과와 같은 형태."""
+    acc: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    day_ranges, months = split_range(start, end)
+
+    queries = []
+    if months:
+        queries.append(
+            select(Monthly.category, func.sum(Monthly.total_price), func.sum(Monthly.expense_count))
+            .where(Monthly.month.in_(months))
+            .group_by(Monthly.category)
+        )
+    for lo, hi in day_ranges:
+        queries.append(
+            select(Daily.category, func.sum(Daily.total_price), func.sum(Daily.expense_count))
+            .where(Daily.day >= lo, Daily.day <= hi)
+            .group_by(Daily.category)
+        )
+    for q in queries:
+        for cat, total, cnt in db.execute(q).all():
+            acc[cat][0] += int(total or 0)
+            acc[cat][1] += int(cnt or 0)
+    # 삭제로 0건이 된 카테고리는 제외
+    return [(cat, v[0], v[1]) for cat, v in acc.items() if v[1] > 0]
+
+
+if __name__ == "__main__":
+    from report.database import SessionLocal, get_engine
+
+    ap = argparse.ArgumentParser(description="expense rollup 관리")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild", help="원본 expense에서 rollup 재계산")
+    rb.add_argument("--start", type=date.fromisoformat)
+    rb.add_argument("--end", type=date.fromisoformat)
+    a = ap.parse_args()
+
+    with SessionLocal(bind=get_engine()) as session:
+        rebuild(session, a.start, a.end)
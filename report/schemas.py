@@ -7,6 +7,8 @@ class ReportRequest(BaseModel):
     start_date: date_type
     end_date: date_type
     question: str
+    # False면 캐시를 건너뛰고 새로 생성 (샘플링 결과를 매번 다르게 받고 싶을 때)
+    use_cache: bool = True
 
 class ReportResponse(BaseModel):
     report: str
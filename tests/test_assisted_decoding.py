@@ -0,0 +1,113 @@
+# test_assisted_decoding.py
+# 2025-12-06
+"""
+assisted_decoding.AssistedDecoder 를 작은 랜덤 모델(Qwen2 구조)로 확인
+ - draft 유무와 관계없이 greedy 출력이 같음
+ - 본 모델과 가중치가 같은 draft 는 수락률 1.0
+ - vocab 이 다른 draft 는 비활성 (draft_for → None, 사유는 stats()["disabled"])
+"""
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+import cpu_backend
+from assisted_decoding import AssistedDecoder
+
+VOCAB = 256
+NEW_TOKENS = 24
+
+
+def _save_tokenizer(path, vocab_size: int, prefix: str = "t") -> None:
+    words = ["<pad>", "<unk>", "<eos>"] + [f"{prefix}{i}" for i in range(vocab_size - 3)]
+    tok = tokenizers.Tokenizer(tokenizers.models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>"))
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tok, pad_token="<pad>", unk_token="<unk>", eos_token="<eos>",
+    ).save_pretrained(path)
+
+
+def _save_model(path, seed: int, layers: int, hidden: int, vocab_size: int = VOCAB):
+    torch.manual_seed(seed)
+    config = transformers.Qwen2Config(
+        vocab_size=vocab_size, hidden_size=hidden, intermediate_size=hidden * 2,
+        num_hidden_layers=layers, num_attention_heads=4, num_key_value_heads=2,
+        max_position_embeddings=256, pad_token_id=0, eos_token_id=2, bos_token_id=None,
+    )
+    model = transformers.Qwen2ForCausalLM(config)
+    model.save_pretrained(path)
+    return model
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    root = tmp_path_factory.mktemp("assisted")
+    paths = {name: str(root / name) for name in ("main", "draft", "copy", "other_vocab")}
+    main = _save_model(paths["main"], seed=0, layers=2, hidden=64)
+    main.save_pretrained(paths["copy"])
+    _save_model(paths["draft"], seed=1, layers=1, hidden=32)
+    _save_model(paths["other_vocab"], seed=2, layers=1, hidden=32, vocab_size=VOCAB + 16)
+    for name in ("main", "draft", "copy"):
+        _save_tokenizer(paths[name], VOCAB)
+    _save_tokenizer(paths["other_vocab"], VOCAB + 16, prefix="w")
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(paths["main"])
+    model = cpu_backend.from_pretrained(paths["main"], "fp32")
+    return paths, tokenizer, model
+
+
+def _inputs(tokenizer):
+    # tokenizer 는 vocab 비교용. 프롬프트는 토큰 id 로 직접 (특수 토큰 0~2 제외)
+    input_ids = torch.tensor([[3 + i * 7 % 200 for i in range(20)]])
+    return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+
+def _gen(tokenizer):
+    return dict(max_new_tokens=NEW_TOKENS, min_new_tokens=NEW_TOKENS, do_sample=False,
+                pad_token_id=tokenizer.pad_token_id)
+
+
+def test_greedy_output_same_with_and_without_draft(models):
+    paths, tokenizer, model = models
+    decoder = AssistedDecoder(num_tokens=4, schedule="heuristic", confidence_threshold=0.0)
+    draft = decoder.draft_for(paths["draft"], tokenizer, model)
+    assert draft is not None
+
+    inputs = _inputs(tokenizer)
+    with torch.no_grad():
+        base = model.generate(**inputs, **_gen(tokenizer))
+        out, stats = decoder.generate(model, draft, **inputs, **_gen(tokenizer))
+    assert torch.equal(base, out)
+    assert stats.new_tokens == NEW_TOKENS
+    assert stats.draft_forwards > 0
+
+
+def test_identical_draft_accepts_everything(models):
+    paths, tokenizer, model = models
+    decoder = AssistedDecoder(num_tokens=5, schedule="constant", confidence_threshold=0.0)
+    draft = decoder.draft_for(paths["copy"], tokenizer, model)
+    assert draft is not None
+
+    with torch.no_grad():
+        _, stats = decoder.generate(model, draft, **_inputs(tokenizer), **_gen(tokenizer))
+    assert stats.acceptance_rate == 1.0
+    # step마다 제안 5개 + 본 모델 1개
+    assert stats.tokens_per_main_step > 4
+    assert decoder.stats()["drafts"][paths["copy"]]["acceptance_rate"] == 1.0
+
+
+def test_draft_with_different_vocab_is_disabled(models):
+    paths, tokenizer, model = models
+    decoder = AssistedDecoder()
+    assert decoder.draft_for(paths["other_vocab"], tokenizer, model) is None
+    assert decoder.stats()["disabled"] == {paths["other_vocab"]: "tokenizer vocab differs from main model"}
+    # 한 번 비활성으로 기록되면 다시 로드하지 않음
+    assert decoder.draft_for(paths["other_vocab"], tokenizer, model) is None
+
+
+def test_main_model_as_draft_is_disabled(models):
+    paths, tokenizer, model = models
+    decoder = AssistedDecoder()
+    assert decoder.draft_for(paths["main"], tokenizer, model) is None
+    assert decoder.stats()["disabled"] == {paths["main"]: "draft is the main model"}
@@ -0,0 +1,70 @@
+# test_image_prep.py
+# 2025-12-06
+"""
+ocr/image_prep.prepare_image 투명 배경 처리
+ - 투명 배경 + 검은 글씨 이미지(RGBA / LA / 투명 색 지정 P)는 흰 배경에 합성된 JPEG로 변환
+   (그냥 RGB/L 로 바꾸면 배경이 검게 돼서 글씨가 사라짐)
+ - 불투명 이미지는 기존처럼 처리
+"""
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from ocr.image_prep import prepare_image
+
+SIZE = (80, 40)
+TEXT_BOX = (20, 10, 60, 30)
+
+
+def _png(img) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _rgba():
+    # 투명 픽셀의 밑바탕 색은 검정 (캡처 도구 기본값), 글씨는 불투명 검정
+    img = Image.new("RGBA", SIZE, (0, 0, 0, 0))
+    img.paste((0, 0, 0, 255), TEXT_BOX)
+    return img
+
+
+def _la():
+    img = Image.new("LA", SIZE, (0, 0))
+    img.paste((0, 255), TEXT_BOX)
+    return img
+
+
+def _palette():
+    img = Image.new("P", SIZE, 0)
+    img.putpalette([0, 0, 0, 10, 10, 10])
+    img.paste(1, TEXT_BOX)
+    img.info["transparency"] = 0
+    return img
+
+
+def _pixels(content: bytes):
+    with Image.open(io.BytesIO(content)) as img:
+        img = img.convert("L")
+        return img.getpixel((2, 2)), img.getpixel((40, 20))
+
+
+@pytest.mark.parametrize("make", [_rgba, _la, _palette], ids=["RGBA", "LA", "P+transparency"])
+@pytest.mark.parametrize("grayscale", [True, False], ids=["gray", "rgb"])
+def test_transparent_background_becomes_white(make, grayscale):
+    out = prepare_image(_png(make()), grayscale=grayscale, enabled=True)
+    assert out.normalized
+    background, text = _pixels(out.content)
+    assert background > 240
+    assert text < 40
+
+
+def test_opaque_image_unchanged_behaviour():
+    img = Image.new("RGB", SIZE, (255, 255, 255))
+    img.paste((0, 0, 0), TEXT_BOX)
+    out = prepare_image(_png(img), grayscale=True, enabled=True)
+    background, text = _pixels(out.content)
+    assert background > 240
+    assert text < 40
@@ -0,0 +1,139 @@
+# test_ocr_executor.py
+# 2025-12-06
+"""
+ocr/main.py OCRExecutor 를 느린 Vision stub 으로 확인
+ - 동시에 Vision 을 호출하는 작업은 max_workers개 이하
+ - 실행 중 + 대기 중이 max_pending개면 다음 요청은 OCRBusyError (엔드포인트에서는 503)
+ - 느린 OCR 업로드가 처리되는 동안에도 통합 서버(main.app)의 GET /health 는 바로 응답
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import ocr.main as ocr_main
+
+
+class _SlowVision:
+    """document_text_detection 이 delay초 걸리는 stub. 동시 호출 수 최대값 기록."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+
+    def document_text_detection(self, image):
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self.lock:
+                self.active -= 1
+        return SimpleNamespace(
+            error=None,
+            full_text_annotation=SimpleNamespace(text="스타벅스\n2025-12-01\n합계 5,000원"),
+            text_annotations=[],
+        )
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    stub = _SlowVision(delay=0.2)
+    # 캐시/실제 Vision 클라이언트 없이 stub 만 호출되도록
+    monkeypatch.setattr(ocr_main, "get_ocr_cache", lambda: None)
+    ocr_main.set_vision_client(stub)
+    yield stub
+    ocr_main.set_vision_client(None)
+
+
+def _use_executor(monkeypatch, max_workers: int, max_pending: int) -> ocr_main.OCRExecutor:
+    ex = ocr_main.OCRExecutor(max_workers=max_workers, max_pending=max_pending)
+    monkeypatch.setattr(ocr_main, "ocr_executor", ex)
+    return ex
+
+
+def test_at_most_max_workers_run_at_once(vision, monkeypatch):
+    ex = _use_executor(monkeypatch, max_workers=2, max_pending=16)
+
+    async def main():
+        return await asyncio.gather(*(ocr_main.ocr_receipt_async(b"receipt-%d" % i) for i in range(6)))
+
+    results = asyncio.run(main())
+    assert len(results) == 6
+    assert all(r.amount == 5000 for r in results)
+    assert vision.calls == 6
+    assert vision.max_active == 2
+    assert ex.stats()["completed"] == 6
+
+
+def test_request_past_max_pending_is_rejected(vision, monkeypatch):
+    ex = _use_executor(monkeypatch, max_workers=1, max_pending=3)
+
+    async def main():
+        running = [asyncio.ensure_future(ocr_main.ocr_receipt_async(b"receipt-%d" % i)) for i in range(3)]
+        # run() 은 첫 await 전에 pending 을 올림 → 한 번 양보하면 3개 모두 자리를 잡음
+        await asyncio.sleep(0)
+        assert ex.pending == 3
+
+        with pytest.raises(ocr_main.OCRBusyError):
+            await ex.run(ocr_main.ocr_receipt_bytes, b"direct")
+        with pytest.raises(HTTPException) as e:
+            await ocr_main.ocr_receipt_async(b"endpoint")
+        assert e.value.status_code == 503
+
+        return await asyncio.gather(*running)
+
+    assert len(asyncio.run(main())) == 3
+    stats = ex.stats()
+    assert stats["rejected"] == 2
+    assert stats["pending"] == 0
+    assert vision.calls == 3
+    assert vision.max_active == 1
+
+
+def test_health_stays_responsive_during_slow_uploads(vision, monkeypatch):
+    import main
+
+    vision.delay = 1.0
+    ex = _use_executor(monkeypatch, max_workers=2, max_pending=16)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            uploads = [
+                asyncio.ensure_future(client.post(
+                    "/ocr-receipt", files={"file": (f"r{i}.jpg", b"receipt-%d" % i, "image/jpeg")},
+                ))
+                for i in range(6)
+            ]
+            # 업로드가 모두 실행기에 들어갈 때까지 (2개 실행 중 + 4개 대기)
+            for _ in range(100):
+                if ex.pending == 6 and vision.active == 2:
+                    break
+                await asyncio.sleep(0.02)
+            assert ex.pending == 6
+
+            latencies = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                r = await client.get("/health")
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200
+                await asyncio.sleep(0.05)
+            # 측정하는 동안 느린 OCR 요청이 계속 처리 중이었어야 의미 있음
+            assert ex.pending > 0
+            return latencies, await asyncio.gather(*uploads)
+
+    latencies, responses = asyncio.run(run())
+    assert max(latencies) < 0.25, latencies
+    assert [r.status_code for r in responses] == [200] * 6
+    assert vision.max_active == 2
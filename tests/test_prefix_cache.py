@@ -0,0 +1,81 @@
+# test_prefix_cache.py
+# 2025-12-06
+"""
+prefix_cache.PrefixKVCache 정리 경로 (가짜 모델/토크나이저)
+ - prefill 이 실패한 키의 build lock 은 남지 않음
+ - 모델 finalize 콜백이 같은 스레드의 self._lock 보유 중에 돌아도 멈추지 않고, 다음 접근 때 정리
+ - 락이 비어 있으면 finalize 시점에 바로 정리
+"""
+import gc
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from prefix_cache import PrefixKVCache
+
+
+class _Tokenizer:
+    def __call__(self, text, add_special_tokens=True, return_tensors="pt"):
+        return {"input_ids": torch.tensor([[1, 2, 3, 4]])}
+
+
+class _Output:
+    def __init__(self):
+        self.past_key_values = [torch.zeros(2)]
+
+
+class _Model(torch.nn.Module):
+    device = torch.device("cpu")
+
+    def __init__(self, fail: bool = False):
+        super().__init__()
+        self.fail = fail
+
+    def forward(self, input_ids, use_cache=True):
+        if self.fail:
+            raise RuntimeError("prefill failed")
+        return _Output()
+
+
+def test_failed_prefill_does_not_leak_build_locks():
+    cache = PrefixKVCache(max_entries=4, enabled=True)
+    model = _Model(fail=True)
+    for i in range(20):
+        with pytest.raises(RuntimeError):
+            cache._entry(_Tokenizer(), model, f"prefix {i}", True)
+    assert cache._build_locks == {}
+    assert cache._entries == {}
+
+
+def test_finalizer_while_lock_held_does_not_deadlock():
+    cache = PrefixKVCache(max_entries=4, enabled=True)
+    holder = {"model": _Model()}
+    assert cache._entry(_Tokenizer(), holder["model"], "system", True) is not None
+    finished = threading.Event()
+
+    def drop_under_lock():
+        with cache._lock:
+            # finalize 콜백이 이 스레드에서, 락을 잡은 상태로 실행됨
+            del holder["model"]
+            gc.collect()
+        finished.set()
+
+    t = threading.Thread(target=drop_under_lock, daemon=True)
+    t.start()
+    t.join(5)
+    assert finished.is_set()
+    # 다음 락 접근(stats)에서 정리
+    assert cache.stats()["entries"] == 0
+    assert cache._finalizers == {}
+
+
+def test_finalizer_purges_immediately_when_lock_free():
+    cache = PrefixKVCache(max_entries=4, enabled=True)
+    model = _Model()
+    cache._entry(_Tokenizer(), model, "system", True)
+    assert len(cache._entries) == 1
+    del model
+    gc.collect()
+    assert len(cache._entries) == 0
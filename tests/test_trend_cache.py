@@ -0,0 +1,62 @@
+# test_trend_cache.py
+# 2025-12-06
+"""
+trend_cache.TrendSummaryCache 키별 락 정리
+ - compute() 가 실패한 키의 락은 남지 않음 (실패가 계속돼도 _key_locks 가 커지지 않음)
+ - 같은 키를 기다리던 요청이 있으면 마지막 요청이 끝날 때까지 락 유지
+"""
+import threading
+import time
+
+import pytest
+
+from trend_cache import TrendSummaryCache
+
+
+def _fail():
+    raise RuntimeError("feed down")
+
+
+def test_failed_keys_do_not_leak_locks():
+    cache = TrendSummaryCache(ttl_sec=60, max_entries=4)
+    for i in range(50):
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute(("kw", i), _fail)
+    assert cache._key_locks == {}
+    assert cache.stats()["misses"] == 50
+
+
+def test_lock_kept_while_others_wait():
+    cache = TrendSummaryCache(ttl_sec=60, max_entries=4)
+    release = threading.Event()
+    calls = []
+
+    def slow_fail():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("feed down")
+
+    def request():
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("same", slow_fail)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    # 한 요청이 계산 중, 나머지는 같은 락에서 대기
+    assert len(calls) == 1
+    assert list(cache._key_locks) == ["same"]
+
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 3
+    assert cache._key_locks == {}
+
+
+def test_successful_keys_keep_lock_until_evicted():
+    cache = TrendSummaryCache(ttl_sec=60, max_entries=2)
+    for i in range(5):
+        assert cache.get_or_compute(i, lambda: f"v{i}") == f"v{i}"
+    assert sorted(cache._key_locks) == [3, 4]
@@ -0,0 +1,128 @@
+# test_trend_collect.py
+# 2025-12-06
+"""
+trend_summary.collect_articles 동시 수집 모드를 로컬 HTTP 서버로 확인
+ - RSS 순서 기준 앞쪽 max_articles건 (먼저 끝난 기사가 아님)
+ - 호스트별 동시 요청 수 제한 (per_host)
+ - 전체 제한 시간 (deadline_sec) 초과 시 부분 결과 반환
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import trend_summary
+
+PUB_DATE = "Mon, 01 Dec 2025 09:00:00 GMT"
+
+
+class _Server:
+    """/feed/<kw>?delays=0.4,0.1 → 기사 링크 RSS, /article/<kw>/<i>?delay=0.4 → delay초 후 본문."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.article_hits = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: str, ctype: str):
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                qs = parse_qs(url.query)
+                parts = url.path.strip("/").split("/")
+                if parts[0] == "feed":
+                    self._send(server.feed(parts[1], qs["delays"][0].split(",")), "application/rss+xml")
+                    return
+                with server.lock:
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    server.article_hits.append(url.path)
+                try:
+                    time.sleep(float(qs.get("delay", ["0"])[0]))
+                    self._send(f"<html><body><p>{url.path} 기사 본문입니다. 소비 트렌드.</p></body></html>", "text/html")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def feed(self, kw: str, delays) -> str:
+        items = "".join(
+            f"<item><title>{kw} {i}</title><link>{self.base}/article/{kw}/{i}?delay={d}</link>"
+            f"<pubDate>{PUB_DATE}</pubDate></item>"
+            for i, d in enumerate(delays)
+        )
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{kw}</title>{items}</channel></rss>'
+
+    def builder(self, delays):
+        return lambda kw: f"{self.base}/feed/{kw}?delays={','.join(str(d) for d in delays)}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    s = _Server()
+    yield s
+    s.close()
+
+
+def _paths(arts):
+    return [urlparse(a.url).path for a in arts]
+
+
+def test_keeps_first_articles_in_feed_order(server):
+    # 앞쪽 기사일수록 느림 → 끝나는 순서로 고르면 뒤쪽 기사가 뽑힘
+    arts = trend_summary.collect_articles(
+        ["a"], days=3650, max_articles=3, max_workers=8, per_host=8, deadline_sec=10,
+        feed_url_builder=server.builder([0.4, 0.3, 0.2, 0, 0, 0]),
+    )
+    assert _paths(arts) == ["/article/a/0", "/article/a/1", "/article/a/2"]
+
+
+def test_order_across_keywords(server):
+    arts = trend_summary.collect_articles(
+        ["a", "b"], days=3650, max_articles=3, max_workers=8, per_host=8, deadline_sec=10,
+        feed_url_builder=server.builder([0.3, 0.3, 0]),
+    )
+    assert _paths(arts) == ["/article/a/0", "/article/a/1", "/article/a/2"]
+
+
+def test_per_host_limit(server):
+    arts = trend_summary.collect_articles(
+        ["a"], days=3650, max_articles=8, max_workers=8, per_host=2, deadline_sec=10,
+        feed_url_builder=server.builder([0.2] * 8),
+    )
+    assert len(arts) == 8
+    assert server.max_active == 2
+
+
+def test_deadline_returns_partial_results(server):
+    t0 = time.monotonic()
+    arts = trend_summary.collect_articles(
+        ["a"], days=3650, max_articles=3, max_workers=8, per_host=8, deadline_sec=1,
+        feed_url_builder=server.builder([0, 5, 5]),
+    )
+    assert time.monotonic() - t0 < 3
+    assert _paths(arts) == ["/article/a/0"]
@@ -0,0 +1,181 @@
+# trend_cache.py
+# 2025-12-06
+"""
+/trends/summary 결과 캐시
+ - 키: 정규화된 요청(keywords, days, max_articles, model) + 시간 버킷
+ - TTL이 지나면 stale, stale 구간에서는 바로 이전 결과를 돌려주고
+   백그라운드 작업 하나만 다시 계산 (stale-while-revalidate)
+ - 최대 개수를 넘으면 가장 오래 안 쓴 항목부터 제거 (LRU)
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Tuple
+
+# 타입 표기용. 실제 import 하면 feedparser/bs4 까지 같이 로드돼서 main 시작이 느려짐
+if TYPE_CHECKING:
+    from trend_summary import TrendSummary
+
+CACHE_TTL_SEC = float(os.getenv("TREND_CACHE_TTL_SEC", "600"))
+CACHE_STALE_SEC = float(os.getenv("TREND_CACHE_STALE_SEC", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("TREND_CACHE_MAX_ENTRIES", "128"))
+CACHE_BUCKET_SEC = float(os.getenv("TREND_CACHE_BUCKET_SEC", "86400"))  # 기본: 하루 단위
+CACHE_SWR = os.getenv("TREND_CACHE_SWR", "1") == "1"
+
+
+@dataclass
+class _CacheEntry:
+    value: TrendSummary
+    created_at: float
+
+
+class TrendSummaryCache:
+    def __init__(
+        self,
+        ttl_sec: float = CACHE_TTL_SEC,
+        stale_sec: float = CACHE_STALE_SEC,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        bucket_sec: float = CACHE_BUCKET_SEC,
+        stale_while_revalidate: bool = CACHE_SWR,
+    ):
+        self.ttl_sec = ttl_sec
+        self.stale_sec = stale_sec
+        self.max_entries = max(1, max_entries)
+        self.bucket_sec = bucket_sec
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 같은 키를 동시에 계산하지 않도록 키별 락 (동기 miss / 백그라운드 갱신 공용)
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        # 키별 락을 기다리는/쓰는 동기 요청 수 (0이 되고 항목도 없으면 락 삭제)
+        self._key_waiters: Dict[Hashable, int] = {}
+        self._refreshing: set = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_sec > 0
+
+    def make_key(self, keywords: List[str], days: int, max_articles: int, model: str) -> Tuple:
+        # 키워드 순서/대소문자/공백/중복 차이는 같은 요청으로 취급
+        kws = tuple(sorted({k.strip().lower() for k in keywords if k and k.strip()}))
+        bucket = int(time.time() // self.bucket_sec) if self.bucket_sec > 0 else 0
+        return (kws, days, max_articles, model, bucket)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], TrendSummary]) -> TrendSummary:
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.time() - entry.created_at if entry else None
+            if entry is not None and age < self.ttl_sec:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if (
+                entry is not None
+                and self.stale_while_revalidate
+                and age < self.ttl_sec + self.stale_sec
+            ):
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._start_refresh(key, compute)
+                return entry.value
+            self.misses += 1
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            self._key_waiters[key] = self._key_waiters.get(key, 0) + 1
+
+        try:
+            with key_lock:
+                # 기다리는 동안 다른 요청이 이미 계산했으면 그 결과 사용
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and time.time() - entry.created_at < self.ttl_sec:
+                        return entry.value
+                value = compute()
+                self._put(key, value)
+                return value
+        finally:
+            # compute() 가 실패한 키는 항목이 없어서 eviction 으로 지워지지 않음 → 여기서 정리
+            with self._lock:
+                waiters = self._key_waiters.pop(key) - 1
+                if waiters:
+                    self._key_waiters[key] = waiters
+                self._release_key_lock(key)
+
+    def _start_refresh(self, key: Hashable, compute: Callable[[], TrendSummary]) -> None:
+        # self._lock 보유 상태에서 호출. 키당 백그라운드 갱신은 하나만
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        def _refresh():
+            try:
+                with key_lock:
+                    value = compute()
+                self._put(key, value)
+                with self._lock:
+                    self.refreshes += 1
+            except Exception as e:
+                print(f"[TrendSummaryCache] background refresh failed: {e}")
+                with self._lock:
+                    self.refresh_errors += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+                    self._release_key_lock(key)
+
+        threading.Thread(target=_refresh, name="trend-cache-refresh", daemon=True).start()
+
+    def _put(self, key: Hashable, value: TrendSummary) -> None:
+        with self._lock:
+            self._entries[key] = _CacheEntry(value=value, created_at=time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._release_key_lock(old_key)
+                self.evictions += 1
+
+    def _release_key_lock(self, key: Hashable) -> None:
+        # self._lock 보유 상태에서 호출. 항목/백그라운드 갱신/대기 중인 요청이 모두 없을 때만 삭제
+        if key not in self._entries and key not in self._refreshing and key not in self._key_waiters:
+            self._key_locks.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "stale_sec": self.stale_sec if self.stale_while_revalidate else None,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "refreshing": len(self._refreshing),
+                "evictions": self.evictions,
+            }
+
+
+# 프로세스 전역 인스턴스
+trend_cache = TrendSummaryCache()
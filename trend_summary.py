@@ -1,15 +1,23 @@
 # trend_summary.py
 # 2025-12-06
 from __future__ import annotations
-import argparse, json, re, time
+import argparse, hashlib, json, os, re, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import feedparser, requests
 from bs4 import BeautifulSoup
 from dateutil import parser as dateparser
 
+import cpu_backend
+from assisted_decoding import KANANA_DRAFT_MODEL, assisted_decoder
+from model_registry import registry
+from prefix_cache import prefix_cache
+
 @dataclass
 class Article:
     url: str
@@ -54,23 +62,127 @@ def _safe_get(url: str, headers: dict, timeout: int = 10) -> Optional[str]:
     except Exception:
         return None
 
-def collect_articles(keywords: List[str], days: int, max_articles: int) -> List[Article]:
+# 기사 수집 공통 설정
+FETCH_HEADERS = {"User-Agent": "Mozilla/5.0 (OpenWallet-TrendSummary)"}
+MIN_CHARS = 10
+
+# 동시 수집 모드 기본값 (환경변수로 조정)
+FETCH_MAX_WORKERS = int(os.getenv("TREND_FETCH_MAX_WORKERS", "8"))   # 전체 동시 요청 수
+FETCH_PER_HOST = int(os.getenv("TREND_FETCH_PER_HOST", "4"))         # 호스트별 동시 요청 수
+FETCH_DEADLINE_SEC = float(os.getenv("TREND_FETCH_DEADLINE_SEC", "60"))  # 전체 수집 제한 시간
+
+# 기사 저장소 SQLite 경로 (서버 설정, 요청으로 바꿀 수 없음). 비우면 저장소 사용 안 함
+ARTICLE_DB_PATH = os.getenv("TREND_ARTICLE_DB", "./openwallet_trends.db")
+# 기사 저장소 보관 기간
+ARTICLE_RETENTION_DAYS = int(os.getenv("TREND_ARTICLE_RETENTION_DAYS", "30"))
+
+
+def _entry_pub_iso(e, cutoff: datetime) -> Optional[str]:
+    """
+    RSS entry의 발행일을 UTC ISO 문자열로 반환.
+    2025년 기사가 아니거나 cutoff 이전, 날짜가 없거나 파싱 실패면 None (skip).
+    """
+    pub = getattr(e, "published", None)
+    if not pub:
+        print("    -> no published date, skip")
+        return None
+    try:
+        dt = dateparser.parse(pub)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        # 2025년 기사만
+        if dt.year != 2025:
+            print(f"    -> year={dt.year}, not 2025, skip")
+            return None
+        if dt < cutoff:
+            print("    -> older than cutoff, skip")
+            return None
+        return dt.astimezone(timezone.utc).isoformat()
+    except Exception as ex:
+        print("    -> date parse error:", ex)
+        # 연도 모르면 2025 필터 못 거니까 그냥 skip
+        return None
+
+
+def _extract_text(html: str) -> Optional[str]:
+    """HTML에서 본문 텍스트 추출. 너무 짧으면 None."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 1) <p> 텍스트 우선
+    p_nodes = soup.find_all("p")
+    p_text = " ".join(p.get_text(" ", strip=True) for p in p_nodes)
+    p_text = re.sub(r"\s+", " ", p_text).strip()
+
+    # 2) <p>가 너무 짧으면 전체 텍스트 fallback
+    if len(p_text) >= MIN_CHARS:
+        text = p_text
+        print(f"    -> use p-text len={len(p_text)}")
+    else:
+        full_text = soup.get_text(" ", strip=True)
+        full_text = re.sub(r"\s+", " ", full_text).strip()
+        print(
+            f"    -> p-text too short ({len(p_text)} chars), "
+            f"fallback full-text len={len(full_text)}"
+        )
+        text = full_text
+
+    # 최종 길이 체크 (정말 1~2자짜리 쓰레기만 버림)
+    if len(text) < MIN_CHARS:
+        print(f"    -> still too short (<{MIN_CHARS} chars), skip")
+        return None
+
+    return clamp_len(text, 25000)
+
+
+def collect_articles(
+    keywords: List[str],
+    days: int,
+    max_articles: int,
+    concurrent: bool = True,
+    max_workers: int = FETCH_MAX_WORKERS,
+    per_host: int = FETCH_PER_HOST,
+    deadline_sec: float = FETCH_DEADLINE_SEC,
+    feed_url_builder: Callable[[str], str] = google_news_rss_url,
+    store=None,
+) -> List[Article]:
     """
     - Google News RSS에서 기사 수집
     - pub_date 기준으로 최근 N일 + year == 2025 인 기사만 사용
     - 본문 길이 필터를 완화해서 '짧은 기사'도 최대한 받아들임
+    - concurrent=True: 키워드 RSS와 기사 본문을 스레드 풀로 동시에 수집
+      (전체 동시 요청 max_workers, 호스트별 per_host, 전체 제한 시간 deadline_sec)
+    - feed_url_builder: 키워드 → RSS URL (로컬 테스트 서버로 바꿔 끼울 수 있음)
+    - store: ArticleStore. 이미 저장된 기사는 HTTP 요청 없이 사용, 새로 받은 기사는 저장
     """
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+    print(
+        f"[collect_articles] START keywords={keywords}, days={days}, cutoff={cutoff.isoformat()}, "
+        f"concurrent={concurrent}"
+    )
+
+    if concurrent:
+        return _collect_articles_concurrent(
+            keywords, cutoff, max_articles, max_workers, per_host, deadline_sec, feed_url_builder, store
+        )
+
     out: List[Article] = []
-    headers = {"User-Agent": "Mozilla/5.0 (OpenWallet-TrendSummary)"}
+    fresh: List[Article] = []
+    try:
+        _collect_sequential(keywords, cutoff, max_articles, feed_url_builder, store, out, fresh)
+    finally:
+        if store is not None and fresh:
+            store.save_many(fresh)
+            print(f"[collect_articles] stored {len(fresh)} new articles")
 
-    MIN_CHARS = 10  
+    print(f"[collect_articles] FINAL collected={len(out)}")
+    return out
 
-    print(f"[collect_articles] START keywords={keywords}, days={days}, cutoff={cutoff.isoformat()}")
 
+def _collect_sequential(keywords, cutoff, max_articles, feed_url_builder, store, out, fresh) -> None:
     for kw in keywords:
         print(f"[collect_articles] ---- keyword='{kw}' ----")
-        feed_url = google_news_rss_url(kw)
+        feed_url = feed_url_builder(kw)
         print(f"[collect_articles] feed_url={feed_url}")
 
         feed = feedparser.parse(feed_url)
@@ -85,77 +197,45 @@ def collect_articles(keywords: List[str], days: int, max_articles: int) -> List[
             print(f"  [entry] fetch {link}")
 
             # 날짜 파싱
-            pub = getattr(e, "published", None)
-            pub_iso = None
-            if pub:
-                try:
-                    dt = dateparser.parse(pub)
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    # 2025년 기사만
-                    if dt.year != 2025:
-                        print(f"    -> year={dt.year}, not 2025, skip")
-                        continue
-                    if dt < cutoff:
-                        print("    -> older than cutoff, skip")
-                        continue
-                    pub_iso = dt.astimezone(timezone.utc).isoformat()
-                except Exception as ex:
-                    print("    -> date parse error:", ex)
-                    # 연도 모르면 2025 필터 못 거니까 그냥 skip
-                    continue
-            else:
-                print("    -> no published date, skip")
+            pub_iso = _entry_pub_iso(e, cutoff)
+            if pub_iso is None:
+                continue
+
+            # ---- 저장소에 있으면 HTTP 요청 생략 ----
+            cached = store.get_many([link]).get(link) if store is not None else None
+            if cached is not None:
+                out.append(cached)
+                print(f"    -> from store total={len(out)}")
+                if len(out) >= max_articles:
+                    print(f"[collect_articles] reached max_articles={max_articles}, stop.")
+                    return
                 continue
 
             # ---- HTML 요청 ----
-            html = _safe_get(link, headers=headers, timeout=10)
+            html = _safe_get(link, headers=FETCH_HEADERS, timeout=10)
             if not html:
                 print("    -> fetch failed, skip")
                 continue
 
             try:
-                soup = BeautifulSoup(html, "html.parser")
-
-                # 1) <p> 텍스트 우선
-                p_nodes = soup.find_all("p")
-                p_text = " ".join(p.get_text(" ", strip=True) for p in p_nodes)
-                p_text = re.sub(r"\s+", " ", p_text).strip()
-
-                # 2) <p>가 너무 짧으면 전체 텍스트 fallback
-                if len(p_text) >= MIN_CHARS:
-                    text = p_text
-                    print(f"    -> use p-text len={len(p_text)}")
-                else:
-                    full_text = soup.get_text(" ", strip=True)
-                    full_text = re.sub(r"\s+", " ", full_text).strip()
-                    print(
-                        f"    -> p-text too short ({len(p_text)} chars), "
-                        f"fallback full-text len={len(full_text)}"
-                    )
-                    text = full_text
-
-                # 최종 길이 체크 (정말 1~2자짜리 쓰레기만 버림)
-                if len(text) < MIN_CHARS:
-                    print(f"    -> still too short (<{MIN_CHARS} chars), skip")
+                text = _extract_text(html)
+                if text is None:
                     continue
 
-                text = clamp_len(text, 25000)
-
-                out.append(
-                    Article(
-                        url=link,
-                        title=getattr(e, "title", "") or "",
-                        source=(getattr(e, "source", None) or "Google News"),
-                        published_at=pub_iso,
-                        content=text,
-                    )
+                art = Article(
+                    url=link,
+                    title=getattr(e, "title", "") or "",
+                    source=(getattr(e, "source", None) or "Google News"),
+                    published_at=pub_iso,
+                    content=text,
                 )
+                out.append(art)
+                fresh.append(art)
                 print(f"    -> collected (len={len(text)} chars) total={len(out)}")
 
                 if len(out) >= max_articles:
                     print(f"[collect_articles] reached max_articles={max_articles}, stop.")
-                    return out
+                    return
 
             except Exception as ex:
                 print("    -> parse error:", ex)
@@ -164,6 +244,160 @@ def collect_articles(keywords: List[str], days: int, max_articles: int) -> List[
         # soft rate-limit
         time.sleep(0.2)
 
+
+class _HostLimiter:
+    """호스트별 동시 요청 수 제한."""
+
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+
+    def get(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._sems:
+                self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return self._sems[host]
+
+
+def _collect_articles_concurrent(
+    keywords: List[str],
+    cutoff: datetime,
+    max_articles: int,
+    max_workers: int,
+    per_host: int,
+    deadline_sec: float,
+    feed_url_builder: Callable[[str], str],
+    store=None,
+) -> List[Article]:
+    deadline = time.monotonic() + deadline_sec
+    limiter = _HostLimiter(per_host)
+    stop = threading.Event()
+
+    def remaining() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    def limited_get(url: str) -> Optional[str]:
+        # deadline을 넘겼거나 이미 max_articles를 채웠으면 요청하지 않음
+        if stop.is_set() or remaining() <= 0:
+            return None
+        with limiter.get(url):
+            if stop.is_set() or remaining() <= 0:
+                return None
+            return _safe_get(url, headers=FETCH_HEADERS, timeout=min(10, max(1, remaining())))
+
+    def fetch_article(order, link, title, source, pub_iso):
+        print(f"  [entry] fetch {link}")
+        html = limited_get(link)
+        if not html:
+            print(f"    -> fetch failed, skip ({link})")
+            return None
+        try:
+            text = _extract_text(html)
+        except Exception as ex:
+            print("    -> parse error:", ex)
+            return None
+        if text is None:
+            return None
+        return order, Article(url=link, title=title, source=source, published_at=pub_iso, content=text)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="trend-fetch")
+    # RSS 순서(키워드 → entry)대로: 저장소에서 찾은 Article 또는 본문 수집 Future
+    slots: List[Tuple[Tuple[int, int], Any]] = []
+    n_cached = 0
+
+    def slot_article(item) -> Optional[Article]:
+        if not isinstance(item, Future):
+            return item
+        if not item.done() or item.cancelled():
+            return None
+        res = item.result()
+        return res[1] if res is not None else None
+
+    def first_n_settled() -> bool:
+        """RSS 순서 앞쪽 slot들만으로 max_articles를 채웠는지 (앞쪽에 진행 중인 요청이 있으면 아직 아님)."""
+        n = 0
+        for _, item in slots:
+            if isinstance(item, Future) and not item.done():
+                return False
+            if slot_article(item) is not None:
+                n += 1
+                if n >= max_articles:
+                    return True
+        return False
+
+    try:
+        # 1) 모든 키워드의 RSS를 동시에 요청
+        feed_futs = [pool.submit(limited_get, feed_url_builder(kw)) for kw in keywords]
+
+        # 2) 날짜 필터 통과한 entry를 바로 본문 수집 작업으로 넘김 (키워드 간 중복 URL 제거)
+        article_futs = []
+        seen = set()
+        for kw_idx, (kw, fut) in enumerate(zip(keywords, feed_futs)):
+            try:
+                xml = fut.result(timeout=remaining())
+            except FuturesTimeout:
+                print(f"[collect_articles] feed timeout keyword='{kw}'")
+                continue
+            entries = getattr(feedparser.parse(xml), "entries", []) if xml else []
+            print(f"[collect_articles] keyword='{kw}' RSS entries={len(entries)}")
+
+            candidates = []
+            for entry_idx, e in enumerate(entries):
+                link = getattr(e, "link", None)
+                if not link or link in seen:
+                    continue
+                pub_iso = _entry_pub_iso(e, cutoff)
+                if pub_iso is None:
+                    continue
+                seen.add(link)
+                candidates.append((entry_idx, e, link, pub_iso))
+
+            # 저장소에 있는 기사는 HTTP 요청 없이 바로 사용
+            cached = store.get_many([c[2] for c in candidates]) if store is not None else {}
+            if cached:
+                print(f"[collect_articles] keyword='{kw}' from store={len(cached)}")
+            for entry_idx, e, link, pub_iso in candidates:
+                if n_cached >= max_articles:
+                    break
+                if link in cached:
+                    slots.append(((kw_idx, entry_idx), cached[link]))
+                    n_cached += 1
+                    continue
+                fut = pool.submit(
+                    fetch_article,
+                    (kw_idx, entry_idx),
+                    link,
+                    getattr(e, "title", "") or "",
+                    getattr(e, "source", None) or "Google News",
+                    pub_iso,
+                )
+                slots.append(((kw_idx, entry_idx), fut))
+                article_futs.append(fut)
+
+        # 3) 끝나는 대로 확인하다가 RSS 순서 앞쪽 max_articles건이 확정되면 나머지는 취소
+        #    (먼저 끝난 기사가 아니라 RSS 순서 기준이라 실행마다 결과가 같음)
+        try:
+            if not first_n_settled():
+                for _ in as_completed(article_futs, timeout=remaining()):
+                    if first_n_settled():
+                        print(f"[collect_articles] reached max_articles={max_articles}, stop.")
+                        break
+        except FuturesTimeout:
+            print(f"[collect_articles] deadline {deadline_sec}s exceeded, returning partial results")
+    finally:
+        stop.set()
+        # 진행 중인 요청은 기다리지 않음 (각 요청은 자체 timeout으로 종료)
+        pool.shutdown(wait=False, cancel_futures=True)
+        fresh = [slot_article(item) for _, item in slots if isinstance(item, Future)]
+        fresh = [a for a in fresh if a is not None]
+        if store is not None and fresh:
+            store.save_many(fresh)
+            print(f"[collect_articles] stored {len(fresh)} new articles")
+
+    # 순차 모드와 같은 순서(키워드 → RSS entry 순)에서 앞쪽 max_articles건
+    out = [a for a in (slot_article(item) for _, item in slots) if a is not None][:max_articles]
     print(f"[collect_articles] FINAL collected={len(out)}")
     return out
 
@@ -229,41 +463,29 @@ def _pick_device_and_dtype():
         print("[trend_summary] Torch import failed, forcing CPU.", e)
         return "cpu", None
 
-def summarize_with_kanana(
-    arts: List[Article],
-    model: str = "kakaocorp/kanana-1.5-2.1b-instruct-2505",
-) -> TrendSummary:
-    import torch
-    from transformers import AutoTokenizer, AutoModelForCausalLM
-
-    device, dtype = _pick_device_and_dtype()
-
-    tok = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
-    # pad/eos 안전 설정
-    if tok.pad_token_id is None and tok.eos_token_id is not None:
-        tok.pad_token = tok.eos_token
-
-    # 모델 로드
-    model_kwargs = dict(trust_remote_code=True, device_map="auto")
-    if device == "cuda":
-        model_kwargs["torch_dtype"] = dtype or torch.bfloat16
-    m = AutoModelForCausalLM.from_pretrained(model, **model_kwargs)
-
-    # 기사 합본
-    joined = "\n\n".join([f"# {a.title}\n{a.content}" for a in arts])
-    max_ctx = getattr(m.config, "max_position_embeddings", getattr(tok, "model_max_length", 32768))
-    joined = joined[: int(max_ctx * 0.9)]
-
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "너는 한국어 경제/리테일/소비 트렌드 애널리스트다. "
-                "반드시 '유효한 JSON 한 개'만 출력하라. "
-                "말머리/설명/코드블록 없이, 아래 스키마 그대로 출력하라."
-            ),
-        },
+# 요약 모드: "mapreduce"(기사별 요약 → 최종 통합) / "single"(기사 합본 한 번에)
+SUMMARY_MODE = os.getenv("TREND_SUMMARY_MODE", "mapreduce")
+# 프롬프트 + 생성 토큰 상한 (모델 컨텍스트보다 크면 모델 값 사용)
+CONTEXT_TOKENS = int(os.getenv("TREND_CONTEXT_TOKENS", "8192"))
+MAP_INPUT_TOKENS = int(os.getenv("TREND_MAP_INPUT_TOKENS", "1536"))   # 기사 1건 본문 상한
+MAP_MAX_NEW_TOKENS = int(os.getenv("TREND_MAP_MAX_NEW_TOKENS", "160"))
+REDUCE_MAX_NEW_TOKENS = 500  # VRAM 안정성
+
+SYSTEM_PROMPT = (
+    "너는 한국어 경제/리테일/소비 트렌드 애널리스트다. "
+    "반드시 '유효한 JSON 한 개'만 출력하라. "
+    "말머리/설명/코드블록 없이, 아래 스키마 그대로 출력하라."
+)
+MAP_SYSTEM_PROMPT = (
+    "너는 한국어 경제/리테일/소비 트렌드 애널리스트다. "
+    "기사 한 건을 읽고 소비 트렌드와 관련된 핵심만 3~5문장으로 요약하라. "
+    "수치(금액, 비율, 증감)는 빠짐없이 남기고, 설명/머리말 없이 요약문만 출력하라."
+)
+
+
+def _reduce_messages(joined: str) -> List[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
         {
             "role": "user",
             "content": (
@@ -280,13 +502,44 @@ def summarize_with_kanana(
             ),
         },
     ]
-    prompt_ids = tok.apply_chat_template(
-        messages,
-        add_generation_prompt=True,
-        return_tensors="pt",
-    ).to(device)
 
-    
+
+def _map_messages(art: Article, body: str) -> List[dict]:
+    return [
+        {"role": "system", "content": MAP_SYSTEM_PROMPT},
+        {"role": "user", "content": f"# {art.title}\n{body}"},
+    ]
+
+
+# 토큰 예산 유틸 (문자 수가 아니라 실제 tokenizer 기준)
+def _count_tokens(tok, text: str) -> int:
+    return len(tok(text, add_special_tokens=False)["input_ids"])
+
+
+def _count_prompt_tokens(tok, messages: List[dict]) -> int:
+    text = tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return _count_tokens(tok, text)
+
+
+def _truncate_tokens(tok, text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    ids = tok(text, add_special_tokens=False)["input_ids"]
+    if len(ids) <= max_tokens:
+        return text
+    return tok.decode(ids[:max_tokens], skip_special_tokens=True)
+
+
+def _context_tokens(tok, m) -> int:
+    limits = [CONTEXT_TOKENS]
+    for v in (getattr(m.config, "max_position_embeddings", None), getattr(tok, "model_max_length", None)):
+        # tokenizer에 상한이 없으면 model_max_length가 매우 큰 값(1e30)으로 들어옴
+        if isinstance(v, int) and 0 < v < 1_000_000:
+            limits.append(v)
+    return min(limits)
+
+
+def _eos_pad_ids(tok):
     eot_id = None
     for tkn in ("<|eot_id|>", "<|eot|>"):
         try:
@@ -295,35 +548,195 @@ def summarize_with_kanana(
                 eot_id = tid
                 break
         except Exception:
-       	    pass
+            pass
     eos_id = eot_id if eot_id is not None else (tok.eos_token_id or tok.pad_token_id)
     pad_id = tok.pad_token_id if tok.pad_token_id is not None else eos_id
+    return eos_id, pad_id
+
 
+def _generate(tok, m, messages: List[dict], max_new_tokens: int, registry_key: Tuple) -> str:
+    """chat 템플릿 적용 → greedy 생성 → 새로 생성된 부분만 디코딩."""
+    import torch
+
+    text = tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    prompt_ids = tok(text, add_special_tokens=False, return_tensors="pt")["input_ids"].to(m.device)
+
+    eos_id, pad_id = _eos_pad_ids(tok)
     gen_kwargs = dict(
-        max_new_tokens=500,  # VRAM 안정성
+        max_new_tokens=max_new_tokens,
         do_sample=False,
         eos_token_id=eos_id,
         pad_token_id=pad_id,
     )
+    # KANANA_DRAFT_MODEL 이 있으면 assisted decoding (prefix KV 캐시와는 같이 쓰지 않음)
+    draft = assisted_decoder.draft_for(DRAFT_MODEL, tok, m) if DRAFT_MODEL else None
 
     try:
         with torch.inference_mode():
-            out = m.generate(prompt_ids, **gen_kwargs)
+            if draft is not None:
+                out, _ = assisted_decoder.generate(m, draft, input_ids=prompt_ids, **gen_kwargs)
+            else:
+                # 같은 시스템 프롬프트(map/reduce 지시문) 부분은 캐시한 KV 재사용
+                past, _ = prefix_cache.past_key_values(tok, m, messages, text, prompt_ids, add_special_tokens=False)
+                out = m.generate(prompt_ids, past_key_values=past, **gen_kwargs)
     except RuntimeError as e:
         # GPU 커널 문제 등 발생 시 CPU 폴백
         if "no kernel image is available for execution on the device" in str(e) or "CUDA error" in str(e):
             print("[trend_summary] CUDA runtime error detected. Falling back to CPU generate().")
             m = m.to("cpu")
             prompt_ids = prompt_ids.to("cpu")
+            # 이후 요청은 CPU 키로 재사용되도록 레지스트리 갱신
+            name, dtype, device = registry_key
+            registry.unload(name, dtype=dtype, device=device)
+            registry.get(name, lambda: (tok, m), dtype=None, device="cpu")
             with torch.inference_mode():
                 out = m.generate(prompt_ids, **gen_kwargs)
         else:
             raise
 
-
     new_tokens = out[0, prompt_ids.shape[-1] :]
-    txt = tok.decode(new_tokens, skip_special_tokens=True)
-    
+    return tok.decode(new_tokens, skip_special_tokens=True)
+
+
+class _MemorySummaryCache:
+    """ArticleStore가 없을 때 쓰는 프로세스 내 기사 요약 캐시 (LRU)."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_summary(self, url: str, content_hash: str, model: str) -> Optional[str]:
+        with self._lock:
+            key = (url, content_hash, model)
+            val = self._data.get(key)
+            if val is not None:
+                self._data.move_to_end(key)
+            return val
+
+    def save_summary(self, url: str, content_hash: str, model: str, summary: str) -> None:
+        with self._lock:
+            self._data[(url, content_hash, model)] = summary
+            self._data.move_to_end((url, content_hash, model))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_memory_summary_cache = _MemorySummaryCache()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _map_summaries(tok, m, arts: List[Article], model: str, cache, registry_key: Tuple) -> List[str]:
+    """기사별 요약 (캐시에 있으면 재사용). 결과는 arts 순서와 같음."""
+    ctx = _context_tokens(tok, m)
+    overhead = _count_prompt_tokens(tok, _map_messages(Article("", "", "", None, ""), ""))
+    body_budget = min(MAP_INPUT_TOKENS, ctx - MAP_MAX_NEW_TOKENS - overhead - 16)
+
+    summaries = []
+    hits = 0
+    for a in arts:
+        h = content_hash(a.content)
+        cached = cache.get_summary(a.url, h, model)
+        if cached is not None:
+            hits += 1
+            summaries.append(cached)
+            continue
+        title_tokens = _count_tokens(tok, a.title)
+        body = _truncate_tokens(tok, a.content, body_budget - title_tokens)
+        summary = _generate(tok, m, _map_messages(a, body), MAP_MAX_NEW_TOKENS, registry_key).strip()
+        cache.save_summary(a.url, h, model, summary)
+        summaries.append(summary)
+    print(f"[trend_summary] map: articles={len(arts)}, cached={hits}, generated={len(arts) - hits}")
+    return summaries
+
+
+def _fit_blocks(tok, blocks: List[str], budget: int) -> str:
+    """블록을 순서대로 이어붙이되 토큰 예산을 넘으면 마지막 블록을 잘라서 맞춤."""
+    out = []
+    used = 0
+    sep_tokens = _count_tokens(tok, "\n\n")
+    for b in blocks:
+        n = _count_tokens(tok, b) + (sep_tokens if out else 0)
+        if used + n > budget:
+            rest = budget - used - (sep_tokens if out else 0)
+            if rest > 32:
+                out.append(_truncate_tokens(tok, b, rest))
+            break
+        out.append(b)
+        used += n
+    return "\n\n".join(out)
+
+
+DEFAULT_MODEL = "kakaocorp/kanana-1.5-2.1b-instruct-2505"
+# assisted decoding용 draft 모델 (KANANA_DRAFT_MODEL, Kanana와 같은 tokenizer). 비어 있으면 사용 안 함
+DRAFT_MODEL = KANANA_DRAFT_MODEL
+
+
+def get_kanana_model(model: str = DEFAULT_MODEL):
+    """(tokenizer, model, registry_key). 요청마다 from_pretrained 하지 않고 프로세스 전역 레지스트리에서 재사용."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    device, dtype = _pick_device_and_dtype()
+    if device == "cuda":
+        dtype = dtype or torch.bfloat16
+    else:
+        # CPU: fp32/bf16/int8 (CPU_INFERENCE_MODE, cpu_backend.py) → 레지스트리 키의 dtype 자리에 모드명
+        dtype = cpu_backend.resolve_mode()
+
+    def _load():
+        tok = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
+        # pad/eos 안전 설정
+        if tok.pad_token_id is None and tok.eos_token_id is not None:
+            tok.pad_token = tok.eos_token
+
+        if device == "cpu":
+            return tok, cpu_backend.from_pretrained(model, dtype, trust_remote_code=True)
+
+        # 모델 로드
+        model_kwargs = dict(trust_remote_code=True, device_map="auto", torch_dtype=dtype)
+        return tok, AutoModelForCausalLM.from_pretrained(model, **model_kwargs)
+
+    tok, m = registry.get(model, _load, dtype=dtype, device=device)
+    return tok, m, (model, dtype, device)
+
+
+def warmup(model: str = DEFAULT_MODEL, max_new_tokens: int = 4) -> None:
+    """모델 로드 + 짧은 더미 생성 (첫 요청이 로드/커널 초기화 비용을 내지 않도록)."""
+    tok, m, registry_key = get_kanana_model(model)
+    _generate(tok, m, [{"role": "user", "content": "안녕하세요"}], max_new_tokens, registry_key)
+
+
+def summarize_with_kanana(
+    arts: List[Article],
+    model: str = DEFAULT_MODEL,
+    mode: str = SUMMARY_MODE,
+    summary_cache=None,
+) -> TrendSummary:
+    """
+    - mode="mapreduce": 기사마다 짧은 요약을 만들고(URL+본문 해시로 캐시),
+      요약들을 모아 최종 JSON(bullets/key_stats/risks/opportunities) 생성
+    - mode="single": 기사 본문 합본으로 한 번에 생성
+    - 두 모드 모두 프롬프트 길이는 tokenizer 토큰 수 기준으로 맞춤
+    - summary_cache: get_summary/save_summary를 가진 객체 (ArticleStore 등). 없으면 메모리 캐시
+    """
+    tok, m, registry_key = get_kanana_model(model)
+
+    if mode == "mapreduce":
+        summaries = _map_summaries(tok, m, arts, model, summary_cache or _memory_summary_cache, registry_key)
+        blocks = [f"# {a.title}\n{sm}" for a, sm in zip(arts, summaries) if sm]
+    else:
+        blocks = [f"# {a.title}\n{a.content}" for a in arts]
+
+    # 기사 합본: 컨텍스트 - 생성 토큰 - 지시문 토큰 안에 들어가도록
+    ctx = _context_tokens(tok, m)
+    overhead = _count_prompt_tokens(tok, _reduce_messages(""))
+    joined = _fit_blocks(tok, blocks, ctx - REDUCE_MAX_NEW_TOKENS - overhead - 16)
+
+    txt = _generate(tok, m, _reduce_messages(joined), REDUCE_MAX_NEW_TOKENS, registry_key)
     js = _safe_parse_to_json(txt)
 
     end = to_date_iso(datetime.now(timezone.utc))
@@ -342,16 +755,35 @@ def summarize_with_kanana(
     )
 
 
-def run(db: str, keywords: List[str], days: int, max_articles: int, model: str) -> TrendSummary:
+def run(
+    db: str,
+    keywords: List[str],
+    days: int,
+    max_articles: int,
+    model: str,
+    concurrent: bool = True,
+) -> TrendSummary:
     """
-    메인 엔트리 (DB 없이 동작):
+    메인 엔트리:
     - 기사 수집 (2025년 기사만, 최근 N일)
+      db(SQLite 경로)가 있으면 저장된 기사는 재사용하고, 새 기사는 저장
     - 기사 0건이면 데모 fallback 요약
     - 기사 있으면 Kanana 요약
     """
-    print(f"[run] (DB unused) keywords={keywords}, days={days}, max_articles={max_articles}, model={model}")
+    print(f"[run] db={db}, keywords={keywords}, days={days}, max_articles={max_articles}, model={model}")
+
+    store = None
+    if db:
+        from article_store import ArticleStore
+
+        store = ArticleStore(db)
+        # 보관 기간(최소 요청 기간)이 지난 기사는 일괄 삭제
+        keep_days = max(days, ARTICLE_RETENTION_DAYS)
+        pruned = store.prune(datetime.now(timezone.utc) - timedelta(days=keep_days))
+        if pruned:
+            print(f"[run] pruned {pruned} expired articles (>{keep_days}d)")
 
-    arts = collect_articles(keywords, days, max_articles)
+    arts = collect_articles(keywords, days, max_articles, concurrent=concurrent, store=store)
     print(f"[run] collected articles={len(arts)}")
 
     # 기사 0건 대응: UI가 비지 않도록 데모용 요약 채움
@@ -395,7 +827,7 @@ def run(db: str, keywords: List[str], days: int, max_articles: int, model: str)
         )
 
 
-    s = summarize_with_kanana(arts, model)
+    s = summarize_with_kanana(arts, model, summary_cache=store)
     s.keywords = keywords
     return s
 
@@ -405,8 +837,9 @@ if __name__ == "__main__":
     p.add_argument("--keywords", required=True)
     p.add_argument("--days", type=int, default=7)
     p.add_argument("--max-articles", type=int, default=30)
-    p.add_argument("--db", default="./openwallet_trends.db")  # 호환용 인자 (지금은 사용 안 함)
-    p.add_argument("--model", default="kakaocorp/kanana-1.5-2.1b-instruct-2505")
+    p.add_argument("--db", default="./openwallet_trends.db")  # 기사 저장소 (SQLite)
+    p.add_argument("--model", default=DEFAULT_MODEL)
+    p.add_argument("--sequential", action="store_true", help="기사 본문을 한 건씩 순차 수집")
     a = p.parse_args()
 
     s = run(
@@ -415,6 +848,7 @@ if __name__ == "__main__":
         a.days,
         a.max_articles,
         a.model,
+        concurrent=not a.sequential,
     )
 
     print(f"\n기간: {s.period_start} ~ {s.period_end}\n")